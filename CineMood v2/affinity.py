@@ -0,0 +1,179 @@
+"""
+Precomputed mood x movie affinity matrices, for rankings without GPT calls.
+
+A weekly batch job scores every mood of `VALID_MOOD_WORDS` against every movie of the week's catalog once
+and stores the scores (0-1, float16) in `AFFINITY_DIR/<catalog version>.npz`:
+    python affinity.py --scorer local    # TF-IDF similarity of moods and overviews (CPU only, seconds)
+    python affinity.py --scorer llm      # GPT scores, a batch of moods per call
+
+With `RANKING_MODE=matrix`, `llm.get_movies_by_mood` ranks any mood set by summing the moods' rows and
+selecting the top movies. Catalogs without a stored matrix get a local one built on first use.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from config import AFFINITY_DIR
+from moods import VALID_MOOD_WORDS
+from retrieval import score_movies
+from tmdb_api import catalog_version
+
+# ✅ Sorted, so row numbers are the same in every process
+MOODS = sorted(VALID_MOOD_WORDS)
+MOOD_ROWS = {mood: row for row, mood in enumerate(MOODS)}
+
+# Matrices loaded per catalog version, and matrix files kept on disk
+_MAX_MATRICES = 4
+_matrices = OrderedDict()
+_matrices_lock = threading.Lock()
+
+
+def local_scores(moods, movies):
+    """Scores movies against each mood with the local TF-IDF index (cosine similarity, 0-1)."""
+    return np.stack([score_movies([mood], movies) for mood in moods])
+
+
+def build_matrix(movies, scorer=local_scores):
+    """Scores every vocabulary mood against every movie with `scorer(moods, movies)` (an array of 0-1 scores)."""
+    scores = np.clip(np.asarray(scorer(MOODS, movies), dtype=np.float32), 0, 1)
+    return {
+        "catalog_version": catalog_version(movies),
+        "moods": np.array(MOODS),
+        "scores": scores.astype(np.float16),
+    }
+
+
+def matrix_path(version):
+    return os.path.join(AFFINITY_DIR, f"{version}.npz")
+
+
+def save_matrix(matrix):
+    """Writes a matrix atomically, keeping only the newest `_MAX_MATRICES` files."""
+    path = matrix_path(matrix["catalog_version"])
+    os.makedirs(AFFINITY_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=AFFINITY_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(f, **matrix)
+        os.replace(tmp_path, path)
+    except OSError:
+        os.unlink(tmp_path)
+        raise
+
+    files = sorted(
+        (entry.path for entry in os.scandir(AFFINITY_DIR) if entry.name.endswith(".npz")),
+        key=os.path.getmtime, reverse=True,
+    )
+    for old_path in files[_MAX_MATRICES:]:
+        os.remove(old_path)
+    return path
+
+
+def _load_file(version):
+    try:
+        with np.load(matrix_path(version)) as data:
+            matrix = {name: data[name] for name in data.files}
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Error reading affinity matrix {version}: {e}")
+        return None
+    # ✅ A matrix built for an older mood vocabulary is rebuilt
+    if list(matrix["moods"]) != MOODS:
+        return None
+    matrix["catalog_version"] = str(matrix["catalog_version"])
+    return matrix
+
+
+def get_matrix(movies):
+    """
+    Returns the affinity matrix of a catalog: from memory, else from `AFFINITY_DIR`,
+    else built with the local scorer (and stored for other processes).
+    """
+    version = catalog_version(movies)
+    with _matrices_lock:
+        if version in _matrices:
+            _matrices.move_to_end(version)
+            return _matrices[version]
+
+    matrix = _load_file(version)
+    if matrix is None:
+        matrix = build_matrix(movies)
+        try:
+            save_matrix(matrix)
+        except OSError as e:
+            print(f"⚠️ Error saving affinity matrix {version}: {e}")
+
+    with _matrices_lock:
+        _matrices[version] = matrix
+        while len(_matrices) > _MAX_MATRICES:
+            _matrices.popitem(last=False)
+    return matrix
+
+
+def default_reason(mood):
+    """Match reason shown when GPT does not write one."""
+    if mood is None:
+        return "Trending movie matching what you described."
+    return f"A strong match for feeling {mood}."
+
+
+def rank(mood_words, movies, k=3):
+    """
+    Returns the `k` best movies for the mood words as [catalog index, match reason] pairs, best first:
+    - The rows of the vocabulary moods are summed ("neutral" only counts when no other mood is given).
+    - Words outside the vocabulary (e.g. key words of a neutral input) are scored with the local TF-IDF index.
+    - Ties keep the catalog order.
+    """
+    words = [word.strip().lower() for word in mood_words]
+    rows = [MOOD_ROWS[word] for word in dict.fromkeys(words) if word in MOOD_ROWS and word != "neutral"]
+    if not rows and set(words) == {"neutral"}:
+        rows = [MOOD_ROWS["neutral"]]
+    if not movies:
+        return []
+
+    if rows:
+        mood_scores = get_matrix(movies)["scores"][rows].astype(np.float32)
+        scores = mood_scores.sum(axis=0)
+    else:
+        mood_scores = None
+        scores = score_movies(words, movies)
+
+    k = min(k, len(movies))
+    candidates = np.argpartition(-scores, k - 1)[:k] if k < len(movies) else np.arange(len(movies))
+    top = sorted(candidates.tolist(), key=lambda index: (-scores[index], index))
+
+    ranking = []
+    for index in top:
+        mood = MOODS[rows[int(np.argmax(mood_scores[:, index]))]] if mood_scores is not None else None
+        ranking.append([int(index), default_reason(mood)])
+    return ranking
+
+
+def main():
+    # Imported here: only the batch job needs the catalog and the GPT scorer
+    import llm
+    from pipeline import CATALOG_SIZE
+    from tmdb_api import fetch_movies
+
+    parser = argparse.ArgumentParser(description="Precompute the mood x movie affinity matrix of this week's catalog.")
+    parser.add_argument("--scorer", choices=["local", "llm"], default="local", help="how moods are scored")
+    parser.add_argument("--max-movies", type=int, default=CATALOG_SIZE, help="catalog size")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    movies = fetch_movies(args.max_movies)
+    if not movies:
+        raise SystemExit("⚠️ No movies available.")
+    matrix = build_matrix(movies, local_scores if args.scorer == "local" else llm.score_affinity)
+    path = save_matrix(matrix)
+    print(f"✅ Scored {len(MOODS)} moods x {len(movies)} movies in {time.perf_counter() - start:.1f}s: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Headless HTTP API for CineMood, next to the Streamlit UI.
+
+Endpoints:
+- POST /detect-mood: {"text": ...} -> the detected moods.
+- POST /recommend: {"text": ..., "deadline": seconds (optional)} -> the moods, the top 3 movies and the tier
+  that served them (stages overrunning the deadline fall back to cheaper tiers, see pipeline.py).
+- POST /recommend/batch: {"inputs": [...]} -> one recommendation per input (one catalog for the whole batch).
+- GET /health, GET /metrics (Prometheus text).
+
+GPT calls go through the async OpenAI client, so one worker serves many requests at once.
+Run several worker processes with `python api.py` (`API_WORKERS`); they share the on-disk catalog,
+mood memo and ranking caches in `CACHE_DIR`. Metrics are counted per worker process.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Annotated, List, Optional
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field, StringConstraints
+
+import metrics
+import warmup
+from config import API_BATCH_CONCURRENCY, API_HOST, API_MAX_BATCH, API_PORT, API_WORKERS
+from llm import detect_mood_async
+from pipeline import CATALOG_SIZE, mood_status, recommend_async
+from tmdb_api import fetch_movies
+
+# A user message: surrounding whitespace is stripped, and empty messages are rejected
+MoodText = Annotated[str, StringConstraints(strip_whitespace=True, min_length=1, max_length=2000)]
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Starts the per-process background work of each worker."""
+    # ✅ Warms the catalog, indexes and popular rankings in the background (at startup and weekly rollovers)
+    warmup.start(CATALOG_SIZE)
+    yield
+
+
+app = FastAPI(title="CineMood API", description="Mood-based trending movie recommendations.", lifespan=lifespan)
+
+
+class MoodRequest(BaseModel):
+    text: MoodText = Field(..., description="How the user feels.")
+
+
+class RecommendRequest(MoodRequest):
+    deadline: Optional[float] = Field(
+        None, gt=0, le=60, description="Latency budget in seconds (default: PIPELINE_DEADLINE)."
+    )
+
+
+class BatchRequest(BaseModel):
+    inputs: List[MoodText] = Field(..., min_length=1, max_length=API_MAX_BATCH)
+
+
+def detection_response(moods, extracted_words, detected_moods):
+    """Builds the mood part of an API response."""
+    return {
+        "status": mood_status(moods),
+        "moods": moods,
+        "extracted_words": extracted_words,
+        "detected_moods": detected_moods,
+    }
+
+
+def recommendation_response(result):
+    """Builds the API response of a pipeline result (without the catalog)."""
+    return {
+        **detection_response(result["moods"], result["extracted_words"], result["detected_moods"]),
+        "recommendations": result["recommendations"],
+        "tier": result["tier"],
+        "tiers": result["tiers"],
+        "timings": result["timings"],
+    }
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return metrics.render_prometheus()
+
+
+@app.post("/detect-mood")
+async def detect(request: MoodRequest):
+    return detection_response(*await detect_mood_async(request.text))
+
+
+@app.post("/recommend")
+async def recommend(request: RecommendRequest):
+    if request.deadline is None:
+        return recommendation_response(await recommend_async(request.text))
+    return recommendation_response(await recommend_async(request.text, deadline=request.deadline))
+
+
+@app.post("/recommend/batch")
+async def recommend_batch(request: BatchRequest):
+    """
+    Recommends movies for many inputs at once:
+    - The catalog is fetched (or read from the weekly cache) once for the batch.
+    - Identical inputs are processed once.
+    - At most `API_BATCH_CONCURRENCY` inputs are in flight at a time.
+    """
+    movies = await asyncio.to_thread(fetch_movies, CATALOG_SIZE)
+    semaphore = asyncio.Semaphore(API_BATCH_CONCURRENCY)
+
+    async def run(text):
+        async with semaphore:
+            return recommendation_response(await recommend_async(text, movies=movies))
+
+    unique_inputs = list(dict.fromkeys(request.inputs))
+    responses = dict(zip(unique_inputs, await asyncio.gather(*(run(text) for text in unique_inputs))))
+    return {"results": [{"text": text, **responses[text]} for text in request.inputs]}
+
+
+if __name__ == "__main__":
+    uvicorn.run("api:app", host=API_HOST, port=API_PORT, workers=API_WORKERS)
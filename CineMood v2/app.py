@@ -1,6 +1,20 @@
 import streamlit as st
-from llm import detect_mood, get_movies_by_mood
-from tmdb_api import fetch_movies
+import metrics
+import posters
+import warmup
+from config import POSTER_PREFETCH, POSTER_WIDTH, STREAM_RECOMMENDATIONS
+from pipeline import CATALOG_SIZE, prepare_recommendation, rank_recommendation, stream_recommendation
+
+def render_movie(movie):
+    """Renders one recommended movie card."""
+    st.subheader(movie["title"])
+    st.write(f"📅 Release Date: {movie['release_date']}")
+    st.write(f"🎭 Match Reason: {movie.get('match_reason', 'Trending movie recommendation.')}")
+    if movie["poster"]:
+        # ✅ Serve a cached thumbnail sized for the card, falling back to the TMDB URL
+        st.image(posters.poster_image(movie.get("poster_path"), POSTER_WIDTH) or movie["poster"], width=POSTER_WIDTH)
+    st.write(f"📜 Overview: {movie['overview']}")
+    st.markdown("---")
 
 def run_app():
     """
@@ -11,6 +25,9 @@ def run_app():
         page_title="🎬 Mood-Based Movie Recommendation", 
         layout="centered"
     )
+    metrics.start_exporter()  # ✅ No-op unless METRICS_PORT or METRICS_FILE is set; runs once per process
+    # ✅ Warms the catalog, indexes, popular rankings and posters in the background (at startup and weekly rollovers)
+    warmup.start(CATALOG_SIZE, hooks=[posters.prefetch] if POSTER_PREFETCH else [])
 
     st.title("🎬 CineMood: Get Mood-Based Trending Movies! ⚡")
 
@@ -22,39 +39,34 @@ def run_app():
 
     if st.button("Find Movies"):
         if user_mood.strip():
-            with st.spinner("🔍 Analyzing your mood..."):
-                valid_moods, extracted_words, detected_moods = detect_mood(user_mood)
+            with st.spinner("🔍 Analyzing your mood and fetching trending movies..."):
+                result = prepare_recommendation(user_mood)
+            valid_moods, extracted_words = result["moods"], result["extracted_words"]
 
-            if valid_moods == ["invalid"]:
+            if result["status"] == "invalid":
                 st.warning("⚠️ That doesn't look like a mood. Please describe how you're feeling.")
             else:
                 st.success(f"🤖 AI Detected Moods: {', '.join(valid_moods).title()}")
 
-                with st.spinner("🎥 Fetching movies and ranking matches..."):
-                    movies = fetch_movies(60)
-
-                    if valid_moods == ["neutral", "neutral", "neutral"]:
-                        st.info("🎭 We couldn't be sure about your moods, so let us guess. Here are some trending movies you might enjoy!")
+                if result["status"] == "neutral":
+                    st.info("🎭 We couldn't be sure about your moods, so let us guess. Here are some trending movies you might enjoy!")
+                    if extracted_words:
+                        st.write(f"🔍 AI detected these key words from your input: **{', '.join(extracted_words)}**")
 
-                        if extracted_words:
-                            st.write(f"🔍 AI detected these key words from your input: **{', '.join(extracted_words)}**")
-                            recommended_movies = get_movies_by_mood(extracted_words, movies)
-                        else:
-                            recommended_movies = movies[:3]
+                with st.spinner("🎥 Ranking movie matches..."):
+                    if STREAM_RECOMMENDATIONS:
+                        # ✅ Show each movie as soon as GPT has chosen it
+                        for movie in stream_recommendation(result):
+                            render_movie(movie)
                     else:
-                        recommended_movies = get_movies_by_mood(valid_moods, movies)
+                        for movie in rank_recommendation(result)["recommendations"]:
+                            render_movie(movie)
 
-                if recommended_movies:
-                    for movie in recommended_movies:
-                        st.subheader(movie["title"])
-                        st.write(f"📅 Release Date: {movie['release_date']}")
-                        st.write(f"🎭 Match Reason: {movie.get('match_reason', 'Trending movie recommendation.')}")
-                        if movie["poster"]:
-                            st.image(movie["poster"], width=200)
-                        st.write(f"📜 Overview: {movie['overview']}")
-                        st.markdown("---")
-                else:
+                if not result["recommendations"]:
                     st.warning("⚠️ No suitable movie recommendations found.")
+
+            st.caption("⏱️ " + " · ".join(f"{stage}: {seconds:.2f}s" for stage, seconds in result["timings"].items())
+                       + f" · tier: {result['tier']}")
         else:
             st.warning("⚠️ Please enter how you feel to get movie recommendations.")
 
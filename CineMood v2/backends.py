@@ -0,0 +1,206 @@
+"""
+LLM backends of the three LLM tasks of `llm.py`: mood detection ("detect"), mood mapping ("map")
+and ranking ("rank", including match reasons and affinity scores).
+
+A backend is a name, a chat model and sync/async clients with the `client.chat.completions.create(...)`
+interface of the OpenAI SDK, so prompts, parsing, caches, coalescing and fallbacks are shared by all backends:
+- "openai": the OpenAI API (`OPENAI_MODEL`) through the resilient clients of `llm_client.py`.
+- "compatible": any OpenAI-compatible server (`COMPATIBLE_BASE_URL`, `COMPATIBLE_MODEL`), e.g. vLLM,
+  a llama.cpp server or Ollama, with the same retries and its own circuit breaker.
+- "local": `LocalEngine`, a deterministic in-process CPU engine answering CineMood's prompts with the mood
+  lexicon and TF-IDF scoring. No network, no tokens: for offline load tests, or as the fastest backend.
+
+`LLM_BACKEND` selects the backend of every task; `LLM_BACKEND_DETECT`, `LLM_BACKEND_MAP` and `LLM_BACKEND_RANK`
+route single tasks to another one (e.g. detection on the local engine, ranking on OpenAI).
+"""
+import json
+import re
+from types import SimpleNamespace
+
+import llm_client
+from affinity import default_reason
+from config import (
+    COMPATIBLE_API_KEY, COMPATIBLE_BASE_URL, COMPATIBLE_MODEL, LLM_BACKEND_DETECT, LLM_BACKEND_MAP, LLM_BACKEND_RANK,
+    OPENAI_MODEL
+)
+from input_cache import FILLER_WORDS
+from mood_lexicon import fill_moods, find_moods, tokenize
+from moods import VALID_MOOD_WORDS
+from overviews import WORDS_PER_TOKEN, truncate
+from prompts import (
+    AFFINITY_PROMPT, DETECT_MOOD_PROMPT, MAP_MOOD_PROMPT, RANKING_PROMPT, STRUCTURED_MOOD_PROMPT, SUMMARY_PROMPT
+)
+from retrieval import STOP_WORDS, build_index, score_movies
+
+BACKENDS = ("openai", "compatible", "local")
+TASKS = ("detect", "map", "rank")
+
+# Model name of the local engine (part of the ranking cache keys, like the other backends' models)
+LOCAL_MODEL = "cinemood-local"
+
+# Start of an entry of the numbered movie lists built by `prompts.ranking_messages` and `affinity_messages`
+_NUMBERED_ENTRY = re.compile(r"^(\d+)\. ", re.MULTILINE)
+
+
+class Backend:
+    """An LLM backend: its name, chat model and sync/async clients."""
+
+    def __init__(self, name, model, client, async_client):
+        self.name = name
+        self.model = model
+        self.client = client
+        self.async_client = async_client
+
+    def __repr__(self):
+        return f"Backend({self.name!r}, model={self.model!r})"
+
+
+def lexical_detection(user_input):
+    """
+    Detects moods without an LLM (deadline fallback of the pipeline, and the local backend's detection).
+    Returns the `detect_mood` triple: the moods named in the input (not negated, even ambiguous ones),
+    else neutral moods with the input's key words.
+    """
+    matches = [(mood, words) for mood, words, negated in find_moods(user_input) if not negated]
+    if matches:
+        detected_moods = list(dict.fromkeys(mood for mood, _ in matches))
+        return fill_moods(detected_moods), list(dict.fromkeys(words for _, words in matches)), detected_moods
+
+    key_words = [
+        token for token in tokenize(user_input)
+        if len(token) > 1 and token not in STOP_WORDS and token not in FILLER_WORDS
+    ]
+    return ["neutral", "neutral", "neutral"], list(dict.fromkeys(key_words))[:5], []
+
+
+def split_movie_request(content, prefix):
+    """
+    Splits the user message of a ranking or affinity prompt ("<prefix>a, b.\\n\\nMovies:\\n1. ...")
+    into its mood (or key) words and the descriptions of the numbered movies.
+    """
+    header, _, listing = content.partition("\n\nMovies:\n")
+    words = [word.strip() for word in header[len(prefix):].rstrip(".").split(",") if word.strip()]
+
+    # ✅ Only consecutive numbers start an entry, so "1. " inside an overview is kept in its description
+    entries = []
+    for match in _NUMBERED_ENTRY.finditer(listing):
+        if int(match.group(1)) == len(entries) + 1:
+            entries.append(match)
+    descriptions = [
+        listing[match.end():entries[i + 1].start() if i + 1 < len(entries) else len(listing)].strip()
+        for i, match in enumerate(entries)
+    ]
+    return words, descriptions
+
+
+def _score_descriptions(words, descriptions):
+    """TF-IDF scores of movie descriptions for the words (with a one-off index: candidate lists vary per call)."""
+    movies = [{"title": "", "overview": description} for description in descriptions]
+    return score_movies(words, movies, index=build_index(movies))
+
+
+class LocalEngine:
+    """
+    Deterministic CPU engine with the `chat.completions.create` interface of the OpenAI SDK.
+    It recognizes CineMood's system prompts (see prompts.py) and answers them in the format they ask for:
+    - Mood detection: the moods named in the message (`lexical_detection`), else neutral with its key words;
+      questions without any mood are "invalid".
+    - Mood mapping: the vocabulary moods found in (or stemming from) the free-form moods.
+    - Ranking: the top 3 movies by TF-IDF similarity, with a generic match reason.
+    - Affinity scores: TF-IDF similarities scaled to 0-10.
+    - Summaries: the extractive overviews (`overviews.truncate`) within the word limit.
+    """
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model=LOCAL_MODEL, messages=(), stream=False, **options):
+        content = self.answer(messages)
+        if stream:
+            return iter([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))],
+                                         usage=None)])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+    def answer(self, messages):
+        """Returns the reply text to chat `messages` built by prompts.py."""
+        system_prompt = messages[0]["content"] if messages else ""
+        user_content = messages[-1]["content"] if messages else ""
+        if system_prompt in (STRUCTURED_MOOD_PROMPT, DETECT_MOOD_PROMPT):
+            return self.detect(user_content)
+        if system_prompt == MAP_MOOD_PROMPT:
+            return self.map(user_content)
+        if system_prompt == RANKING_PROMPT:
+            return self.rank(user_content)
+        if system_prompt == AFFINITY_PROMPT:
+            return self.score(user_content)
+        if system_prompt == SUMMARY_PROMPT:
+            return self.summarize(user_content)
+        raise ValueError("The local engine only answers CineMood's prompts")
+
+    def detect(self, user_input):
+        moods, extracted_words, detected_moods = lexical_detection(user_input)
+        if not detected_moods and (user_input.rstrip().endswith("?") or not extracted_words):
+            return json.dumps({"detected_moods": ["invalid"], "extracted_words": []})
+        return json.dumps({"detected_moods": moods, "extracted_words": extracted_words})
+
+    def map(self, user_content):
+        mood_words = user_content.split(":", 1)[-1].split(",")
+        moods = [mood for word in mood_words for mood, _, negated in find_moods(word) if not negated]
+        return ", ".join(fill_moods(moods))
+
+    def rank(self, user_content):
+        words, descriptions = split_movie_request(user_content, "My moods: ")
+        scores = _score_descriptions(words, descriptions)
+        top = sorted(range(len(descriptions)), key=lambda i: (-scores[i], i))[:3]
+        mood = next((word for word in words if word in VALID_MOOD_WORDS and word != "neutral"), None)
+        return json.dumps([{"index": i + 1, "match_reason": default_reason(mood)} for i in top])
+
+    def score(self, user_content):
+        moods, descriptions = split_movie_request(user_content, "Moods: ")
+        return json.dumps({
+            mood: [round(float(score) * 10) for score in _score_descriptions([mood], descriptions)] for mood in moods
+        })
+
+    def summarize(self, user_content):
+        limit, descriptions = split_movie_request(user_content, "Word limit: ")
+        budget = int(int(limit[0]) / WORDS_PER_TOKEN)
+        return json.dumps({
+            "summaries": [truncate(description.split(": ", 1)[-1], budget) for description in descriptions]
+        })
+
+
+class AsyncLocalEngine(LocalEngine):
+    """Async variant of `LocalEngine` (the work is CPU-bound and takes about a millisecond)."""
+
+    async def create(self, model=LOCAL_MODEL, messages=(), stream=False, **options):
+        return LocalEngine.create(self, model, messages, stream, **options)
+
+
+def create_backend(name):
+    """Builds the backend called `name` (one of `BACKENDS`)."""
+    if name == "openai":
+        return Backend(name, OPENAI_MODEL, llm_client.create_client(), llm_client.create_async_client())
+    if name == "compatible":
+        circuit_breaker = llm_client.CircuitBreaker(name="Compatible server")
+        return Backend(
+            name, COMPATIBLE_MODEL,
+            llm_client.create_client(COMPATIBLE_API_KEY, COMPATIBLE_BASE_URL, circuit_breaker),
+            llm_client.create_async_client(COMPATIBLE_API_KEY, COMPATIBLE_BASE_URL, circuit_breaker),
+        )
+    if name == "local":
+        return Backend(name, LOCAL_MODEL, LocalEngine(), AsyncLocalEngine())
+    raise ValueError(f"Unknown LLM backend {name!r} (expected one of: {', '.join(BACKENDS)})")
+
+
+def create_routes(default_backend):
+    """
+    Returns the backend of each task: `default_backend`, unless `LLM_BACKEND_<TASK>` names another one.
+    Tasks routed to the same backend share one instance (and its connection pool).
+    """
+    backends = {default_backend.name: default_backend}
+    routes = {}
+    for task, name in zip(TASKS, (LLM_BACKEND_DETECT, LLM_BACKEND_MAP, LLM_BACKEND_RANK)):
+        if name not in backends:
+            backends[name] = create_backend(name)
+        routes[task] = backends[name]
+    return routes
@@ -0,0 +1,78 @@
+import json
+import os
+import random
+
+from moods import MOOD_FAMILIES
+
+OPENINGS = [
+    "When {who} discovers a {thing}, {pronoun} must",
+    "After a {thing} turns everything upside down, {who} sets out to",
+    "In a small town shaken by a {thing}, {who} tries to",
+    "Years after a {thing}, {who} returns home to",
+    "Caught in the middle of a {thing}, {who} has one week to",
+]
+WHO = ["a retired detective", "two estranged sisters", "a shy teenager", "a struggling musician",
+       "a young astronaut", "an unlikely group of friends", "a widowed father", "a rookie chef"]
+THINGS = ["family secret", "mysterious letter", "stolen painting", "failed experiment", "forgotten promise",
+          "strange signal", "sudden inheritance", "rival's challenge"]
+GOALS = ["find the truth", "win back the people they love", "stop a dangerous plan", "start over",
+         "save the festival", "survive the night", "finish what they started", "face their past"]
+
+
+def synthetic_tmdb_results(size=60, seed=7):
+    """
+    Builds a deterministic list of `size` fake TMDB trending results (raw API shape, trending order).
+    Overviews mix story templates with mood-family keywords so local and LLM ranking have signal.
+    """
+    rng = random.Random(seed)
+    families = sorted(MOOD_FAMILIES)
+    results = []
+    for i in range(size):
+        keywords = MOOD_FAMILIES[families[i % len(families)]]["keywords"]
+        opening = rng.choice(OPENINGS).format(who=rng.choice(WHO), thing=rng.choice(THINGS), pronoun="they")
+        overview = (
+            f"{opening} {rng.choice(GOALS)}. "
+            f"A {rng.choice(keywords)} story full of {rng.choice(keywords)} and {rng.choice(keywords)}, "
+            f"where every {rng.choice(keywords)} moment leads to an unforgettable {rng.choice(keywords)}."
+        )
+        results.append({
+            "id": 1000 + i,
+            "title": f"Movie {i + 1}",
+            "overview": overview,
+            "poster_path": None,
+            "release_date": f"20{10 + i % 15:02d}-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            "popularity": round(1000 / (i + 1), 3),
+        })
+    return results
+
+
+def synthetic_catalog(size=60, seed=7):
+    """Builds a deterministic catalog of `size` fake movies shaped like `fetch_movies` results."""
+    movies = [
+        {
+            "id": result["id"],
+            "title": result["title"],
+            "overview": result["overview"],
+            "poster": None,
+            "poster_path": None,
+            "release_date": result["release_date"],
+            "popularity": result["popularity"],
+        }
+        for result in synthetic_tmdb_results(size, seed)
+    ]
+    return sorted(movies, key=lambda x: x["release_date"], reverse=True)
+
+
+def load_catalog(size=60):
+    """Returns the largest locally cached TMDB catalog if one exists, otherwise a synthetic catalog."""
+    from config import CACHE_DIR  # imported lazily, so the stub servers can be set up before config loads
+
+    try:
+        with open(os.path.join(CACHE_DIR, "catalog.json"), "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        catalogs = [entry["value"] for entry in entries.values()]
+        if catalogs:
+            return max(catalogs, key=len)[:size]
+    except (OSError, ValueError, KeyError):
+        pass
+    return synthetic_catalog(size)
@@ -0,0 +1,98 @@
+"""
+Benchmark of overview compression in ranking prompts: token reduction versus ranking agreement.
+
+For every mood set, the `RANKING_TOP_K` pre-ranked candidates are ranked once with their full overviews (the
+reference) and once per overview budget with compressed overviews (`overviews.truncate`, and LLM summaries with
+`--summaries`). Reports the prompt tokens, their reduction, and how closely each ranking follows the reference:
+- top-1 agreement: share of mood sets whose first movie is the reference's.
+- top-3 overlap: share of the reference's top 3 movies that are still in the top 3.
+
+Rankings come from the local backend by default (offline, TF-IDF similarity), or from another backend
+(`--backend openai` measures the agreement of the real ranking model).
+
+Usage (from the `CineMood v2` directory):
+    python -m benchmarks.compression
+    python -m benchmarks.compression --budgets 80 60 40 20 --catalog-size 200
+    python -m benchmarks.compression --backend openai --summaries
+"""
+import argparse
+import os
+import statistics
+
+from benchmarks.catalog import load_catalog
+
+
+def run(catalog_size, budgets, summaries):
+    """Runs the benchmark and returns one result row per overview variant (the first one is the reference)."""
+    import llm
+    from benchmarks.prerank import MOOD_TRIPLES
+    from config import OVERVIEW_TOKENS, RANKING_TOP_K
+    from overviews import truncate
+    from prompts import count_message_tokens, ranking_messages
+
+    movies = load_catalog(catalog_size)
+    requests = [
+        (moods, [movies[i] for i in llm.select_candidates(moods, movies, RANKING_TOP_K)]) for moods in MOOD_TRIPLES
+    ]
+
+    variants = [("full", 0, {})] + [(f"extractive {budget}", budget, {}) for budget in budgets]
+    if summaries:
+        candidates = list({movie["id"]: movie for _, candidates in requests for movie in candidates}.values())
+        texts = dict(zip((movie["id"] for movie in candidates), llm.summarize_overviews(candidates)))
+        variants.append((f"summary {OVERVIEW_TOKENS}", OVERVIEW_TOKENS, texts))
+
+    references = []
+    rows = []
+    for name, budget, texts in variants:
+        tokens, top1, top3 = [], [], []
+        for i, (moods, candidates) in enumerate(requests):
+            compressed = [
+                dict(movie, overview=truncate(texts.get(movie["id"]) or movie["overview"], budget))
+                for movie in candidates
+            ]
+            messages = ranking_messages(moods, compressed)
+            response = llm.complete("rank", messages)
+            ranking = [
+                index for index, _ in llm.parse_ranking(response.choices[0].message.content, range(len(candidates)))
+            ]
+            if not rows:
+                references.append(ranking)
+            reference = references[i]
+
+            tokens.append(count_message_tokens(messages))
+            top1.append(bool(ranking and reference) and ranking[0] == reference[0])
+            top3.append(len(set(ranking[:3]) & set(reference[:3])) / max(1, len(reference[:3])))
+
+        rows.append({
+            "variant": name,
+            "prompt_tokens": statistics.mean(tokens),
+            "top1_agreement": statistics.mean(top1),
+            "top3_overlap": statistics.mean(top3),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark overview compression in ranking prompts.")
+    parser.add_argument("--catalog-size", type=int, default=60)
+    parser.add_argument("--budgets", type=int, nargs="+", default=[80, 60, 40, 20], help="overview token budgets")
+    parser.add_argument("--backend", choices=["local", "openai", "compatible"], default="local",
+                        help="LLM backend ranking (and summarizing) the movies")
+    parser.add_argument("--summaries", action="store_true", help="also rank with LLM summaries of the overviews")
+    args = parser.parse_args()
+
+    # ✅ Configure the backend before CineMood's modules are imported (config reads the environment once)
+    os.environ["LLM_BACKEND_RANK"] = args.backend
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+    rows = run(args.catalog_size, args.budgets, args.summaries)
+
+    baseline = rows[0]
+    print(f"{'variant':<16} {'tokens':>8} {'saved':>7} {'top-1':>7} {'top-3':>7}")
+    for row in rows:
+        saving = 1 - row["prompt_tokens"] / baseline["prompt_tokens"]
+        print(f"{row['variant']:<16} {row['prompt_tokens']:>8.0f} {saving:>7.0%} "
+              f"{row['top1_agreement']:>7.0%} {row['top3_overlap']:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark of the local pre-ranking stage in `get_movies_by_mood`.
+
+Compares the full-catalog prompt (top_k=0) with pre-ranked prompts for several K values:
+- Prompt tokens (counted by `prompts.count_message_tokens`).
+- Local pre-ranking time.
+- End-to-end ranking latency, either against a simulated LLM whose latency grows with prompt size
+  (default, fully offline) or against the real OpenAI API (`--live`).
+
+Usage (from the `CineMood v2` directory):
+    python -m benchmarks.prerank
+    python -m benchmarks.prerank --catalog-size 200 --top-k 10 20 30
+    python -m benchmarks.prerank --live
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import config  # noqa: F401  (loads .env before the offline placeholder key below)
+
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+import llm  # noqa: E402
+from benchmarks.catalog import load_catalog  # noqa: E402
+from prompts import count_message_tokens, ranking_messages  # noqa: E402
+from retrieval import rank_movies  # noqa: E402
+
+MOOD_TRIPLES = [
+    ["happy", "excited", "hyped"],
+    ["sad", "lonely", "nostalgic"],
+    ["tired", "stressed", "overwhelmed"],
+    ["angry", "frustrated", "bitter"],
+    ["romantic", "loving", "tender"],
+    ["anxious", "nervous", "worried"],
+    ["bored", "meh", "listless"],
+    ["hopeful", "inspired", "optimistic"],
+]
+
+
+def simulated_client(base_latency, ms_per_1k_tokens):
+    """Builds a fake OpenAI client whose latency grows linearly with the prompt size."""
+
+    def create(model, messages, **kwargs):
+        tokens = count_message_tokens(messages)
+        time.sleep(base_latency + tokens / 1000 * ms_per_1k_tokens / 1000)
+        content = json.dumps([{"index": i, "match_reason": "Simulated reason."} for i in (1, 2, 3)])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def run(catalog_size, top_ks):
+    """Runs the benchmark and returns one result row per K value (K=0 is the full catalog)."""
+    movies = load_catalog(catalog_size)
+    rows = []
+    for top_k in [0] + top_ks:
+        tokens, prerank_ms, latency_ms = [], [], []
+        for moods in MOOD_TRIPLES:
+            start = time.perf_counter()
+            if top_k and len(movies) > top_k:
+                candidates = [movies[i] for i in rank_movies(moods, movies, top_k)]
+            else:
+                candidates = movies
+            prerank_ms.append((time.perf_counter() - start) * 1000)
+            tokens.append(count_message_tokens(ranking_messages(moods, candidates)))
+
+            start = time.perf_counter()
+            llm.get_movies_by_mood(moods, movies, top_k=top_k, use_cache=False)
+            latency_ms.append((time.perf_counter() - start) * 1000)
+
+        rows.append({
+            "top_k": top_k or len(movies),
+            "prompt_tokens": statistics.mean(tokens),
+            "prerank_ms": statistics.mean(prerank_ms),
+            "latency_ms": statistics.mean(latency_ms),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark local pre-ranking for get_movies_by_mood.")
+    parser.add_argument("--catalog-size", type=int, default=60)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[10, 15, 20])
+    parser.add_argument("--live", action="store_true", help="call the real OpenAI API instead of a simulation")
+    parser.add_argument("--base-latency", type=float, default=0.3, help="simulated fixed latency (seconds)")
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=150, help="simulated latency per 1k tokens")
+    args = parser.parse_args()
+
+    if args.live:
+        rows = run(args.catalog_size, args.top_k)
+    else:
+        with patch.object(llm.backend, "client", simulated_client(args.base_latency, args.ms_per_1k_tokens)):
+            rows = run(args.catalog_size, args.top_k)
+
+    baseline = rows[0]
+    print(f"{'K':>6} {'tokens':>8} {'saved':>7} {'prerank ms':>11} {'latency ms':>11} {'saved':>7}")
+    for row in rows:
+        token_saving = 1 - row["prompt_tokens"] / baseline["prompt_tokens"]
+        latency_saving = 1 - row["latency_ms"] / baseline["latency_ms"]
+        print(
+            f"{row['top_k']:>6} {row['prompt_tokens']:>8.0f} {token_saving:>7.0%} "
+            f"{row['prerank_ms']:>11.2f} {row['latency_ms']:>11.0f} {latency_saving:>7.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
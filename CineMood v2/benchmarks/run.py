@@ -0,0 +1,206 @@
+"""
+Offline end-to-end benchmark of the CineMood pipeline against local TMDB and OpenAI stand-ins.
+
+Starts the stub servers from `benchmarks.stubs` on free localhost ports, points CineMood at them
+(`TMDB_BASE_URL`, `OPENAI_BASE_URL`/`COMPATIBLE_BASE_URL`, a temporary `CINEMOOD_CACHE_DIR`) and runs each scenario
+with a pool of concurrent callers:
+- detect_mood: mood detection for a fixed set of inputs (lexicon hits and LLM calls).
+- fetch_movies: catalog retrieval (cold, then from the weekly cache).
+- get_movies_by_mood: pre-ranking plus GPT ranking, without the ranking cache.
+- recommend: the full pipeline (with `--deadline`, also the tiers that served the responses).
+
+Reports p50/p95/p99 latency, throughput and token usage per scenario, saves them as JSON under
+`benchmarks/results/`, and compares with an earlier results file (`--compare`).
+
+Usage (from the `CineMood v2` directory):
+    python -m benchmarks.run
+    python -m benchmarks.run --requests 200 --concurrency 16 --llm-latency 0.4 --error-rate 0.02
+    python -m benchmarks.run --scenario recommend --llm-latency 2 --deadline 1.5
+    python -m benchmarks.run --backend local    # LLM tasks on the in-process local engine (see backends.py)
+    python -m benchmarks.run --compare benchmarks/results/baseline.json
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stubs import StubSettings, start_stubs
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+INPUTS = [
+    "I'm so happy and excited about the weekend!",
+    "Feeling lonely and a little nostalgic tonight",
+    "Work has me stressed and completely exhausted",
+    "I just want something to take my mind off things",
+    "Not sure how I feel, kind of empty",
+    "My cat made me laugh all day",
+    "I'm anxious about tomorrow's exam",
+    "What time is it?",
+]
+MOOD_TRIPLES = [
+    ["happy", "excited", "hyped"],
+    ["sad", "lonely", "nostalgic"],
+    ["tired", "stressed", "overwhelmed"],
+    ["anxious", "nervous", "worried"],
+]
+
+
+def percentile(values, fraction):
+    """Returns the `fraction` percentile of `values` (nearest rank)."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def run_scenario(function, arguments, concurrency):
+    """Calls `function(argument)` for every argument with `concurrency` callers; returns latency statistics."""
+
+    def timed_call(argument):
+        start = time.perf_counter()
+        function(argument)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(timed_call, arguments))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(latencies),
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+    }
+
+
+def run(args):
+    """Runs every scenario against fresh stub servers and returns the results dict."""
+    tmdb_settings = StubSettings(latency=args.tmdb_latency, jitter=args.tmdb_latency / 4,
+                                 error_rate=args.error_rate, seed=1)
+    openai_settings = StubSettings(latency=args.llm_latency, jitter=args.llm_latency / 4,
+                                   error_rate=args.error_rate,
+                                   seconds_per_1k_prompt_tokens=args.ms_per_1k_tokens / 1000,
+                                   seconds_per_completion_token=args.ms_per_completion_token / 1000, seed=2)
+    tmdb_stub, openai_stub = start_stubs(tmdb_settings, openai_settings)
+
+    with tmdb_stub, openai_stub, tempfile.TemporaryDirectory() as cache_dir:
+        # ✅ Configure CineMood before its modules are imported (config reads the environment once)
+        os.environ["TMDB_BASE_URL"] = tmdb_stub.url
+        os.environ["OPENAI_BASE_URL"] = os.environ["COMPATIBLE_BASE_URL"] = f"{openai_stub.url}/v1"
+        os.environ["OPENAI_API_KEY"] = "offline-benchmark"
+        os.environ["TMDB_API_KEY"] = "offline-benchmark"
+        os.environ["CINEMOOD_CACHE_DIR"] = cache_dir
+        os.environ["LLM_BACKEND"] = args.backend
+
+        import llm
+        import metrics
+        import pipeline
+        import tmdb_api
+
+        inputs = [INPUTS[i % len(INPUTS)] for i in range(args.requests)]
+        moods = [MOOD_TRIPLES[i % len(MOOD_TRIPLES)] for i in range(args.requests)]
+        catalog = tmdb_api.fetch_movies(args.catalog_size, use_cache=False)
+        served_tiers = []
+
+        def recommend(text):
+            served_tiers.append(pipeline.recommend(text, args.catalog_size, args.deadline)["tier"])
+
+        scenarios = {
+            "detect_mood": (llm.detect_mood, inputs),
+            "fetch_movies_cold": (
+                lambda _: tmdb_api.fetch_movies(args.catalog_size, use_cache=False),
+                range(max(1, args.requests // 10)),
+            ),
+            "fetch_movies_cached": (lambda _: tmdb_api.fetch_movies(args.catalog_size), range(args.requests)),
+            "get_movies_by_mood": (
+                lambda words: llm.get_movies_by_mood(words, catalog, use_cache=False), moods
+            ),
+            "recommend": (recommend, inputs),
+        }
+
+        results = {}
+        for name, (function, arguments) in scenarios.items():
+            if args.scenario and name not in args.scenario:
+                continue
+            tmdb_before, openai_before = tmdb_stub.snapshot(), openai_stub.snapshot()
+            row = run_scenario(function, list(arguments), args.concurrency)
+            tmdb_after, openai_after = tmdb_stub.snapshot(), openai_stub.snapshot()
+            row.update({
+                "tmdb_requests": tmdb_after["requests"] - tmdb_before["requests"],
+                "llm_requests": openai_after["requests"] - openai_before["requests"],
+                "injected_errors": (tmdb_after["errors"] - tmdb_before["errors"]
+                                    + openai_after["errors"] - openai_before["errors"]),
+                "prompt_tokens": openai_after["prompt_tokens"] - openai_before["prompt_tokens"],
+                "completion_tokens": openai_after["completion_tokens"] - openai_before["completion_tokens"],
+            })
+            if name == "recommend":
+                row["tiers"] = dict(Counter(served_tiers))
+            results[name] = row
+        counters = metrics.snapshot()
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("compare", "output")},
+        "scenarios": results,
+        "metrics": counters,
+    }
+
+
+def print_results(results, baseline=None):
+    """Prints one line per scenario, with the p50/p95 change against `baseline` when given."""
+    print(f"{'scenario':<22} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8} "
+          f"{'LLM calls':>9} {'tokens':>9}")
+    for name, row in results["scenarios"].items():
+        line = (
+            f"{name:<22} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} "
+            f"{row['throughput_rps']:>8.1f} {row['llm_requests']:>9} "
+            f"{row['prompt_tokens'] + row['completion_tokens']:>9}"
+        )
+        previous = (baseline or {}).get("scenarios", {}).get(name)
+        if previous:
+            line += (f"   p50 {row['p50_ms'] / previous['p50_ms'] - 1:+.0%}"
+                     f"  p95 {row['p95_ms'] / previous['p95_ms'] - 1:+.0%}")
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark with local API stand-ins.")
+    parser.add_argument("--requests", type=int, default=64, help="calls per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--catalog-size", type=int, default=60)
+    parser.add_argument("--scenario", nargs="+", help="run only these scenarios")
+    parser.add_argument("--tmdb-latency", type=float, default=0.05, help="stub TMDB latency per page (seconds)")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="stub OpenAI base latency (seconds)")
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=150, help="stub latency per 1k prompt tokens")
+    parser.add_argument("--ms-per-completion-token", type=float, default=5, help="stub latency per output token")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub requests failing")
+    parser.add_argument("--backend", choices=["openai", "compatible", "local"], default="openai",
+                        help="LLM backend (openai and compatible both call the OpenAI stub)")
+    parser.add_argument("--deadline", type=float, default=0.0, help="recommendation deadline (seconds, 0 = none)")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = run(args)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark of two-stage retrieval as the catalog grows (fully offline).
+
+For synthetic catalogs of increasing size, measures:
+- Offline index build time and index size (`retrieval.build_index`).
+- Candidate retrieval latency (`rank_movies` top-k over the whole catalog).
+- End-to-end ranking latency (`get_movies_by_mood`: retrieval, then the re-rank of the `RANKING_TOP_K` candidates
+  by the local backend) and the re-rank prompt size, which should stay flat whatever the catalog size.
+
+Usage (from the `CineMood v2` directory):
+    python -m benchmarks.scale
+    python -m benchmarks.scale --sizes 1000 10000 50000 --repeats 20
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+# ✅ Set before config loads: the re-rank runs on the local backend, indexes go to a temporary directory
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+os.environ["LLM_BACKEND_RANK"] = "local"
+os.environ["VECTOR_INDEX_DIR"] = tempfile.mkdtemp(prefix="cinemood-vector-index-")
+
+import llm  # noqa: E402
+import retrieval  # noqa: E402
+from benchmarks.catalog import synthetic_catalog  # noqa: E402
+from benchmarks.prerank import MOOD_TRIPLES  # noqa: E402
+from catalog_store import Catalog  # noqa: E402
+from config import RANKING_TOP_K  # noqa: E402
+from prompts import count_message_tokens, ranking_messages  # noqa: E402
+
+
+def percentile(values, fraction):
+    """Returns the `fraction` percentile of `values` (nearest rank)."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(sizes, repeats):
+    """Runs the benchmark and returns one result row per catalog size."""
+    rows = []
+    for size in sizes:
+        movies = Catalog(synthetic_catalog(size))
+
+        start = time.perf_counter()
+        index = retrieval.build_index(movies)
+        build_s = time.perf_counter() - start
+        index_mb = sum(index[name].nbytes for name in ("idf", "indptr", "documents", "weights")) / 1e6
+        retrieval.get_index(movies)
+
+        retrieval_ms, ranking_ms, tokens = [], [], []
+        for _ in range(repeats):
+            for moods in MOOD_TRIPLES:
+                start = time.perf_counter()
+                candidates = retrieval.rank_movies(moods, movies, RANKING_TOP_K)
+                retrieval_ms.append((time.perf_counter() - start) * 1000)
+
+                start = time.perf_counter()
+                llm.get_movies_by_mood(moods, movies, use_cache=False)
+                ranking_ms.append((time.perf_counter() - start) * 1000)
+                tokens.append(count_message_tokens(ranking_messages(moods, [movies[i] for i in candidates])))
+
+        rows.append({
+            "movies": size,
+            "build_s": build_s,
+            "index_mb": index_mb,
+            "retrieval_p50_ms": statistics.median(retrieval_ms),
+            "retrieval_p95_ms": percentile(retrieval_ms, 0.95),
+            "ranking_p50_ms": statistics.median(ranking_ms),
+            "ranking_p95_ms": percentile(ranking_ms, 0.95),
+            "prompt_tokens": statistics.mean(tokens),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark two-stage retrieval on growing catalogs.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000, 50000])
+    parser.add_argument("--repeats", type=int, default=10, help="runs of every mood set per catalog")
+    args = parser.parse_args()
+
+    try:
+        rows = run(args.sizes, args.repeats)
+    finally:
+        shutil.rmtree(os.environ["VECTOR_INDEX_DIR"], ignore_errors=True)
+
+    print(f"{'movies':>7} {'build s':>8} {'index MB':>9} {'retrieve p50':>13} {'p95 ms':>7} "
+          f"{'rank p50':>9} {'p95 ms':>7} {'tokens':>7}")
+    for row in rows:
+        print(
+            f"{row['movies']:>7} {row['build_s']:>8.2f} {row['index_mb']:>9.1f} {row['retrieval_p50_ms']:>13.2f} "
+            f"{row['retrieval_p95_ms']:>7.2f} {row['ranking_p50_ms']:>9.2f} {row['ranking_p95_ms']:>7.2f} "
+            f"{row['prompt_tokens']:>7.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Local stand-ins for the TMDB trending endpoint and the OpenAI chat completions API.
+
+Both servers run in background threads on localhost and emulate the parts of the real APIs that
+CineMood uses, with configurable latency, jitter and error rate, so benchmarks run fully offline.
+The OpenAI stand-in answers deterministically from the prompt it receives and reports token usage.
+"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.catalog import synthetic_tmdb_results
+from mood_lexicon import fill_moods, find_moods
+from prompts import (
+    DETECT_MOOD_PROMPT, MAP_MOOD_PROMPT, RANKING_PROMPT, count_message_tokens, count_tokens
+)
+
+_NUMBERED_LINE = re.compile(r"^\d+\. ", re.MULTILINE)
+
+
+class StubSettings:
+    """Latency and failure settings of a stub server (seconds; `error_rate` between 0 and 1)."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seconds_per_1k_prompt_tokens=0.0,
+                 seconds_per_completion_token=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seconds_per_1k_prompt_tokens = seconds_per_1k_prompt_tokens
+        self.seconds_per_completion_token = seconds_per_completion_token
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def delay(self, prompt_tokens=0, completion_tokens=0):
+        """Sleeps for the configured latency plus jitter and token-proportional time."""
+        with self.lock:
+            jitter = self.random.uniform(-self.jitter, self.jitter)
+        time.sleep(max(0.0, self.latency + jitter
+                       + prompt_tokens / 1000 * self.seconds_per_1k_prompt_tokens
+                       + completion_tokens * self.seconds_per_completion_token))
+
+    def should_fail(self):
+        """Returns True for a random fraction `error_rate` of requests."""
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+
+class StubServer:
+    """Runs an HTTP handler class on a free localhost port in a daemon thread."""
+
+    def __init__(self, handler_class, settings):
+        self.settings = settings
+        self.stats = {"requests": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self.stats_lock = threading.Lock()
+        handler = type(handler_class.__name__, (handler_class,), {"server_state": self})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def record(self, **counts):
+        """Adds `counts` to the server statistics."""
+        with self.stats_lock:
+            for name, value in counts.items():
+                self.stats[name] += value
+
+    def snapshot(self):
+        """Returns a copy of the server statistics."""
+        with self.stats_lock:
+            return dict(self.stats)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    server_state = None
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output clean
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def maybe_fail(self):
+        """Sends a 503 (or 429) error for a random fraction of requests; returns True if it did."""
+        state = self.server_state
+        if not state.settings.should_fail():
+            return False
+        state.record(requests=1, errors=1)
+        with state.settings.lock:
+            status = state.settings.random.choice([429, 503])
+        self.send_json(status, {"error": {"message": "Injected stub error", "code": status}})
+        return True
+
+
+class TMDBHandler(_JsonHandler):
+    """Serves `/trending/movie/week` pages of 20 synthetic movies."""
+    catalog = synthetic_tmdb_results(1000)
+
+    def do_GET(self):
+        state = self.server_state
+        url = urlparse(self.path)
+        if not url.path.endswith("/trending/movie/week"):
+            self.send_json(404, {"status_message": "Not found"})
+            return
+        if self.maybe_fail():
+            return
+
+        state.settings.delay()
+        page = int(parse_qs(url.query).get("page", ["1"])[0])
+        results = self.catalog[(page - 1) * 20:page * 20]
+        state.record(requests=1)
+        self.send_json(200, {"page": page, "results": results, "total_pages": len(self.catalog) // 20})
+
+
+class OpenAIHandler(_JsonHandler):
+    """Serves `/chat/completions`, answering mood detection, mood mapping and ranking prompts."""
+
+    def do_POST(self):
+        state = self.server_state
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_json(404, {"error": {"message": "Not found"}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.maybe_fail():
+            return
+
+        messages = body.get("messages", [])
+        content = answer(messages, body.get("response_format"))
+        prompt_tokens = count_message_tokens(messages)
+        completion_tokens = count_tokens(content)
+        state.settings.delay(prompt_tokens, completion_tokens)
+        state.record(requests=1, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+        if body.get("stream"):
+            self.send_stream(body.get("model", "stub"), content, usage)
+        else:
+            self.send_json(200, {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+
+    def send_stream(self, model, content, usage):
+        """Sends `content` as server-sent events of a few characters each."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for i in range(0, len(content), 8):
+            chunk = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": content[i:i + 8]}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def answer(messages, response_format=None):
+    """Builds a deterministic assistant reply for CineMood's prompts."""
+    system_prompt = messages[0]["content"] if messages else ""
+    user_content = messages[-1]["content"] if messages else ""
+
+    if system_prompt == RANKING_PROMPT:
+        count = len(_NUMBERED_LINE.findall(user_content))
+        picks = [1 + (i * 7) % max(count, 1) for i in range(3)]
+        return json.dumps([
+            {"index": index, "match_reason": f"Stub reason for movie {index}."}
+            for index in dict.fromkeys(picks)
+        ])
+
+    if system_prompt == MAP_MOOD_PROMPT:
+        return "wistful, mellow, pensive"
+
+    if response_format or system_prompt == DETECT_MOOD_PROMPT:
+        matches = find_moods(user_content)
+        if matches:
+            moods = fill_moods([mood for mood, _, _ in matches])
+            words = [words for _, words, _ in matches]
+        elif user_content.strip().endswith("?"):
+            moods, words = ["invalid"], []
+        else:
+            moods, words = ["calm", "content", "mellow"], user_content.split()[:2]
+        return json.dumps({"detected_moods": moods, "extracted_words": words})
+
+    return "OK"
+
+
+def start_stubs(tmdb_settings=None, openai_settings=None):
+    """Starts the TMDB and OpenAI stand-ins; use the returned servers as context managers."""
+    tmdb = StubServer(TMDBHandler, tmdb_settings or StubSettings())
+    openai_stub = StubServer(OpenAIHandler, openai_settings or StubSettings())
+    return tmdb, openai_stub
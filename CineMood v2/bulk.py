@@ -0,0 +1,216 @@
+"""
+Bulk recommendations for JSONL workloads (campaigns, replays of logged inputs).
+
+Reads one input per line, either a JSON object with a text field (plus an optional "id") or a JSON string,
+and writes one JSON result per input line to the output file:
+- The catalog is fetched once per run and shared by every input.
+- Identical texts (after whitespace normalization) are processed once.
+- At most `--concurrency` inputs are in flight, and at most `--rate` inputs start per second.
+- The output doubles as the checkpoint: each result is flushed as soon as it is ready, and a rerun
+  skips the input lines already in the output (inputs that failed are retried).
+
+Usage (from the `CineMood v2` directory):
+    python bulk.py inputs.jsonl results.jsonl --concurrency 16 --rate 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from pipeline import CATALOG_SIZE, recommend_async
+from tmdb_api import fetch_movies
+
+
+def normalize_text(text):
+    """Collapses whitespace, so texts differing only in spacing are processed once."""
+    return " ".join(text.split())
+
+
+def read_inputs(path, field="text"):
+    """Yields (line number, id, text) for every non-empty input line; invalid lines are reported and skipped."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError as e:
+                print(f"⚠️ Skipping line {line_number}: invalid JSON ({e})", file=sys.stderr)
+                continue
+            if isinstance(entry, dict):
+                text, entry_id = entry.get(field), entry.get("id")
+            else:
+                text, entry_id = entry, None
+            if not isinstance(text, str) or not text.strip():
+                print(f"⚠️ Skipping line {line_number}: no text in field '{field}'", file=sys.stderr)
+                continue
+            yield line_number, entry_id, text
+
+
+def _truncate_partial_line(path, block_size=65536):
+    """Drops a last line cut short by an interrupted run, so new results start on a fresh line."""
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - block_size)
+            f.seek(start)
+            block = f.read(position - start)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                start += newline + 1
+                break
+            position = start
+        else:
+            start = 0
+        if start != end:
+            f.truncate(start)
+
+
+def load_checkpoint(path):
+    """
+    Reads the results of an earlier run: the completed line numbers and the results by normalized text.
+    Corrupt result lines are reported and skipped, so their inputs run again.
+    """
+    done, results = set(), {}
+    if not os.path.exists(path):
+        return done, results
+
+    _truncate_partial_line(path)
+    with open(path, "r", encoding="utf-8") as f:
+        for output_line, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                input_line, text = record["line"], normalize_text(record["text"])
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                print(f"⚠️ Ignoring corrupt result on line {output_line} of {path}: {e!r}", file=sys.stderr)
+                continue
+            done.add(input_line)
+            results[text] = {key: value for key, value in record.items() if key not in ("line", "id", "text")}
+    return done, results
+
+
+class RateLimiter:
+    """Spaces out calls to `wait()` so that at most `rate` of them return per second (0 = unlimited)."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_time = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def run(input_path, output_path, concurrency=8, rate=0.0, field="text", max_movies=CATALOG_SIZE):
+    """Processes every pending input line; returns counters (total, skipped, processed, deduplicated, failed)."""
+    done, results = load_checkpoint(output_path)
+    stats = {"total": 0, "skipped": 0, "processed": 0, "deduplicated": 0, "failed": 0}
+
+    movies = await asyncio.to_thread(fetch_movies, max_movies)
+    if not movies:
+        print("⚠️ No movies available; results will fall back to empty recommendations.", file=sys.stderr)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(rate)
+    in_flight = {}  # normalized text -> task computing its result
+    pending = set()
+
+    with open(output_path, "a", encoding="utf-8") as output:
+
+        def write(line_number, entry_id, text, result):
+            record = {"line": line_number, "id": entry_id, "text": text, **result}
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+
+        async def compute(key, text):
+            try:
+                await limiter.wait()
+                # ✅ Precomputed results are worth waiting for: no deadline
+                result = await recommend_async(text, max_movies, movies=movies, deadline=0)
+                stats["processed"] += 1
+                results[key] = {
+                    name: value for name, value in result.items() if name not in ("movies", "deadline_at")
+                }
+                return results[key]
+            finally:
+                del in_flight[key]
+                semaphore.release()
+
+        async def handle(line_number, entry_id, text, task):
+            try:
+                result = await task
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"⚠️ Error on line {line_number}: {e}", file=sys.stderr)
+                return
+            write(line_number, entry_id, text, result)
+
+        for line_number, entry_id, text in read_inputs(input_path, field):
+            stats["total"] += 1
+            if line_number in done:
+                stats["skipped"] += 1
+                continue
+
+            key = normalize_text(text)
+            if key in results:
+                stats["deduplicated"] += 1
+                write(line_number, entry_id, text, results[key])
+                continue
+            if key in in_flight:
+                stats["deduplicated"] += 1
+            else:
+                # ✅ Backpressure: do not read further ahead than `concurrency` new texts
+                await semaphore.acquire()
+                in_flight[key] = asyncio.ensure_future(compute(key, text))
+
+            task = in_flight[key]
+            handler = asyncio.ensure_future(handle(line_number, entry_id, text, task))
+            pending.add(handler)
+            handler.add_done_callback(pending.discard)
+
+            if stats["total"] % 100 == 0:
+                print(f"⏳ {stats['total']} inputs read, {stats['processed']} processed", file=sys.stderr)
+
+        await asyncio.gather(*pending)
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute mood-based recommendations for a JSONL file.")
+    parser.add_argument("input", help="JSONL file of inputs (objects with a text field, or strings)")
+    parser.add_argument("output", help="JSONL results file; rerunning with the same file resumes")
+    parser.add_argument("--concurrency", type=int, default=8, help="inputs processed at the same time")
+    parser.add_argument("--rate", type=float, default=0.0, help="max inputs started per second (0 = unlimited)")
+    parser.add_argument("--field", default="text", help="name of the text field in input objects")
+    parser.add_argument("--max-movies", type=int, default=CATALOG_SIZE, help="catalog size")
+    parser.add_argument("--restart", action="store_true", help="discard earlier results instead of resuming")
+    args = parser.parse_args()
+
+    if args.restart and os.path.exists(args.output):
+        os.remove(args.output)
+
+    start = time.perf_counter()
+    stats = asyncio.run(run(args.input, args.output, args.concurrency, args.rate, args.field, args.max_movies))
+    print(
+        f"✅ {stats['total']} inputs: {stats['processed']} processed, {stats['deduplicated']} deduplicated, "
+        f"{stats['skipped']} already done, {stats['failed']} failed in {time.perf_counter() - start:.1f}s",
+        file=sys.stderr,
+    )
+    sys.exit(1 if stats["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
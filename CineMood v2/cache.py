@@ -0,0 +1,155 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from config import CACHE_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes stay atomic, but concurrent writers may drop each other's new entries
+    fcntl = None
+
+
+class JsonCache:
+    """
+    Small key/value cache backed by a single JSON file in `CACHE_DIR`.
+    - Values live in memory for fast lookups within a process.
+    - Every write is flushed to disk atomically, so other processes (and restarts) see it.
+    - On a miss the file is re-read if another process has updated it since.
+    - Writers in several processes (e.g. API workers) are serialized with a lock file,
+      so each write merges with the entries the others have flushed.
+    - Optionally bounded: least recently used entries beyond `max_entries` are evicted,
+      and entries older than `ttl` seconds expire.
+    """
+
+    def __init__(self, name, cache_dir=None, max_entries=None, ttl=None):
+        self.path = os.path.join(cache_dir or CACHE_DIR, f"{name}.json")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._mtime = None
+        self.hits = 0
+        self.misses = 0
+
+    def _reload(self):
+        """Reloads entries from disk if the file changed since the last read."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        mtime = (stat.st_mtime_ns, stat.st_size)
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+            self._mtime = mtime
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Error reading cache {self.path}: {e}")
+
+    @contextmanager
+    def _file_lock(self):
+        """Holds an exclusive inter-process lock on `<path>.lock` while reloading and flushing."""
+        if fcntl is None:
+            yield
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            lock_file = open(self.path + ".lock", "a")
+        except OSError as e:
+            print(f"⚠️ Error locking cache {self.path}: {e}")
+            yield
+            return
+        with lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _flush(self):
+        """Writes all entries to a temporary file and atomically swaps it in."""
+        directory = os.path.dirname(self.path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            stat = os.stat(self.path)
+            self._mtime = (stat.st_mtime_ns, stat.st_size)
+        except OSError as e:
+            print(f"⚠️ Error writing cache {self.path}: {e}")
+
+    def get(self, key, default=None):
+        """Returns the cached value for `key`, or `default` if it is missing."""
+        with self._lock:
+            if key not in self._entries:
+                self._reload()
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and time.time() - entry["time"] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            # ✅ Mark as recently used
+            self._entries[key] = self._entries.pop(key)
+            self.hits += 1
+            return entry["value"]
+
+    def set(self, key, value):
+        """Stores `value` under `key` and persists the cache."""
+        with self._lock, self._file_lock():
+            self._reload()
+            self._entries.pop(key, None)
+            self._entries[key] = {"value": value, "time": time.time()}
+            if self.max_entries:
+                while len(self._entries) > self.max_entries:
+                    del self._entries[next(iter(self._entries))]
+            self._flush()
+
+    def set_many(self, entries):
+        """Stores every key/value pair of `entries` and persists the cache once."""
+        if not entries:
+            return
+        with self._lock, self._file_lock():
+            self._reload()
+            now = time.time()
+            for key, value in entries.items():
+                self._entries.pop(key, None)
+                self._entries[key] = {"value": value, "time": now}
+            if self.max_entries:
+                while len(self._entries) > self.max_entries:
+                    del self._entries[next(iter(self._entries))]
+            self._flush()
+
+    def keys(self):
+        """Returns the cached keys (including entries written by other processes), least recently used first."""
+        with self._lock:
+            self._reload()
+            return list(self._entries)
+
+    def prune(self, keep):
+        """Drops every entry whose key does not satisfy `keep(key)`."""
+        with self._lock, self._file_lock():
+            self._reload()
+            stale = [key for key in self._entries if not keep(key)]
+            for key in stale:
+                del self._entries[key]
+            if stale:
+                self._flush()
+
+    def clear(self):
+        """Removes all entries, in memory and on disk."""
+        with self._lock:
+            self._entries = {}
+            self._mtime = None
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
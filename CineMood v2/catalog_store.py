@@ -0,0 +1,378 @@
+"""
+Persistent movie catalog backed by SQLite (`CATALOG_DB`).
+
+- `movies`: one row per TMDB movie (id, title, overview, poster path, release date, popularity),
+  indexed by id and release date. Rows are only rewritten when the movie's data changed.
+- `catalog_weeks`: which movies are in a week's trending catalog, by page and position.
+- `catalog_syncs`: how many trending pages of a week have been synced, so a sync only fetches the pages it lacks.
+- `library`, `library_syncs`: the week's large catalog (`LIBRARY_SIZE` movies streamed from several TMDB lists,
+  in ingestion order), and whether its sync completed.
+- Loaded catalogs are kept in memory until the week is synced again, so repeated reads are served without queries.
+
+Sync the current week's catalog (or library) ahead of time (e.g. from cron, in the `CineMood v2` directory):
+    python catalog_store.py --max-movies 100
+    python catalog_store.py --library
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from types import MappingProxyType
+
+from config import CATALOG_DB, TMDB_IMAGE_BASE_URL
+
+# Movies per TMDB trending page
+PAGE_SIZE = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS movies (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    overview TEXT NOT NULL,
+    poster_path TEXT,
+    release_date TEXT NOT NULL,
+    popularity REAL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS movies_release_date ON movies (release_date);
+CREATE TABLE IF NOT EXISTS catalog_weeks (
+    week TEXT NOT NULL,
+    language TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    movie_id INTEGER NOT NULL REFERENCES movies (id),
+    PRIMARY KEY (week, language, movie_id)
+);
+CREATE INDEX IF NOT EXISTS catalog_weeks_order ON catalog_weeks (week, language, page, position);
+CREATE TABLE IF NOT EXISTS catalog_syncs (
+    week TEXT NOT NULL,
+    language TEXT NOT NULL,
+    pages INTEGER NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (week, language)
+);
+CREATE TABLE IF NOT EXISTS library (
+    week TEXT NOT NULL,
+    language TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    movie_id INTEGER NOT NULL REFERENCES movies (id),
+    PRIMARY KEY (week, language, movie_id)
+);
+CREATE INDEX IF NOT EXISTS library_order ON library (week, language, position);
+CREATE TABLE IF NOT EXISTS library_syncs (
+    week TEXT NOT NULL,
+    language TEXT NOT NULL,
+    movies INTEGER NOT NULL,
+    complete INTEGER NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (week, language)
+);
+"""
+
+UPSERT_MOVIE = """
+INSERT INTO movies (id, title, overview, poster_path, release_date, popularity, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    title = excluded.title, overview = excluded.overview,
+    poster_path = excluded.poster_path, release_date = excluded.release_date,
+    popularity = excluded.popularity, updated_at = excluded.updated_at
+WHERE (title, overview, poster_path, release_date, popularity)
+    IS NOT (excluded.title, excluded.overview, excluded.poster_path,
+            excluded.release_date, excluded.popularity)
+"""
+
+MOVIE_COLUMNS = "m.id, m.title, m.overview, m.poster_path, m.release_date, m.popularity"
+
+
+def pages_needed(max_movies):
+    """Number of trending pages fetched at most for a catalog of `max_movies` movies."""
+    return max_movies // PAGE_SIZE + 1
+
+
+def poster_url(poster_path, size="w500"):
+    """Returns the TMDB image URL of a poster path (None without a poster)."""
+    return f"{TMDB_IMAGE_BASE_URL}/{size}{poster_path}" if poster_path else None
+
+
+def movie_rows(movies, now):
+    """`UPSERT_MOVIE` parameters of movie dicts."""
+    return [
+        (movie["id"], movie["title"], movie["overview"], movie.get("poster_path"),
+         movie["release_date"], movie.get("popularity"), now)
+        for movie in movies
+    ]
+
+
+def movie_from_row(row):
+    """Builds a movie dict (the shape returned by `fetch_movies`) from a `movies` row."""
+    movie_id, title, overview, poster_path, release_date, popularity = row
+    return {
+        "id": movie_id,
+        "title": title,
+        "overview": overview,
+        "poster": poster_url(poster_path),
+        "poster_path": poster_path,
+        "release_date": release_date,
+        "popularity": popularity,
+    }
+
+
+class Catalog(tuple):
+    """
+    A library loaded from the store, shared by every request until the library is synced again.
+    It is read-only: a tuple of read-only movie mappings (`dict(movie)` makes a modifiable copy), so no request
+    can change the catalog of the others, or its `version`.
+    `version` caches its `tmdb_api.catalog_version`, which would otherwise hash every movie on each request.
+    """
+    version = None
+
+    def __new__(cls, movies=()):
+        return super().__new__(cls, (MappingProxyType(dict(movie)) for movie in movies))
+
+
+class CatalogStore:
+    """
+    SQLite store of the weekly trending catalogs, shared by all sessions and processes.
+    - Weeks are stored as the ISO date of their Monday.
+    - A week's catalog for `max_movies` movies is the movies of its first pages, up to the first page that
+      brings the count to `max_movies` (or `pages_needed(max_movies)` pages), latest release first,
+      as `fetch_movies` has always selected them.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or CATALOG_DB
+        self._lock = threading.Lock()
+        self._connection = None
+        self._loaded = {}  # (week, language) -> (synced_at, [(page, movie), ...])
+        self._libraries = {}  # (week, language) -> (synced_at, Catalog)
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            # ✅ WAL lets other processes read while a sync is writing
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def sync_state(self, week, language):
+        """Returns (synced pages, movie count) of a week's catalog."""
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT pages FROM catalog_syncs WHERE week = ? AND language = ?", (week.isoformat(), language)
+            ).fetchone()
+            count = connection.execute(
+                "SELECT COUNT(*) FROM catalog_weeks WHERE week = ? AND language = ?", (week.isoformat(), language)
+            ).fetchone()[0]
+        return (row[0] if row else 0), count
+
+    def is_synced(self, week, language, max_movies):
+        """Returns whether the week's catalog holds every page needed for `max_movies` movies."""
+        pages, count = self.sync_state(week, language)
+        return count >= max_movies or pages >= pages_needed(max_movies)
+
+    def add_pages(self, week, language, pages):
+        """
+        Stores trending pages of a week, given as (page number, movies) in page order after the synced pages.
+        Movies whose data did not change are left untouched. Returns the number of inserted or changed movies.
+        """
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            changed = 0
+            with connection:
+                for page, movies in pages:
+                    changed += connection.executemany(UPSERT_MOVIE, movie_rows(movies, now)).rowcount
+                    connection.executemany(
+                        "INSERT OR IGNORE INTO catalog_weeks (week, language, page, position, movie_id) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        [(week.isoformat(), language, page, position, movie["id"])
+                         for position, movie in enumerate(movies)],
+                    )
+                    connection.execute(
+                        """
+                        INSERT INTO catalog_syncs (week, language, pages, synced_at) VALUES (?, ?, ?, ?)
+                        ON CONFLICT (week, language) DO UPDATE SET
+                            pages = MAX(pages, excluded.pages), synced_at = excluded.synced_at
+                        """,
+                        (week.isoformat(), language, page, now),
+                    )
+        return changed
+
+    def load(self, week, language, max_movies, partial=False):
+        """
+        Returns a week's catalog of up to `max_movies` movies (fresh dicts, latest release first),
+        or None if the week is not synced far enough (unless `partial`, which returns whatever is stored).
+        """
+        key = (week.isoformat(), language)
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT pages, synced_at FROM catalog_syncs WHERE week = ? AND language = ?", key
+            ).fetchone()
+            if row is None:
+                return [] if partial else None
+            pages, synced_at = row
+            loaded = self._loaded.get(key)
+            if loaded is None or loaded[0] != synced_at:
+                rows = connection.execute(
+                    f"""
+                    SELECT w.page, {MOVIE_COLUMNS} FROM catalog_weeks w JOIN movies m ON m.id = w.movie_id
+                    WHERE w.week = ? AND w.language = ? ORDER BY w.page, w.position
+                    """,
+                    key,
+                ).fetchall()
+                loaded = self._loaded[key] = (synced_at, [(row[0], movie_from_row(row[1:])) for row in rows])
+
+        entries = loaded[1]
+        if not partial and len(entries) < max_movies and pages < pages_needed(max_movies):
+            return None
+
+        movies = []
+        for i, (page, movie) in enumerate(entries):
+            if page > pages_needed(max_movies):
+                break
+            movies.append(movie)
+            if len(movies) >= max_movies and (i + 1 == len(entries) or entries[i + 1][0] != page):
+                break
+        movies = sorted(movies, key=lambda x: x["release_date"], reverse=True)[:max_movies]
+        return [dict(movie) for movie in movies]
+
+    def library_state(self, week, language):
+        """Returns (movie count, whether its sync completed) of a week's library."""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT movies, complete FROM library_syncs WHERE week = ? AND language = ?",
+                (week.isoformat(), language),
+            ).fetchone()
+        return (row[0], bool(row[1])) if row else (0, False)
+
+    def add_library_movies(self, week, language, movies):
+        """
+        Appends streamed movies to a week's library (movies it already holds keep their position).
+        Returns the number of movies added to the library, and of new or changed movies.
+        """
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                changed = connection.executemany(UPSERT_MOVIE, movie_rows(movies, now)).rowcount
+                count = connection.execute(
+                    "SELECT COUNT(*) FROM library WHERE week = ? AND language = ?", (week.isoformat(), language)
+                ).fetchone()[0]
+                added = connection.executemany(
+                    "INSERT OR IGNORE INTO library (week, language, position, movie_id) VALUES (?, ?, ?, ?)",
+                    [(week.isoformat(), language, count + position, movie["id"])
+                     for position, movie in enumerate(movies)],
+                ).rowcount
+                connection.execute(
+                    """
+                    INSERT INTO library_syncs (week, language, movies, complete, synced_at) VALUES (?, ?, ?, 0, ?)
+                    ON CONFLICT (week, language) DO UPDATE SET movies = excluded.movies, synced_at = excluded.synced_at
+                    """,
+                    (week.isoformat(), language, count + added, now),
+                )
+        return added, changed
+
+    def complete_library(self, week, language):
+        """Marks a week's library as fully synced, so it can be served."""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    "UPDATE library_syncs SET complete = 1, synced_at = ? WHERE week = ? AND language = ?",
+                    (time.time(), week.isoformat(), language),
+                )
+
+    def load_library(self, week, language):
+        """
+        Returns the latest completely synced library up to `week` (a shared read-only `Catalog`, in ingestion order),
+        so a library that is not synced yet at the weekly rollover is replaced by last week's; None without any.
+        """
+        with self._lock:
+            connection = self._connect()
+            sync = connection.execute(
+                """
+                SELECT week, synced_at FROM library_syncs WHERE language = ? AND week <= ? AND complete
+                ORDER BY week DESC LIMIT 1
+                """,
+                (language, week.isoformat()),
+            ).fetchone()
+            if sync is None:
+                return None
+            key = (sync[0], language)
+            loaded = self._libraries.get(key)
+            if loaded is None or loaded[0] != sync[1]:
+                rows = connection.execute(
+                    f"""
+                    SELECT {MOVIE_COLUMNS} FROM library l JOIN movies m ON m.id = l.movie_id
+                    WHERE l.week = ? AND l.language = ? ORDER BY l.position
+                    """,
+                    key,
+                ).fetchall()
+                loaded = self._libraries[key] = (sync[1], Catalog(movie_from_row(row) for row in rows))
+        return loaded[1]
+
+    def get(self, movie_id):
+        """Returns the stored movie with `movie_id`, or None."""
+        with self._lock:
+            row = self._connect().execute(
+                f"SELECT {MOVIE_COLUMNS} FROM movies m WHERE m.id = ?", (movie_id,)
+            ).fetchone()
+        return movie_from_row(row) if row else None
+
+    def released_between(self, start, end, limit=100):
+        """Returns stored movies released from `start` to `end` (dates, inclusive), latest first."""
+        with self._lock:
+            rows = self._connect().execute(
+                f"""
+                SELECT {MOVIE_COLUMNS} FROM movies m WHERE m.release_date BETWEEN ? AND ?
+                ORDER BY m.release_date DESC LIMIT ?
+                """,
+                (start.isoformat(), end.isoformat(), limit),
+            ).fetchall()
+        return [movie_from_row(row) for row in rows]
+
+    def prune(self, oldest_week):
+        """Drops the week memberships and sync states of weeks before `oldest_week` (movies are kept)."""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                for table in ("catalog_weeks", "catalog_syncs", "library", "library_syncs"):
+                    connection.execute(f"DELETE FROM {table} WHERE week < ?", (oldest_week.isoformat(),))
+            self._loaded = {key: value for key, value in self._loaded.items() if key[0] >= oldest_week.isoformat()}
+            self._libraries = {
+                key: value for key, value in self._libraries.items() if key[0] >= oldest_week.isoformat()
+            }
+
+
+def main():
+    import tmdb_api  # imported here: tmdb_api itself depends on this module
+
+    parser = argparse.ArgumentParser(description="Sync the current week's trending catalog into the local store.")
+    parser.add_argument("--max-movies", type=int, default=100, help="catalog size to sync")
+    parser.add_argument("--language", default="en-US", help="TMDB language")
+    parser.add_argument("--library", action="store_true", help="sync the large catalog (LIBRARY_SIZE movies) instead")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.library:
+        result = tmdb_api.sync_library(language=args.language)
+        print(
+            f"{'✅' if result['complete'] else '⚠️'} Added {result['movies']} movie(s) to the library, "
+            f"{result['changed']} new or changed, in {time.perf_counter() - start:.1f}s"
+        )
+        return
+
+    result = tmdb_api.sync_catalog(args.max_movies, args.language)
+    print(
+        f"{'✅' if result['complete'] else '⚠️'} Synced {result['pages']} new page(s), "
+        f"{result['changed']} new or changed movie(s) in {time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
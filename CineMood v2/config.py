@@ -8,3 +8,140 @@ load_dotenv()
 # Get API keys
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 TMDB_API_KEY = os.getenv("TMDB_API_KEY")
+
+# OpenAI chat model used for mood detection, mood mapping and ranking
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+# LLM backend (backends.py) of every task: "openai", "compatible" (any OpenAI-compatible server) or "local"
+# (deterministic CPU engine); mood detection, mood mapping and ranking can each be routed to another backend
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_BACKEND_DETECT = os.getenv("LLM_BACKEND_DETECT") or LLM_BACKEND
+LLM_BACKEND_MAP = os.getenv("LLM_BACKEND_MAP") or LLM_BACKEND
+LLM_BACKEND_RANK = os.getenv("LLM_BACKEND_RANK") or LLM_BACKEND
+
+# OpenAI-compatible server of the "compatible" backend (e.g. vLLM, llama.cpp server or Ollama)
+COMPATIBLE_BASE_URL = os.getenv("COMPATIBLE_BASE_URL", "http://localhost:8000/v1")
+COMPATIBLE_API_KEY = os.getenv("COMPATIBLE_API_KEY", "unused")
+COMPATIBLE_MODEL = os.getenv("COMPATIBLE_MODEL", "llama3.1:8b")
+
+# API endpoints (overridable, e.g. to point at local stand-ins for benchmarks)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+TMDB_BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")
+TMDB_IMAGE_BASE_URL = os.getenv("TMDB_IMAGE_BASE_URL", "https://image.tmdb.org/t/p")
+
+# Local cache directory shared by all app sessions and processes
+CACHE_DIR = os.getenv("CINEMOOD_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+
+# SQLite catalog store (movies and weekly trending catalogs), synced incrementally from TMDB
+CATALOG_DB = os.getenv("CATALOG_DB", os.path.join(CACHE_DIR, "catalog.sqlite3"))
+
+# Poster cache: display width of posters (px), pixel ratio of thumbnails, downloaded TMDB rendition,
+# background prefetch of the week's posters, disk budget and lifetime of unused posters
+POSTER_CACHE_DIR = os.getenv("POSTER_CACHE_DIR", os.path.join(CACHE_DIR, "posters"))
+POSTER_WIDTH = int(os.getenv("POSTER_WIDTH", "200"))
+POSTER_PIXEL_RATIO = float(os.getenv("POSTER_PIXEL_RATIO", "2"))
+POSTER_SOURCE_SIZE = os.getenv("POSTER_SOURCE_SIZE", "w500")
+POSTER_PREFETCH = os.getenv("POSTER_PREFETCH", "true").lower() == "true"
+POSTER_PREFETCH_WORKERS = int(os.getenv("POSTER_PREFETCH_WORKERS", "4"))
+POSTER_CACHE_MAX_MB = float(os.getenv("POSTER_CACHE_MAX_MB", "500"))
+POSTER_CACHE_TTL = float(os.getenv("POSTER_CACHE_TTL_DAYS", "30")) * 24 * 3600
+
+# TMDB HTTP client settings
+TMDB_TIMEOUT = float(os.getenv("TMDB_TIMEOUT", "5"))
+TMDB_MAX_RETRIES = int(os.getenv("TMDB_MAX_RETRIES", "3"))
+TMDB_MAX_WORKERS = int(os.getenv("TMDB_MAX_WORKERS", "4"))
+
+# Large catalog ("library") of up to LIBRARY_SIZE movies (0 = off: the weekly trending catalog is served),
+# streamed weekly from several TMDB lists (trending, popular, top_rated, discover), at most LIBRARY_PAGES pages each
+LIBRARY_SIZE = int(os.getenv("LIBRARY_SIZE", "0"))
+LIBRARY_LISTS = [name.strip() for name in os.getenv("LIBRARY_LISTS", "trending,popular,top_rated,discover").split(",")]
+LIBRARY_PAGES = int(os.getenv("LIBRARY_PAGES", "500"))
+
+# Vector indexes of catalogs with at least VECTOR_INDEX_MIN_MOVIES movies are stored on disk (built offline
+# or on first use), so every process loads them instead of re-indexing the catalog
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", os.path.join(CACHE_DIR, "vector_index"))
+VECTOR_INDEX_MIN_MOVIES = int(os.getenv("VECTOR_INDEX_MIN_MOVIES", "1000"))
+
+# Number of locally pre-ranked movies sent to GPT for ranking (0 sends the whole catalog)
+RANKING_TOP_K = int(os.getenv("RANKING_TOP_K", "15"))
+
+# Movie overviews in ranking prompts: "extractive" (leading sentences within OVERVIEW_TOKENS tokens), "llm" (summaries
+# written once per movie and catalog week, e.g. by the warm-up; extractive until then) or "full"; the movie list of a
+# ranking prompt is kept within RANKING_PROMPT_TOKENS tokens (0 = no limit)
+OVERVIEW_COMPRESSION = os.getenv("OVERVIEW_COMPRESSION", "extractive")
+OVERVIEW_TOKENS = int(os.getenv("OVERVIEW_TOKENS", "60"))
+RANKING_PROMPT_TOKENS = int(os.getenv("RANKING_PROMPT_TOKENS", "1000"))
+OVERVIEW_SUMMARY_MAX_ENTRIES = int(os.getenv("OVERVIEW_SUMMARY_MAX_ENTRIES", "20000"))
+
+# Detect explicitly named moods locally and skip the LLM call when the match is confident
+MOOD_LEXICON = os.getenv("MOOD_LEXICON", "true").lower() == "true"
+
+# Persistent memo of GPT mood mappings (map_to_valid_mood)
+MOOD_MEMO_MAX_ENTRIES = int(os.getenv("MOOD_MEMO_MAX_ENTRIES", "5000"))
+MOOD_MEMO_TTL = float(os.getenv("MOOD_MEMO_TTL_DAYS", "30")) * 24 * 3600
+
+# Mood detection mode: "structured" (one schema-constrained GPT call) or "two_step" (detect, then map)
+MOOD_DETECTION_MODE = os.getenv("MOOD_DETECTION_MODE", "structured")
+
+# Ranking mode: "llm" (GPT ranks locally pre-ranked candidates) or "matrix" (precomputed mood x movie affinity
+# matrix, no GPT call); in matrix mode, GPT can optionally write the match reasons of the 3 winners
+RANKING_MODE = os.getenv("RANKING_MODE", "llm")
+AFFINITY_DIR = os.getenv("AFFINITY_DIR", os.path.join(CACHE_DIR, "affinity"))
+AFFINITY_REASONS = os.getenv("AFFINITY_REASONS", "false").lower() == "true"
+
+# In-memory cache of mood detections for normalized inputs; near-identical inputs (character n-gram cosine
+# similarity >= threshold, 0 = exact normalized matches only) reuse a cached detection
+DETECT_CACHE = os.getenv("DETECT_CACHE", "true").lower() == "true"
+DETECT_CACHE_MAX_ENTRIES = int(os.getenv("DETECT_CACHE_MAX_ENTRIES", "5000"))
+DETECT_CACHE_THRESHOLD = float(os.getenv("DETECT_CACHE_THRESHOLD", "0.9"))
+
+# Persistent cache of GPT rankings per (mood set, catalog version, model)
+RANKING_CACHE_MAX_ENTRIES = int(os.getenv("RANKING_CACHE_MAX_ENTRIES", "2000"))
+RANKING_CACHE_TTL = float(os.getenv("RANKING_CACHE_TTL_DAYS", "8")) * 24 * 3600
+
+# Threads available for fetching the catalog concurrently with mood detection
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "8"))
+# Threads running the deadline-bound detection and ranking calls (overrun calls keep theirs until they finish)
+PIPELINE_STAGE_WORKERS = int(os.getenv("PIPELINE_STAGE_WORKERS", "16"))
+
+# End-to-end latency budget of a recommendation in seconds (0 = none), and the share of it kept for ranking:
+# stages that would overrun it fall back to lexical mood matching, local ranking or the top trending movies
+PIPELINE_DEADLINE = float(os.getenv("PIPELINE_DEADLINE", "0"))
+PIPELINE_RANK_SHARE = float(os.getenv("PIPELINE_RANK_SHARE", "0.5"))
+
+# Render recommendations one by one while GPT is still writing its answer
+STREAM_RECOMMENDATIONS = os.getenv("STREAM_RECOMMENDATIONS", "true").lower() == "true"
+
+# Background warm-up of the catalog, indexes and popular rankings: at startup, and the given minutes
+# before and after the weekly catalog rollover (Monday 00:00); number of mood sets pre-ranked per catalog
+WARMUP = os.getenv("WARMUP", "true").lower() == "true"
+WARMUP_LEAD_MINUTES = float(os.getenv("WARMUP_LEAD_MINUTES", "15"))
+WARMUP_LAG_MINUTES = float(os.getenv("WARMUP_LAG_MINUTES", "5"))
+WARMUP_MOOD_SETS = int(os.getenv("WARMUP_MOOD_SETS", "20"))
+
+# Instrumentation: JSON event logs on stderr, Prometheus endpoint port (0 = off) and metrics file ("" = off)
+METRICS_LOG = os.getenv("METRICS_LOG", "false").lower() == "true"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+METRICS_EXPORT_INTERVAL = float(os.getenv("METRICS_EXPORT_INTERVAL", "15"))
+
+# HTTP API (api.py): bind address, worker processes and batch limits
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS", "2"))
+API_MAX_BATCH = int(os.getenv("API_MAX_BATCH", "100"))
+API_BATCH_CONCURRENCY = int(os.getenv("API_BATCH_CONCURRENCY", "8"))
+
+# Let concurrent identical GPT calls (mood detection, mood mapping, ranking) share one request
+COALESCE_LLM_CALLS = os.getenv("COALESCE_LLM_CALLS", "true").lower() == "true"
+
+# Resilient OpenAI client (llm_client.py): per-attempt timeout and per-call deadline (seconds),
+# retries with jittered exponential backoff, connection pool size and circuit breaker
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "15"))
+OPENAI_DEADLINE = float(os.getenv("OPENAI_DEADLINE", "30"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+OPENAI_BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", "0.5"))
+OPENAI_BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", "8"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
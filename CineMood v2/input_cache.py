@@ -0,0 +1,134 @@
+"""
+In-memory cache of mood detections for near-duplicate inputs.
+
+Users type many variants of the same feeling ("so tired today", "I'm so tired today!!"):
+- Inputs are normalized (case, punctuation, whitespace, filler and stop words), and equal normalized
+  inputs share one cached detection.
+- Optionally, an input whose character n-gram profile is at least `threshold` similar (cosine) to a cached one
+  reuses that detection. Profiles are hashed into small fixed-size vectors, so a lookup is one matrix product.
+- A near match must also have the same content words in the same order, up to inflections ("so exhausted after
+  works" reuses "exhausted after work"): a long shared sentence with other mood words ("... finally relaxed and
+  calm" vs "... finally sad and lonely"), swapped words or other negations never match.
+- At most `max_entries` detections are kept (0 disables the cache); the least recently used ones are evicted.
+"""
+import copy
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from mood_lexicon import stem
+from retrieval import STOP_WORDS
+
+# ✅ Words that do not change the mood of an input (on top of the retrieval stop words)
+FILLER_WORDS = frozenset("""
+i im ive id me my myself am so very really just quite pretty bit little kinda sort today now right
+feel feeling feels felt think guess honestly literally lately currently
+""".split())
+
+NEGATIONS = frozenset("""
+not no never nothing nobody none nor cannot cant dont doesnt didnt isnt arent wasnt werent wont wouldnt
+couldnt shouldnt hardly barely without
+""".split())
+
+
+def normalize_input(text):
+    """Lowercases `text`, drops apostrophes, punctuation, filler and stop words, and collapses whitespace."""
+    tokens = re.findall(r"[a-z0-9]+", text.lower().replace("'", "").replace("’", ""))
+    kept = [token for token in tokens if token in NEGATIONS or token not in STOP_WORDS | FILLER_WORDS]
+    # ✅ Inputs made only of filler words keep them, so they do not all collapse into ""
+    return " ".join(kept or tokens)
+
+
+def content_words(normalized):
+    """The stems of the words of a normalized input, in order: near matches must have the same ones."""
+    return tuple(stem(token) for token in normalized.split())
+
+
+def ngram_vector(text, n=3, dimensions=256):
+    """Hashes the character n-grams of `text` (padded with spaces) into an L2-normalized vector."""
+    padded = f" {text} "
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for i in range(max(1, len(padded) - n + 1)):
+        vector[zlib.crc32(padded[i:i + n].encode("utf-8")) % dimensions] += 1
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class DetectionCache:
+    """
+    Bounded cache of detection results keyed by normalized input (and detection mode).
+    `threshold` is the minimum n-gram cosine similarity for reusing a near-identical input's result
+    (0 disables near matching). Results are deep-copied in and out, so callers cannot modify cached values.
+    """
+
+    def __init__(self, max_entries=5000, threshold=0.9, dimensions=256):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.dimensions = dimensions
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (mode, normalized input) -> (slot, content words, result)
+        self._vectors = np.zeros((max_entries, dimensions), dtype=np.float32)
+        self._slot_keys = [None] * max_entries
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def get(self, text, mode):
+        """Returns (result, "hit" or "near") for a cached equal or near-identical input, or (None, "miss")."""
+        normalized = normalize_input(text)
+        key = (mode, normalized)
+        with self._lock:
+            entry = self._entries.get(key)
+            outcome = "hit"
+            if entry is None and self.threshold and self._entries:
+                key = self._nearest(mode, normalized)
+                entry = self._entries.get(key) if key else None
+                outcome = "near"
+            if entry is None:
+                self.misses += 1
+                return None, "miss"
+            if outcome == "hit":
+                self.hits += 1
+            else:
+                self.near_hits += 1
+            self._entries.move_to_end(key)
+            return copy.deepcopy(entry[2]), outcome
+
+    def _nearest(self, mode, normalized):
+        """Returns the key of the most similar cached input above the threshold (same mode and words), or None."""
+        similarities = self._vectors @ ngram_vector(normalized, dimensions=self.dimensions)
+        words = content_words(normalized)
+        for slot in np.argsort(-similarities):
+            if similarities[slot] < self.threshold:
+                return None
+            key = self._slot_keys[slot]
+            if key is not None and key[0] == mode and self._entries[key][1] == words:
+                return key
+        return None
+
+    def set(self, text, mode, result):
+        """Caches the detection `result` of `text`, evicting the least recently used entry when full."""
+        if self.max_entries < 1:
+            return
+        normalized = normalize_input(text)
+        key = (mode, normalized)
+        with self._lock:
+            if key in self._entries:
+                slot = self._entries[key][0]
+                self._entries.move_to_end(key)
+            elif len(self._entries) >= self.max_entries:
+                _, (slot, _, _) = self._entries.popitem(last=False)
+            else:
+                slot = len(self._entries)
+            self._entries[key] = (slot, content_words(normalized), copy.deepcopy(result))
+            self._slot_keys[slot] = key
+            self._vectors[slot] = ngram_vector(normalized, dimensions=self.dimensions)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._vectors[:] = 0
+            self._slot_keys = [None] * self.max_entries
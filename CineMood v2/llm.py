@@ -1,45 +1,125 @@
 import json
-import openai
-from config import OPENAI_API_KEY
-
-client = openai.OpenAI(api_key=OPENAI_API_KEY)
-
-# ✅ Updated Mood List
-VALID_MOOD_WORDS = set([
-    "happy", "joyful", "cheerful", "delighted", "gleeful", "content", "lighthearted", "beaming",
-    "excited", "thrilled", "exhilarated", "ecstatic", "overjoyed", "pumped", "hyped", "giddy",
-    "grateful", "thankful", "appreciative", "blessed", "fulfilled", "satisfied",
-    "hopeful", "optimistic", "encouraged", "expectant", "inspired",
-    "loving", "affectionate", "romantic", "caring", "devoted", "tender",
-    "peaceful", "calm", "serene", "tranquil", "relaxed", "mellow",
-    "proud", "accomplished", "confident", "empowered", "self-assured",
-    
-    "sad", "melancholic", "gloomy", "heartbroken", "dejected", "sorrowful",
-    "lonely", "isolated", "abandoned", "rejected", "homesick", "neglected",
-    "hopeless", "despairing", "pessimistic", "defeated", "discouraged",
-    "bored", "indifferent", "unenthusiastic", "unstimulated", "listless",
-    "guilty", "remorseful", "regretful", "ashamed", "embarrassed",
-    "tired", "fatigued", "drained", "exhausted", "sluggish",
-    
-    "angry", "furious", "enraged", "irritated", "resentful", "bitter",
-    "frustrated", "annoyed", "exasperated", "impatient", "aggravated",
-    "jealous", "envious", "covetous", "possessive", "insecure",
-    "disgusted", "repulsed", "revolted", "grossed out", "nauseated",
-    
-    "anxious", "nervous", "worried", "uneasy", "apprehensive", "jittery",
-    "fearful", "terrified", "panicked", "paranoid", "tense", "alarmed",
-    "overwhelmed", "stressed", "pressured", "frazzled", "overloaded",
-    
-    "surprised", "shocked", "amazed", "astonished", "stunned", "flabbergasted",
-    "confused", "perplexed", "puzzled", "disoriented", "unsure", "uncertain",
-    "indecisive", "conflicted", "hesitant", "torn", "ambivalent",
-    
-    "neutral", "indifferent", "meh", "emotionless", "numb",
-    "bittersweet", "nostalgic", "wistful", "sentimental", "pensive",
-    "thoughtful", "introspective", "brooding", "deep in thought"
-])
+import os
+import affinity
+import backends
+import metrics
+from cache import JsonCache
+from config import (
+    AFFINITY_REASONS, COALESCE_LLM_CALLS, DETECT_CACHE, DETECT_CACHE_MAX_ENTRIES, DETECT_CACHE_THRESHOLD, LLM_BACKEND,
+    MOOD_DETECTION_MODE, MOOD_LEXICON, MOOD_MEMO_MAX_ENTRIES, MOOD_MEMO_TTL, OVERVIEW_TOKENS, RANKING_CACHE_MAX_ENTRIES,
+    RANKING_CACHE_TTL, RANKING_MODE, RANKING_TOP_K
+)
+from input_cache import DetectionCache
+from mood_lexicon import match_moods
+from moods import VALID_MOOD_WORDS
+from overviews import WORDS_PER_TOKEN, compress_movies, settings_key
+from prompts import (
+    affinity_messages, detect_mood_messages, map_mood_messages, ranking_messages, structured_mood_messages,
+    summary_messages
+)
+from retrieval import rank_movies
+from singleflight import SingleFlight
+from tmdb_api import catalog_version
+
+# LLM backend of every task (`LLM_BACKEND`), and the backend each task is routed to (see backends.py)
+backend = backends.create_backend(LLM_BACKEND)
+routes = backends.create_routes(backend)
+
+
+def complete(task, messages, **options):
+    """Sends chat `messages` to the model of the backend `task` is routed to (recorded as "backend")."""
+    task_backend = routes[task]
+    metrics.annotate(backend=task_backend.name)
+    return task_backend.client.chat.completions.create(model=task_backend.model, messages=messages, **options)
+
+
+async def complete_async(task, messages, **options):
+    """Async variant of `complete`, through the backend's async client (used by the `*_async` variants)."""
+    task_backend = routes[task]
+    metrics.annotate(backend=task_backend.name)
+    return await task_backend.async_client.chat.completions.create(
+        model=task_backend.model, messages=messages, **options
+    )
+
+# ✅ Concurrent identical GPT calls (same normalized input, moods or ranking key) share one request
+inflight = SingleFlight(enabled=COALESCE_LLM_CALLS)
+
+# ✅ Persistent memo of mood mappings, keyed by normalized word (or sorted word tuple)
+mood_memo = JsonCache("mood_memo", max_entries=MOOD_MEMO_MAX_ENTRIES, ttl=MOOD_MEMO_TTL)
+
+
+def load_mood_synonyms(path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "mood_synonyms.json")):
+    """Loads the shipped synonym table (free-form mood word -> 3 valid moods)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            synonyms = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Error loading mood synonyms: {e}")
+        return {}
+    return {
+        normalize_mood_word(word): [mood for mood in moods if mood in VALID_MOOD_WORDS]
+        for word, moods in synonyms.items()
+    }
+
+
+def normalize_mood_word(word):
+    """Lowercases a mood word, collapses whitespace and strips surrounding punctuation."""
+    return " ".join(word.lower().split()).strip(" .,;:!?'\"()[]")
+
+
+def mood_memo_key(words):
+    """Builds the memo key of a group of normalized mood words (order-insensitive)."""
+    return "|".join(sorted(set(words)))
+
+
+def lookup_mood_mapping(words):
+    """
+    Returns memoized valid moods for `words` without calling GPT, or None:
+    - A mapping memoized for the whole word group is returned as-is.
+    - Otherwise, if every word has a known mapping (synonym table or memo), the mappings are interleaved.
+    """
+    cached = mood_memo.get(mood_memo_key(words))
+    if cached:
+        return list(cached)
+
+    per_word = [MOOD_SYNONYMS.get(word) or mood_memo.get(word) for word in words]
+    if not words or not all(per_word):
+        return None
+
+    moods = []
+    for rank in range(3):
+        moods.extend(mapping[rank] for mapping in per_word if rank < len(mapping))
+    unique_moods = list(dict.fromkeys(moods))
+    while len(unique_moods) < 3:
+        unique_moods.append("neutral")
+    return unique_moods[:3]
+
+
+MOOD_SYNONYMS = load_mood_synonyms()
+
 
 # ✅ Function to Map Detected Moods Using GPT
+def parse_mapped_moods(content):
+    """Parses GPT's comma-separated mood list into exactly 3 unique moods from `VALID_MOOD_WORDS`."""
+    # ✅ Extract and clean GPT response
+    mapped_moods = content.strip().lower()
+
+    # ✅ Handle cases where GPT incorrectly formats the output
+    mapped_moods = mapped_moods.replace("[", "").replace("]", "").replace("'", "").replace('"', "")
+    mapped_moods = mapped_moods.split(", ")
+    mapped_moods = [mood.strip() for mood in mapped_moods if mood in VALID_MOOD_WORDS]
+
+    # ✅ Ensure exactly 3 unique moods
+    unique_moods = list(dict.fromkeys(mapped_moods))  # Remove duplicates while keeping order
+
+    # ✅ Fill with "neutral" if fewer than 3 moods are returned
+    while len(unique_moods) < 3:
+        unique_moods.append("neutral")
+
+    return unique_moods[:3]  # Always return a single flat list of 3 moods
+
+
+@metrics.tracked("map_to_valid_mood")
 def map_to_valid_mood(mood_words):
     """
     Uses GPT to determine the closest valid moods from `VALID_MOOD_WORDS`.
@@ -47,89 +127,234 @@ def map_to_valid_mood(mood_words):
     - The result contains **exactly 3 unique** moods.
     - All moods are from `VALID_MOOD_WORDS`.
     - If fewer than 3 moods are returned, "neutral" is added.
+    - Known words (synonym table or earlier GPT answers) are served from a persistent memo.
+    - Concurrent calls for the same words share one GPT request.
     """
 
-    valid_moods_string = ", ".join(VALID_MOOD_WORDS)
+    words = [word for word in (normalize_mood_word(mood) for mood in mood_words) if word]
+    memoized_moods = lookup_mood_mapping(words)
+    metrics.annotate(cache="hit" if memoized_moods else "miss")
+    if memoized_moods:
+        return memoized_moods
 
-    prompt = f"""
-    You are an expert in understanding human emotions.
-    Your task is to map the detected moods "{', '.join(mood_words)}" to the **three closest** valid moods from the predefined list below:
+    return inflight.do(("map", mood_memo_key(words)), _map_with_gpt, mood_words, words)
 
-    {valid_moods_string}
-
-    **Rules:**
-    1. Select exactly **3 unique** moods from the list.
-    2. If a mood is unrelated to any in the list, replace it with **"neutral"**.
-    3. **Return ONLY a comma-separated list of 3 moods, no extra text.**
-    """
 
+def _map_with_gpt(mood_words, words):
+    """Asks GPT to map `mood_words` and memoizes the answer under the normalized `words`."""
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "system", "content": prompt}]
-        )
+        response = complete("map", map_mood_messages(mood_words))
+        metrics.record_usage(response)
+        unique_moods = parse_mapped_moods(response.choices[0].message.content)
+
+        # ✅ The local engine's mappings are not memoized: they would shadow the models' answers
+        if words and routes["map"].name != "local":
+            mood_memo.set(mood_memo_key(words), unique_moods)
+
+        return unique_moods
 
-        # ✅ Extract and clean GPT response
-        mapped_moods = response.choices[0].message.content.strip().lower()
+    except Exception as e:
+        print(f"⚠️ Error in mapping mood: {e}")
+        metrics.annotate(fallback=True, error=str(e))
+        return ["neutral", "neutral", "neutral"]  # Default in case of error
+
+
+@metrics.tracked("map_to_valid_mood")
+async def map_to_valid_mood_async(mood_words):
+    """Async variant of `map_to_valid_mood`, through the async client of the task's backend."""
+    words = [word for word in (normalize_mood_word(mood) for mood in mood_words) if word]
+    memoized_moods = lookup_mood_mapping(words)
+    metrics.annotate(cache="hit" if memoized_moods else "miss")
+    if memoized_moods:
+        return memoized_moods
 
-        # ✅ Handle cases where GPT incorrectly formats the output
-        mapped_moods = mapped_moods.replace("[", "").replace("]", "").replace("'", "").replace('"', "")
-        mapped_moods = mapped_moods.split(", ")
-        mapped_moods = [mood.strip() for mood in mapped_moods if mood in VALID_MOOD_WORDS]
+    return await inflight.do_async(("map", mood_memo_key(words)), _map_with_gpt_async, mood_words, words)
 
-        # ✅ Ensure exactly 3 unique moods
-        unique_moods = list(dict.fromkeys(mapped_moods))  # Remove duplicates while keeping order
 
-        # ✅ Fill with "neutral" if fewer than 3 moods are returned
-        while len(unique_moods) < 3:
-            unique_moods.append("neutral")
+async def _map_with_gpt_async(mood_words, words):
+    """Async variant of `_map_with_gpt`."""
+    try:
+        response = await complete_async("map", map_mood_messages(mood_words))
+        metrics.record_usage(response)
+        unique_moods = parse_mapped_moods(response.choices[0].message.content)
+
+        # ✅ The local engine's mappings are not memoized: they would shadow the models' answers
+        if words and routes["map"].name != "local":
+            mood_memo.set(mood_memo_key(words), unique_moods)
 
-        return unique_moods[:3]  # Always return a single flat list of 3 moods
+        return unique_moods
 
     except Exception as e:
         print(f"⚠️ Error in mapping mood: {e}")
-        return ["neutral", "neutral", "neutral"]  # Default in case of error
+        metrics.annotate(fallback=True, error=str(e))
+        return ["neutral", "neutral", "neutral"]
+
+
+# ✅ Mood detections of normalized (and near-identical) inputs, reused without a GPT call
+detection_cache = DetectionCache(max_entries=DETECT_CACHE_MAX_ENTRIES, threshold=DETECT_CACHE_THRESHOLD)
+
+# Result of a failed detection, which is not cached
+DETECTION_FALLBACK = (["neutral", "neutral", "neutral"], [], [])
+
+
+def lookup_detection(user_input, mode):
+    """Returns the cached detection of an equal or near-identical input, or None (records the cache result)."""
+    if not DETECT_CACHE:
+        return None
+    result, outcome = detection_cache.get(user_input, (routes["detect"].name, mode))
+    metrics.annotate(cache=outcome)
+    return result
+
+
+def store_detection(user_input, mode, result):
+    """Caches a detection, unless it is the fallback of a failed GPT call."""
+    if DETECT_CACHE and tuple(result) != DETECTION_FALLBACK:
+        detection_cache.set(user_input, (routes["detect"].name, mode), result)
+    return result
+
+
+def detection_key(user_input, mode):
+    """Coalescing key of a mood detection: inputs differing only in case or spacing are equivalent."""
+    return ("detect", mode, " ".join(user_input.lower().split()))
 
 
 # ✅ Function to Detect Mood
-def detect_mood(user_input):
+@metrics.tracked("detect_mood")
+def detect_mood(user_input, use_lexicon=MOOD_LEXICON, mode=MOOD_DETECTION_MODE):
     """
     Detects mood from user input:
+    - Returns moods explicitly named in the input without calling GPT (when `use_lexicon` is on and confident).
     - Extracts key words from the user's input.
-    - Uses GPT to map detected moods to `VALID_MOOD_WORDS`.
+    - Uses GPT to map detected moods to `VALID_MOOD_WORDS`:
+      `mode="structured"` does it in one call constrained to the valid moods,
+      `mode="two_step"` detects free-form moods and maps unknown ones with a second call.
     - Returns ['invalid'] for non-emotional input.
+    - Detections of equal or near-identical inputs are reused from `detection_cache`.
+    - Concurrent calls for the same input (ignoring case and spacing) share one GPT request.
+    """
+    if use_lexicon:
+        lexicon_result = match_moods(user_input)
+        if lexicon_result:
+            metrics.annotate(source="lexicon")
+            return lexicon_result
+
+    cached = lookup_detection(user_input, mode)
+    if cached is not None:
+        return cached
+
+    metrics.annotate(source=mode)
+    detect = detect_mood_structured if mode == "structured" else detect_mood_two_step
+    return store_detection(user_input, mode, inflight.do(detection_key(user_input, mode), detect, user_input))
+
+
+@metrics.tracked("detect_mood")
+async def detect_mood_async(user_input, use_lexicon=MOOD_LEXICON, mode=MOOD_DETECTION_MODE):
+    """Async variant of `detect_mood`, through the async client of the task's backend."""
+    if use_lexicon:
+        lexicon_result = match_moods(user_input)
+        if lexicon_result:
+            metrics.annotate(source="lexicon")
+            return lexicon_result
+
+    cached = lookup_detection(user_input, mode)
+    if cached is not None:
+        return cached
+
+    metrics.annotate(source=mode)
+    detect = detect_mood_structured_async if mode == "structured" else detect_mood_two_step_async
+    result = await inflight.do_async(detection_key(user_input, mode), detect, user_input)
+    return store_detection(user_input, mode, result)
+
+
+# ✅ JSON schema restricting GPT's moods to `VALID_MOOD_WORDS` (or "invalid")
+MOOD_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "mood_detection",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "detected_moods": {
+                    "type": "array",
+                    "items": {"type": "string", "enum": sorted(VALID_MOOD_WORDS) + ["invalid"]},
+                },
+                "extracted_words": {"type": "array", "items": {"type": "string"}},
+            },
+            "required": ["detected_moods", "extracted_words"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def parse_structured_moods(content):
+    """Parses a `MOOD_RESPONSE_FORMAT` reply into the (final_moods, extracted_words, detected_moods) triple."""
+    json_response = json.loads(content)
+    detected_moods = json_response["detected_moods"]
+    extracted_words = json_response["extracted_words"]
+
+    final_moods = list(dict.fromkeys(mood for mood in detected_moods if mood in VALID_MOOD_WORDS))
+    if not final_moods and "invalid" in detected_moods:
+        return ["invalid"], [], []
+
+    while len(final_moods) < 3:
+        final_moods.append("neutral")
+
+    return final_moods[:3], extracted_words, detected_moods
+
+
+def detect_mood_structured(user_input):
     """
-    valid_moods_string = ", ".join(VALID_MOOD_WORDS)
+    Detects mood with a single GPT call whose output is constrained by `MOOD_RESPONSE_FORMAT`,
+    so every returned mood is already valid and no mapping call is needed.
+    """
+    try:
+        response = complete("detect", structured_mood_messages(user_input), response_format=MOOD_RESPONSE_FORMAT)
+        metrics.record_usage(response)
+        return parse_structured_moods(response.choices[0].message.content)
 
-    prompt = f"""
-    Analyze the user input {user_input} and:
-    If the input {user_input} has any words that are related to at least one of these words {valid_moods_string} or related to the nouns of {valid_moods_string}, return output as a **valid JSON object** with:
-        - "detected_moods": **Always a list of exactly 3 different mood words that best describe the user's input {user_input}** 
-        - "extracted_words": The key words you identified in the user's input {user_input}.
+    except Exception as e:
+        print(f"⚠️ Error in detect_mood: {e}")
+        metrics.annotate(fallback=True, error=str(e))
+        return ["neutral", "neutral", "neutral"], [], []
 
-    If input {user_input} is **related to a mood** but not related to at least one of these words {valid_moods_string} or related to the nouns of {valid_moods_string}, return output as a **valid JSON object** with:
-        - "detected_moods": **Always a list of exactly 3 different mood words that best describe the user's input {user_input}** 
-        - "extracted_words": The key words you identified in the user's input {user_input}.
 
-    If the input {user_input} is **COMPLETELY NOT related to a mood** (e.g., "What time is it?"), return output as a **valid JSON object** with:
-        - "detected_moods": ["invalid"] 
-        - "extracted_words": [].
+async def detect_mood_structured_async(user_input):
+    """Async variant of `detect_mood_structured`."""
+    try:
+        response = await complete_async(
+            "detect",
+            structured_mood_messages(user_input),
+            response_format=MOOD_RESPONSE_FORMAT,
+        )
+        metrics.record_usage(response)
+        return parse_structured_moods(response.choices[0].message.content)
+
+    except Exception as e:
+        print(f"⚠️ Error in detect_mood: {e}")
+        metrics.annotate(fallback=True, error=str(e))
+        return ["neutral", "neutral", "neutral"], [], []
 
-    Example:
-    User input: "I feel a bit lost and unsure what to do."
-    Response:
-    {{"detected_moods": ["melancholic", "uncertain", "conflicted"], "extracted_words": ["lost", "unsure"]}}
 
-    User input: "What time is it?"
-    Response:
-    {{"detected_moods": ["invalid"], "extracted_words": []}}
-    """
+def combine_moods(known_moods, mapped_moods):
+    """Combines known and mapped moods into 3 unique moods, padded with "neutral"."""
+    final_moods = list(dict.fromkeys(known_moods + mapped_moods))  # Remove duplicates
 
+    while len(final_moods) < 3:
+        final_moods.append("neutral")
+
+    return final_moods[:3]
+
+
+def detect_mood_two_step(user_input):
+    """
+    Detects mood with free-form JSON output, then maps moods outside `VALID_MOOD_WORDS`
+    with `map_to_valid_mood` (a second GPT call unless memoized).
+    """
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "system", "content": prompt}]
-        )
+        response = complete("detect", detect_mood_messages(user_input))
+        metrics.record_usage(response)
 
         json_response = json.loads(response.choices[0].message.content.strip())
         detected_moods = json_response.get("detected_moods", [])
@@ -145,75 +370,394 @@ def detect_mood(user_input):
         # ✅ Map unknown moods to valid moods using GPT only if necessary
         mapped_moods = map_to_valid_mood(unknown_moods) if unknown_moods else []
 
-        # ✅ Combine known and mapped moods, ensuring 3 unique moods
-        final_moods = list(dict.fromkeys(known_moods + mapped_moods))  # Remove duplicates
+        return combine_moods(known_moods, mapped_moods), extracted_words, detected_moods
+
+    except json.JSONDecodeError:
+        print("⚠️ Error: GPT returned invalid JSON.")
+        metrics.annotate(fallback=True, error="invalid JSON")
+        return ["neutral", "neutral", "neutral"], [], []
+
+    except Exception as e:
+        print(f"⚠️ Error in detect_mood: {e}")
+        metrics.annotate(fallback=True, error=str(e))
+        return ["neutral", "neutral", "neutral"], [], []
+
+
+async def detect_mood_two_step_async(user_input):
+    """Async variant of `detect_mood_two_step`."""
+    try:
+        response = await complete_async("detect", detect_mood_messages(user_input))
+        metrics.record_usage(response)
+
+        json_response = json.loads(response.choices[0].message.content.strip())
+        detected_moods = json_response.get("detected_moods", [])
+        extracted_words = json_response.get("extracted_words", [])
+
+        if detected_moods == ["invalid"]:
+            return ["invalid"], [], []
 
-        while len(final_moods) < 3:
-            final_moods.append("neutral")
+        known_moods = [mood for mood in detected_moods if mood in VALID_MOOD_WORDS]
+        unknown_moods = [mood for mood in detected_moods if mood not in VALID_MOOD_WORDS]
+        mapped_moods = await map_to_valid_mood_async(unknown_moods) if unknown_moods else []
 
-        return final_moods[:3], extracted_words, detected_moods
+        return combine_moods(known_moods, mapped_moods), extracted_words, detected_moods
 
     except json.JSONDecodeError:
         print("⚠️ Error: GPT returned invalid JSON.")
+        metrics.annotate(fallback=True, error="invalid JSON")
         return ["neutral", "neutral", "neutral"], [], []
-    
+
     except Exception as e:
         print(f"⚠️ Error in detect_mood: {e}")
+        metrics.annotate(fallback=True, error=str(e))
         return ["neutral", "neutral", "neutral"], [], []
 
 
-def get_movies_by_mood(mood_words, movies):
+# ✅ Persistent cache of GPT rankings, keyed by catalog version, model, overview compression, top_k and sorted mood set
+ranking_cache = JsonCache("rankings", max_entries=RANKING_CACHE_MAX_ENTRIES, ttl=RANKING_CACHE_TTL)
+
+
+def ranking_cache_key(mood_words, movies, top_k):
+    """Builds the ranking cache key; the order of the mood words does not matter."""
+    moods = sorted(set(word.strip().lower() for word in mood_words))
+    return (
+        f"{catalog_version(movies)}|{routes['rank'].model}|{settings_key()}|{top_k}|{'+'.join(moods)}"
+    )
+
+
+def select_candidates(mood_words, movies, top_k):
+    """Returns the catalog indices sent to GPT: the `top_k` locally pre-ranked movies, or all of them."""
+    if top_k and len(movies) > top_k:
+        return rank_movies(mood_words, movies, top_k)
+    return list(range(len(movies)))
+
+
+def parse_ranking(content, candidate_indices):
+    """Parses GPT's ranking reply into [catalog index, match reason] pairs (1-based candidate numbers)."""
+    json_response = json.loads(content.strip())
+
+    ranking = []
+    for entry in json_response:
+        index = entry["index"] - 1
+        explanation = entry.get("match_reason", "Trending movie recommendation.")
+        if 0 <= index < len(candidate_indices):
+            ranking.append([candidate_indices[index], explanation])
+    return ranking
+
+
+@metrics.tracked("get_movies_by_mood")
+def get_movies_by_mood(mood_words, movies, top_k=RANKING_TOP_K, use_cache=True):
     """
     Uses GPT to rank movies based on detected moods or extracted words.
     ✅ If mood is ["neutral", "neutral", "neutral"], match using extracted words.
     ✅ Otherwise, rank movies based on emotional relevance.
+    ✅ Movies are first pre-ranked locally, and only the `top_k` best candidates are sent to GPT
+       (`top_k=0` sends the whole catalog).
+    ✅ Rankings are cached per mood set and catalog version; the returned movies are copies.
+    ✅ Concurrent calls for the same mood set and catalog share one GPT request.
+    ✅ With `RANKING_MODE=matrix`, the precomputed affinity matrix ranks the movies instead of GPT.
     """
 
     if not movies:
         print("⚠️ No movies available to match moods.")
         return []
 
-    movie_descriptions = "\n".join(
-        [f"{i+1}. {m['title']}: {m['overview']}" for i, m in enumerate(movies)]
+    if RANKING_MODE == "matrix":
+        return rank_with_matrix(mood_words, movies, use_cache)
+
+    key = ranking_cache_key(mood_words, movies, top_k)
+    if use_cache:
+        cached_ranking = ranking_cache.get(key)
+        metrics.annotate(cache="hit" if cached_ranking else "miss")
+        if cached_ranking:
+            return [dict(movies[index], match_reason=reason) for index, reason in cached_ranking]
+
+    return inflight.do(("rank", key, use_cache), _rank_with_gpt, mood_words, movies, top_k, key, use_cache)
+
+
+def _rank_with_gpt(mood_words, movies, top_k, key, use_cache):
+    """Asks GPT to rank the pre-ranked candidates and caches the ranking under `key` (with `use_cache`)."""
+    candidate_indices = select_candidates(mood_words, movies, top_k)
+    candidates = [movies[i] for i in candidate_indices]
+    metrics.annotate(candidates=len(candidates))
+
+    try:
+        response = complete("rank", ranking_messages(mood_words, compress_movies(candidates)))
+        metrics.record_usage(response)
+        ranking = parse_ranking(response.choices[0].message.content, candidate_indices)
+
+        if use_cache and ranking:
+            ranking_cache.set(key, ranking)
+
+        return [dict(movies[index], match_reason=reason) for index, reason in ranking]
+
+    except Exception as e:
+        print(f"⚠️ Error ranking movies: {e}")
+        metrics.annotate(fallback=True, error=str(e))
+        return [dict(movie) for movie in movies[:3]]  # Default to trending movies
+
+
+@metrics.tracked("get_movies_by_mood")
+async def get_movies_by_mood_async(mood_words, movies, top_k=RANKING_TOP_K, use_cache=True):
+    """Async variant of `get_movies_by_mood`, through the async client of the task's backend (same ranking cache)."""
+    if not movies:
+        print("⚠️ No movies available to match moods.")
+        return []
+
+    if RANKING_MODE == "matrix":
+        return await rank_with_matrix_async(mood_words, movies, use_cache)
+
+    key = ranking_cache_key(mood_words, movies, top_k)
+    if use_cache:
+        cached_ranking = ranking_cache.get(key)
+        metrics.annotate(cache="hit" if cached_ranking else "miss")
+        if cached_ranking:
+            return [dict(movies[index], match_reason=reason) for index, reason in cached_ranking]
+
+    return await inflight.do_async(
+        ("rank", key, use_cache), _rank_with_gpt_async, mood_words, movies, top_k, key, use_cache
     )
 
-    prompt = f"""
-    You must output only valid JSON and nothing else.
-    The JSON should be an array of exactly 3 objects.
-    Each object must have two keys: "index" (an integer) and "match_reason" (a non-empty string).
-    
-    The user’s detected moods: {", ".join(mood_words)}.
-    
-    Below are movie descriptions:
-    {movie_descriptions}
-    
-    Select the top 3 movies that best match this mood or extracted words and provide a brief explanation (1-2 sentences) for each.
-    Respond strictly in JSON format:
-    [
-        {{"index": 1, "match_reason": "Explanation for movie 1"}},
-        {{"index": 2, "match_reason": "Explanation for movie 2"}},
-        {{"index": 3, "match_reason": "Explanation for movie 3"}}
-    ]
-    """
-    
+
+async def _rank_with_gpt_async(mood_words, movies, top_k, key, use_cache):
+    """Async variant of `_rank_with_gpt`."""
+    candidate_indices = select_candidates(mood_words, movies, top_k)
+    candidates = [movies[i] for i in candidate_indices]
+    metrics.annotate(candidates=len(candidates))
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "system", "content": prompt}]
+        response = await complete_async("rank", ranking_messages(mood_words, compress_movies(candidates)))
+        metrics.record_usage(response)
+        ranking = parse_ranking(response.choices[0].message.content, candidate_indices)
+
+        if use_cache and ranking:
+            ranking_cache.set(key, ranking)
+
+        return [dict(movies[index], match_reason=reason) for index, reason in ranking]
+
+    except Exception as e:
+        print(f"⚠️ Error ranking movies: {e}")
+        metrics.annotate(fallback=True, error=str(e))
+        return [dict(movie) for movie in movies[:3]]
+
+
+def rank_with_matrix(mood_words, movies, use_cache=True):
+    """
+    Ranks movies with the precomputed mood x movie affinity matrix (no GPT call).
+    With `AFFINITY_REASONS`, GPT writes the match reasons of the winners (cached like rankings).
+    """
+    metrics.annotate(source="matrix")
+    ranking = affinity.rank(mood_words, movies)
+    if AFFINITY_REASONS and ranking:
+        key = ranking_cache_key(mood_words, movies, "matrix")
+        cached_ranking = ranking_cache.get(key) if use_cache else None
+        ranking = cached_ranking or inflight.do(
+            ("explain", key, use_cache), _explain_with_gpt, mood_words, movies, ranking, key, use_cache
+        )
+    return [dict(movies[index], match_reason=reason) for index, reason in ranking]
+
+
+def _explain_with_gpt(mood_words, movies, ranking, key, use_cache):
+    """Asks GPT for the match reasons of the ranked movies; keeps the default reasons on errors."""
+    try:
+        candidates = compress_movies([movies[index] for index, _ in ranking])
+        response = complete("rank", ranking_messages(mood_words, candidates))
+        metrics.record_usage(response)
+        return _with_reasons(ranking, response.choices[0].message.content, key, use_cache)
+
+    except Exception as e:
+        print(f"⚠️ Error explaining movies: {e}")
+        metrics.annotate(fallback=True, error=str(e))
+        return ranking
+
+
+async def rank_with_matrix_async(mood_words, movies, use_cache=True):
+    """Async variant of `rank_with_matrix`."""
+    metrics.annotate(source="matrix")
+    ranking = affinity.rank(mood_words, movies)
+    if AFFINITY_REASONS and ranking:
+        key = ranking_cache_key(mood_words, movies, "matrix")
+        cached_ranking = ranking_cache.get(key) if use_cache else None
+        ranking = cached_ranking or await inflight.do_async(
+            ("explain", key, use_cache), _explain_with_gpt_async, mood_words, movies, ranking, key, use_cache
+        )
+    return [dict(movies[index], match_reason=reason) for index, reason in ranking]
+
+
+async def _explain_with_gpt_async(mood_words, movies, ranking, key, use_cache):
+    """Async variant of `_explain_with_gpt`."""
+    try:
+        candidates = compress_movies([movies[index] for index, _ in ranking])
+        response = await complete_async("rank", ranking_messages(mood_words, candidates))
+        metrics.record_usage(response)
+        return _with_reasons(ranking, response.choices[0].message.content, key, use_cache)
+
+    except Exception as e:
+        print(f"⚠️ Error explaining movies: {e}")
+        metrics.annotate(fallback=True, error=str(e))
+        return ranking
+
+
+def _with_reasons(ranking, content, key, use_cache):
+    """Replaces the default reasons of `ranking` with GPT's, keeping the matrix order, and caches the result."""
+    reasons = dict(parse_ranking(content, list(range(len(ranking)))))
+    ranking = [[index, reasons.get(position, reason)] for position, (index, reason) in enumerate(ranking)]
+    if use_cache:
+        ranking_cache.set(key, ranking)
+    return ranking
+
+
+def score_affinity(moods, movies, batch_size=10):
+    """
+    Scores every movie against each mood with GPT (0-10, scaled to 0-1), `batch_size` moods per call.
+    Used by the weekly affinity batch job (`python affinity.py --scorer llm`);
+    batches GPT fails to score fall back to local TF-IDF scores.
+    """
+    scores = []
+    for start in range(0, len(moods), batch_size):
+        batch = moods[start:start + batch_size]
+        try:
+            response = complete("rank", affinity_messages(batch, movies), response_format={"type": "json_object"})
+            metrics.record_usage(response)
+            batch_scores = json.loads(response.choices[0].message.content)
+            rows = []
+            for mood in batch:
+                row = [float(score) / 10 for score in batch_scores.get(mood, [])[:len(movies)]]
+                rows.append(row + [0.0] * (len(movies) - len(row)))
+            scores.extend(rows)
+        except Exception as e:
+            print(f"⚠️ Error scoring moods {', '.join(batch)}: {e}")
+            scores.extend(affinity.local_scores(batch, movies).tolist())
+    return scores
+
+
+def summarize_overviews(movies, batch_size=10):
+    """
+    Summarizes the overviews of movies within `OVERVIEW_TOKENS` tokens, `batch_size` movies per call.
+    Used to precompute the summaries of ranking prompts (`python overviews.py`, or the warm-up);
+    movies the backend fails to summarize get None (and keep their extractive overview).
+    """
+    summaries = []
+    for start in range(0, len(movies), batch_size):
+        batch = movies[start:start + batch_size]
+        try:
+            response = complete(
+                "rank", summary_messages(batch, max(1, int(OVERVIEW_TOKENS * WORDS_PER_TOKEN))),
+                response_format={"type": "json_object"},
+            )
+            metrics.record_usage(response)
+            texts = json.loads(response.choices[0].message.content).get("summaries", [])[:len(batch)]
+            summaries.extend([str(text).strip() or None for text in texts] + [None] * (len(batch) - len(texts)))
+        except Exception as e:
+            print(f"⚠️ Error summarizing overviews: {e}")
+            summaries.extend([None] * len(batch))
+    return summaries
+
+
+def iter_json_objects(chunks):
+    """
+    Incrementally parses a streamed JSON array of objects.
+    Yields each top-level object as soon as its closing brace arrives, ignoring text around the array.
+    """
+    buffer = ""
+    depth = 0
+    start = None
+    in_string = False
+    escaped = False
+    for chunk in chunks:
+        offset = len(buffer)
+        buffer += chunk
+        for i in range(offset, len(buffer)):
+            char = buffer[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == "{":
+                if depth == 0:
+                    start = i
+                depth += 1
+            elif char == "}" and depth > 0:
+                depth -= 1
+                if depth == 0:
+                    yield json.loads(buffer[start:i + 1])
+        if depth == 0:
+            # ✅ Nothing pending: drop the parsed text to keep the buffer small
+            buffer = ""
+
+
+def stream_text(stream):
+    """Yields the text deltas of a streamed completion and records the usage sent in its final chunk."""
+    for chunk in stream:
+        metrics.record_usage(chunk)
+        if chunk.choices:
+            yield chunk.choices[0].delta.content or ""
+
+
+@metrics.tracked("stream_movies_by_mood")
+def stream_movies_by_mood(mood_words, movies, top_k=RANKING_TOP_K, use_cache=True):
+    """
+    Streaming variant of `get_movies_by_mood`:
+    yields each recommended movie (a copy with "match_reason") as soon as GPT has written its entry.
+    Cached rankings are yielded at once; on errors before the first movie, the top 3 trending movies are yielded.
+    Concurrent streams of the same mood set and catalog share one GPT request: the first one streams it,
+    the others get the whole ranking once it is complete (and cached).
+    """
+    if not movies:
+        print("⚠️ No movies available to match moods.")
+        return
+
+    if RANKING_MODE == "matrix":
+        yield from rank_with_matrix(mood_words, movies, use_cache)
+        return
+
+    key = ranking_cache_key(mood_words, movies, top_k)
+    if use_cache:
+        cached_ranking = ranking_cache.get(key)
+        metrics.annotate(cache="hit" if cached_ranking else "miss")
+        if cached_ranking:
+            for index, reason in cached_ranking:
+                yield dict(movies[index], match_reason=reason)
+            return
+
+    yield from inflight.stream(
+        ("rank_stream", key, use_cache), _stream_with_gpt, mood_words, movies, top_k, key, use_cache
+    )
+
+
+def _stream_with_gpt(mood_words, movies, top_k, key, use_cache):
+    """Streaming variant of `_rank_with_gpt`: yields the ranked movies as GPT writes them."""
+    candidate_indices = select_candidates(mood_words, movies, top_k)
+    candidates = [movies[i] for i in candidate_indices]
+    metrics.annotate(candidates=len(candidates))
+    ranking = []
+    try:
+        stream = complete(
+            "rank",
+            ranking_messages(mood_words, compress_movies(candidates)),
+            stream=True,
+            stream_options={"include_usage": True},
         )
-        json_response = json.loads(response.choices[0].message.content.strip())
 
-        matched_movies = []
-        for entry in json_response:
-            index = entry["index"] - 1
+        for entry in iter_json_objects(stream_text(stream)):
+            index = entry.get("index", 0) - 1
             explanation = entry.get("match_reason", "Trending movie recommendation.")
-            if 0 <= index < len(movies):
-                matched_movie = movies[index]
-                matched_movie["match_reason"] = explanation
-                matched_movies.append(matched_movie)
+            if 0 <= index < len(candidates):
+                ranking.append([candidate_indices[index], explanation])
+                yield dict(movies[candidate_indices[index]], match_reason=explanation)
 
-        return matched_movies
+        if use_cache and ranking:
+            ranking_cache.set(key, ranking)
 
     except Exception as e:
         print(f"⚠️ Error ranking movies: {e}")
-        return movies[:3]  # Default to trending movies
\ No newline at end of file
+        metrics.annotate(error=str(e))
+        if not ranking:
+            metrics.annotate(fallback=True)
+            for movie in movies[:3]:  # Default to trending movies
+                yield dict(movie)
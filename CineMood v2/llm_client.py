@@ -0,0 +1,280 @@
+"""
+Resilient OpenAI clients used by `llm.py`.
+
+The wrappers keep the `client.chat.completions.create(...)` interface of the OpenAI SDK and add:
+- A per-attempt timeout (`OPENAI_TIMEOUT`) and an overall deadline per call (`OPENAI_DEADLINE`,
+  or `deadline=` seconds passed to `create`), so a slow upstream cannot stall a worker.
+- Retries of 429/5xx, timeout and connection errors with jittered exponential backoff
+  (honouring `Retry-After`), within the deadline.
+- A pooled HTTP client sized by `OPENAI_MAX_CONNECTIONS`.
+- Streamed completions (`stream=True`) count as successful only once consumed to the end.
+- A circuit breaker shared by the sync and async clients: after `CIRCUIT_FAILURE_THRESHOLD` failed calls in a row,
+  calls fail fast with `CircuitOpenError` (which `llm.py` turns into its usual fallbacks) for
+  `CIRCUIT_RESET_TIMEOUT` seconds, then a single trial call decides whether to close it again.
+"""
+import asyncio
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import openai
+
+try:
+    import httpx
+except ImportError:  # newer OpenAI SDK releases depend on the same library published as `httpx2`
+    import httpx2 as httpx
+
+import metrics
+from config import (
+    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT, OPENAI_API_KEY, OPENAI_BACKOFF_BASE, OPENAI_BACKOFF_MAX,
+    OPENAI_BASE_URL, OPENAI_DEADLINE, OPENAI_MAX_CONNECTIONS, OPENAI_MAX_RETRIES, OPENAI_TIMEOUT
+)
+
+# Errors worth retrying: rate limits, server errors, timeouts and connection failures
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Counts consecutive failed calls:
+    - "closed": calls go through; `failure_threshold` failures in a row open the circuit.
+    - "open": calls are rejected until `reset_timeout` seconds have passed.
+    - "half_open": one trial call goes through; its success closes the circuit, its failure reopens it.
+    """
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT,
+                 name="OpenAI"):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Returns whether a call may go to the upstream now."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                return True
+            return False  # open, or half-open with its trial call in flight
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"⚠️ {self.name} circuit opened after {self.failures} failed calls")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """Lets the next call try again when the half-open trial ended without an answer (cancelled, interrupted)."""
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "open"
+
+
+def is_retryable(error):
+    """Returns whether `error` is a transient upstream failure."""
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def backoff_delay(attempt, error=None, base=OPENAI_BACKOFF_BASE, cap=OPENAI_BACKOFF_MAX):
+    """
+    Returns the delay before retry number `attempt` (0-based):
+    the upstream's `Retry-After` when given, otherwise "full jitter" exponential backoff.
+    """
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        if retry_after is not None:
+            return min(float(retry_after), cap)
+    except ValueError:
+        pass
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class _Call:
+    """Retry bookkeeping of one `create` call (a context manager around its attempts)."""
+
+    def __init__(self, breaker, kwargs, max_retries):
+        if not breaker.allow():
+            metrics.annotate(circuit="open")
+            raise CircuitOpenError(f"{breaker.name} circuit breaker is open")
+        self.breaker = breaker
+        self.max_retries = max_retries
+        self.deadline = time.monotonic() + (kwargs.pop("deadline", None) or OPENAI_DEADLINE)
+        self.kwargs = kwargs
+        self.attempt = 0
+
+    def attempt_kwargs(self):
+        """The request arguments with the attempt's timeout (capped by the remaining deadline)."""
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise openai.APITimeoutError(request=None)
+        return {**self.kwargs, "timeout": min(self.kwargs.get("timeout") or OPENAI_TIMEOUT, remaining)}
+
+    def retry_delay(self, error):
+        """Returns the delay before the next attempt, or None if `error` should be raised."""
+        if not is_retryable(error) or self.attempt >= self.max_retries:
+            return None
+        delay = backoff_delay(self.attempt, error)
+        if time.monotonic() + delay >= self.deadline:
+            return None
+        self.attempt += 1
+        metrics.annotate(retries=1)
+        return delay
+
+    def failed(self, error):
+        """Counts upstream failures (not client errors such as invalid requests) towards the breaker."""
+        if is_retryable(error) or isinstance(error, openai.APITimeoutError):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        # ✅ Errors are counted by `failed`; a cancelled or interrupted trial call must not leave the breaker half-open
+        if exc_type is not None and not issubclass(exc_type, Exception):
+            self.breaker.release_trial()
+
+
+class _MonitoredStream:
+    """
+    A streamed completion that reports its outcome to the breaker once it has been consumed (not when it opens):
+    a stream failing midway counts as a failed call.
+    """
+
+    def __init__(self, stream, call):
+        self._stream = stream
+        self._call = call
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def __iter__(self):
+        with self._call:
+            try:
+                yield from self._stream
+            except Exception:
+                self._call.breaker.record_failure()
+                raise
+            self._call.breaker.record_success()
+
+    async def __aiter__(self):
+        with self._call:
+            try:
+                async for chunk in self._stream:
+                    yield chunk
+            except Exception:
+                self._call.breaker.record_failure()
+                raise
+            self._call.breaker.record_success()
+
+
+class ResilientClient:
+    """Wraps an `openai.OpenAI` client: `client.chat.completions.create(...)` with retries and a breaker."""
+
+    def __init__(self, client, breaker, max_retries=OPENAI_MAX_RETRIES):
+        self.client = client
+        self.breaker = breaker
+        self.max_retries = max_retries
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        with _Call(self.breaker, kwargs, self.max_retries) as call:
+            while True:
+                try:
+                    response = self.client.chat.completions.create(**call.attempt_kwargs())
+                except Exception as e:
+                    delay = call.retry_delay(e)
+                    if delay is None:
+                        call.failed(e)
+                        raise
+                    time.sleep(delay)
+                    continue
+                if call.kwargs.get("stream"):
+                    return _MonitoredStream(response, call)
+                self.breaker.record_success()
+                return response
+
+
+class AsyncResilientClient:
+    """Async variant of `ResilientClient`, wrapping an `openai.AsyncOpenAI` client."""
+
+    def __init__(self, client, breaker, max_retries=OPENAI_MAX_RETRIES):
+        self.client = client
+        self.breaker = breaker
+        self.max_retries = max_retries
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        with _Call(self.breaker, kwargs, self.max_retries) as call:
+            while True:
+                try:
+                    response = await self.client.chat.completions.create(**call.attempt_kwargs())
+                except Exception as e:
+                    delay = call.retry_delay(e)
+                    if delay is None:
+                        call.failed(e)
+                        raise
+                    await asyncio.sleep(delay)
+                    continue
+                if call.kwargs.get("stream"):
+                    return _MonitoredStream(response, call)
+                self.breaker.record_success()
+                return response
+
+
+def connection_limits():
+    """Connection pool limits of the OpenAI HTTP clients."""
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS, max_keepalive_connections=OPENAI_MAX_CONNECTIONS
+    )
+
+
+# ✅ One breaker per process, shared by the sync and async clients (same upstream)
+breaker = CircuitBreaker()
+
+
+def create_client(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, circuit_breaker=None):
+    """
+    Builds the resilient sync client (SDK retries are disabled; `ResilientClient` retries instead).
+    Other OpenAI-compatible servers get their own `circuit_breaker` (default: the OpenAI one).
+    """
+    return ResilientClient(openai.OpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        timeout=OPENAI_TIMEOUT,
+        max_retries=0,
+        http_client=openai.DefaultHttpxClient(limits=connection_limits()),
+    ), circuit_breaker or breaker)
+
+
+def create_async_client(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, circuit_breaker=None):
+    """Builds the resilient async client."""
+    return AsyncResilientClient(openai.AsyncOpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        timeout=OPENAI_TIMEOUT,
+        max_retries=0,
+        http_client=openai.DefaultAsyncHttpxClient(limits=connection_limits()),
+    ), circuit_breaker or breaker)
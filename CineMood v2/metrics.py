@@ -0,0 +1,289 @@
+"""
+Instrumentation of the GPT and TMDB calls.
+
+Every tracked call produces one event with its duration, outcome and whatever the call annotated
+(prompt/completion tokens, cache result, retries, fallback and error). Events are:
+- logged as one JSON object per line on the "cinemood.metrics" logger (printed when `METRICS_LOG` is on),
+- aggregated into counters and latency histograms, rendered in the Prometheus text format by
+  `render_prometheus()` and exported over HTTP (`METRICS_PORT`) or to a file (`METRICS_FILE`).
+"""
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import METRICS_EXPORT_INTERVAL, METRICS_FILE, METRICS_LOG, METRICS_PORT
+
+# Upper bounds (seconds) of the latency histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+logger = logging.getLogger("cinemood.metrics")
+if METRICS_LOG and not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_lock = threading.Lock()
+_current_event = contextvars.ContextVar("cinemood_metrics_event", default=None)
+
+# (name, sorted label items) -> value
+_counters = {}
+# sorted label items -> {"buckets": [...], "sum": float, "count": int}
+_histograms = {}
+
+
+def _labels(**labels):
+    return tuple(sorted(labels.items()))
+
+
+def _increment(name, amount=1, **labels):
+    key = (name, _labels(**labels))
+    _counters[key] = _counters.get(key, 0) + amount
+
+
+def _observe(duration, **labels):
+    histogram = _histograms.setdefault(
+        _labels(**labels), {"buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0}
+    )
+    for i, bound in enumerate(DURATION_BUCKETS):
+        if duration <= bound:
+            histogram["buckets"][i] += 1
+    histogram["sum"] += duration
+    histogram["count"] += 1
+
+
+@contextmanager
+def track(operation, bind=True, **fields):
+    """
+    Tracks one call of `operation` and yields its event dict.
+    With `bind=True` the event becomes the current one, so `annotate` and `record_usage` in nested
+    code (and in threads started with `contextvars.copy_context()`) add to it.
+    """
+    event = {"operation": operation, **fields}
+    token = _current_event.set(event) if bind else None
+    start = time.perf_counter()
+    try:
+        yield event
+    except BaseException as e:
+        if not isinstance(e, GeneratorExit):
+            event.setdefault("error", f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        if token is not None:
+            _current_event.reset(token)
+        record(event, time.perf_counter() - start)
+
+
+def tracked(operation):
+    """
+    Decorator tracking every call of the decorated function (plain, coroutine or generator) as `operation`.
+    Generator functions are tracked from the first item to exhaustion (or close), and their event is
+    only current while the generator body runs, so annotations never leak into the consumer's code.
+    """
+    def decorator(function):
+        if inspect.isgeneratorfunction(function):
+            @functools.wraps(function)
+            def generator_wrapper(*args, **kwargs):
+                with track(operation, bind=False) as event:
+                    generator = function(*args, **kwargs)
+                    try:
+                        while True:
+                            token = _current_event.set(event)
+                            try:
+                                item = next(generator)
+                            except StopIteration:
+                                return
+                            finally:
+                                _current_event.reset(token)
+                            yield item
+                    finally:
+                        generator.close()
+            return generator_wrapper
+
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def coroutine_wrapper(*args, **kwargs):
+                with track(operation):
+                    return await function(*args, **kwargs)
+            return coroutine_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with track(operation):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_event():
+    """Returns the event of the innermost bound `track` block, or None."""
+    return _current_event.get()
+
+
+# Event fields summed across annotations (e.g. several page downloads or GPT calls in one tracked call)
+ADDITIVE = frozenset(["prompt_tokens", "completion_tokens", "retries"])
+
+
+def annotate(event=None, **fields):
+    """Sets `fields` on `event` (default: the current event); numeric fields named in `ADDITIVE` are summed."""
+    event = event if event is not None else _current_event.get()
+    if event is None:
+        return
+    with _lock:
+        for name, value in fields.items():
+            if name in ADDITIVE:
+                event[name] = event.get(name, 0) + value
+            else:
+                event[name] = value
+
+
+def record_usage(response, event=None):
+    """Adds the prompt and completion tokens reported in an OpenAI response (or final stream chunk)."""
+    usage = getattr(response, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    completion_tokens = getattr(usage, "completion_tokens", None)
+    if isinstance(prompt_tokens, int) and isinstance(completion_tokens, int):
+        annotate(event, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+
+def record(event, duration):
+    """Logs a finished event as JSON and adds it to the aggregated metrics."""
+    operation = event["operation"]
+    event["duration_ms"] = round(duration * 1000, 2)
+    event.setdefault("outcome", "fallback" if event.get("fallback") else "error" if "error" in event else "ok")
+
+    with _lock:
+        _increment("cinemood_calls_total", operation=operation, outcome=event["outcome"])
+        _observe(duration, operation=operation)
+        for kind in ("prompt", "completion"):
+            if event.get(f"{kind}_tokens"):
+                _increment("cinemood_tokens_total", event[f"{kind}_tokens"], operation=operation, type=kind)
+        if event.get("cache"):
+            _increment("cinemood_cache_lookups_total", operation=operation, result=event["cache"])
+        if event.get("retries"):
+            _increment("cinemood_retries_total", event["retries"], operation=operation)
+        if event.get("fallback"):
+            _increment("cinemood_fallbacks_total", operation=operation)
+        line = json.dumps({"ts": round(time.time(), 3), **event}, ensure_ascii=False, default=str)
+
+    logger.info(line)
+
+
+def snapshot():
+    """Returns the aggregated counters as {metric name: {label string: value}}, e.g. for tests and benchmarks."""
+    with _lock:
+        result = {}
+        for (name, labels), value in _counters.items():
+            result.setdefault(name, {})[",".join(f"{k}={v}" for k, v in labels)] = value
+        return result
+
+
+def reset():
+    """Clears the aggregated metrics."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _format_labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}" if items else ""
+
+
+METRIC_HELP = {
+    "cinemood_calls_total": "Tracked calls by operation and outcome (ok, fallback, error).",
+    "cinemood_tokens_total": "OpenAI tokens used, by operation and type (prompt, completion).",
+    "cinemood_cache_lookups_total": "Cache lookups by operation and result.",
+    "cinemood_retries_total": "HTTP retries by operation.",
+    "cinemood_fallbacks_total": "Calls that returned a fallback value after an error.",
+}
+
+
+def render_prometheus():
+    """Renders the aggregated metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        for name, description in METRIC_HELP.items():
+            series = sorted((labels, value) for (metric, labels), value in _counters.items() if metric == name)
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} counter"]
+            lines += [f"{name}{_format_labels(labels)} {value}" for labels, value in series]
+
+        name = "cinemood_call_duration_seconds"
+        lines += [f"# HELP {name} Duration of tracked calls.", f"# TYPE {name} histogram"]
+        for labels, histogram in sorted(_histograms.items()):
+            for bound, count in zip(DURATION_BUCKETS, histogram["buckets"]):
+                lines.append(f"{name}_bucket{_format_labels(labels, le=bound)} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, le='+Inf')} {histogram['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics_file(path=METRICS_FILE):
+    """Atomically writes the Prometheus text to `path` (e.g. for node_exporter's textfile collector)."""
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(render_prometheus())
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"⚠️ Error writing metrics file {path}: {e}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_exporter_started = False
+
+
+def start_exporter(port=METRICS_PORT, path=METRICS_FILE, interval=METRICS_EXPORT_INTERVAL):
+    """
+    Starts the configured exporters once per process (later calls do nothing):
+    - an HTTP server answering `GET /metrics` on `port` (0 disables it),
+    - a daemon thread rewriting the metrics file at `path` every `interval` seconds (empty disables it).
+    """
+    global _exporter_started
+    with _lock:
+        if _exporter_started:
+            return
+        _exporter_started = True
+
+    if port:
+        try:
+            server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, daemon=True, name="cinemood-metrics-http").start()
+        except OSError as e:
+            print(f"⚠️ Error starting metrics endpoint on port {port}: {e}")
+
+    if path:
+        def export_loop():
+            while True:
+                write_metrics_file(path)
+                time.sleep(interval)
+
+        threading.Thread(target=export_loop, daemon=True, name="cinemood-metrics-file").start()
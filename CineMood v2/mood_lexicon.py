@@ -0,0 +1,225 @@
+import re
+import threading
+
+from moods import MOOD_FAMILIES, MOOD_TO_FAMILY
+
+# Words that often appear in non-emotional sentences ("the content of...", "a tense verb"),
+# so on their own they are not enough to skip the LLM
+AMBIGUOUS_WORDS = frozenset([
+    "content", "torn", "tender", "tense", "bitter", "drained", "pumped", "blessed", "caring", "devoted",
+    "inspired", "possessive", "rejected", "abandoned", "isolated", "neutral", "satisfied",
+])
+
+NEGATIONS = frozenset([
+    "not", "no", "never", "nor", "without", "hardly", "barely", "neither", "nothing", "isn't", "aren't",
+    "wasn't", "weren't", "don't", "doesn't", "didn't", "dont", "doesnt", "didnt", "cannot", "can't", "cant",
+    "won't", "ain't", "haven't", "hasn't", "lack",
+])
+# A negation applies to a mood word at most this many tokens later, unless a contrast word comes between
+NEGATION_WINDOW = 3
+CONTRASTS = frozenset(["but", "yet", "though", "although", "however", "still"])
+
+# Words saying that the user talks about their own feelings ("I'm calm", "feeling so calm");
+# a cue applies to a mood word at most this many tokens later
+FEELING_CUES = frozenset([
+    "i'm", "im", "am", "feel", "feels", "feeling", "felt", "so", "been", "getting", "got",
+])
+CUE_WINDOW = 4
+# Words that may come between the moods of a bare list of moods ("tired and stressed", "so so happy")
+LIST_WORDS = frozenset([
+    "and", "or", "but", "also", "a", "bit", "little", "very", "really", "quite", "pretty", "too", "super", "kinda",
+    "kind", "of", "totally", "just", "today", "now",
+])
+# Words after a mood word that take it back or hedge it ("so happy but not really", "happy, maybe")
+HEDGES = frozenset(["maybe", "perhaps", "supposedly", "apparently", "whatever", "allegedly"])
+# Clauses end at sentence punctuation: a negation or hedge after a mood word only applies within its clause
+_CLAUSE_END = re.compile(r"[.!?;\n]+")
+
+# Leading words of questions ("Is this movie boring?"), which ask about something rather than express a mood
+QUESTION_WORDS = frozenset([
+    "is", "are", "was", "were", "do", "does", "did", "can", "could", "should", "would", "will", "what", "why",
+    "how", "which", "who", "when", "where",
+])
+
+# Irregular forms that suffix stripping cannot reach
+IRREGULAR_FORMS = {
+    "anxiety": "anxious", "anger": "angry", "fear": "fearful", "scared": "fearful", "afraid": "fearful",
+    "joy": "joyful", "hope": "hopeful",
+    "panic": "panicked", "paranoia": "paranoid", "jealousy": "jealous", "envy": "envious",
+    "gratitude": "grateful", "pride": "proud", "shame": "ashamed", "guilt": "guilty", "regret": "regretful",
+    "nostalgia": "nostalgic", "melancholy": "melancholic", "despair": "despairing", "boredom": "bored",
+    "loneliness": "lonely", "confusion": "confused", "romance": "romantic",
+    "peace": "peaceful", "fatigue": "fatigued", "exhaustion": "exhausted", "frustration": "frustrated",
+    "irritation": "irritated", "disgust": "disgusted", "sorrow": "sorrowful", "confidence": "confident",
+    "uncertainty": "uncertain",
+}
+
+# Common words that stem like a mood word without naming a mood ("I thought so" is not "thoughtful")
+FALSE_FRIENDS = frozenset(["thought", "thoughts"])
+
+SUFFIXES = ("nesses", "ness", "ment", "fully", "ful", "ingly", "ing", "edly", "ed", "ly", "es", "s")
+MIN_STEM_LENGTH = 4
+
+_TOKEN_PATTERN = re.compile(r"[a-z]+(?:[-'][a-z]+)*")
+
+stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def stem(word):
+    """Reduces a word to a crude stem, so that "stress", "stressed" and "stressful" compare equal."""
+    word = IRREGULAR_FORMS.get(word, word)
+    for suffix in SUFFIXES:
+        if suffix == "s" and word.endswith("ss"):
+            continue
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+            word = word[:-len(suffix)]
+            break
+    if word.endswith("e"):
+        word = word[:-1]
+    if word.endswith("i"):
+        word = word[:-1] + "y"
+    return word
+
+
+def tokenize(text):
+    """Lowercases `text` and splits it into word tokens, keeping hyphens and apostrophes inside words."""
+    return _TOKEN_PATTERN.findall(text.lower().replace("’", "'"))
+
+
+# ✅ Lookup tables built once: single-word stems and multi-word phrases ("deep in thought", "grossed out")
+_STEM_TO_MOOD = {}
+_PHRASES = {}
+for _mood in sorted(MOOD_TO_FAMILY):
+    _tokens = tokenize(_mood)
+    if len(_tokens) == 1 and "-" not in _mood:
+        _STEM_TO_MOOD.setdefault(stem(_mood), _mood)
+    else:
+        _PHRASES[tuple(stem(token) for token in _tokens)] = _mood
+
+
+def find_moods(text):
+    """
+    Finds mood words from `VALID_MOOD_WORDS` in `text`.
+    Returns a list of (mood, surface words, negated) tuples in order of appearance.
+    """
+    return [(mood, words, negated) for mood, words, negated, _ in _scan(tokenize(text))]
+
+
+def _scan(tokens):
+    """Returns (mood, surface words, negated, token index) tuples for the mood words in `tokens`."""
+    stems = [stem(token) for token in tokens]
+    matches = []
+    negated_until = -1
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token in NEGATIONS or token.endswith("n't"):
+            negated_until = i + NEGATION_WINDOW
+            i += 1
+            continue
+        if token in CONTRASTS:
+            negated_until = -1
+
+        phrase = next(
+            (phrase for phrase in _PHRASES if tuple(stems[i:i + len(phrase)]) == phrase),
+            None,
+        )
+        if phrase:
+            matches.append((_PHRASES[phrase], " ".join(tokens[i:i + len(phrase)]), i <= negated_until, i))
+            i += len(phrase)
+            continue
+
+        mood = _STEM_TO_MOOD.get(stems[i]) if token not in FALSE_FRIENDS else None
+        if mood:
+            matches.append((mood, token, i <= negated_until, i))
+        i += 1
+    return matches
+
+
+def fill_moods(moods, count=3):
+    """Pads `moods` to `count` unique moods with related moods from the same families."""
+    moods = list(dict.fromkeys(moods))
+    siblings = [
+        [mood for mood in MOOD_FAMILIES[MOOD_TO_FAMILY[seed]]["moods"] if mood not in moods]
+        for seed in moods
+    ]
+    while len(moods) < count and any(siblings):
+        for candidates in siblings:
+            if candidates and len(moods) < count:
+                mood = candidates.pop(0)
+                if mood not in moods:
+                    moods.append(mood)
+    while len(moods) < count:
+        moods.append("neutral")
+    return moods[:count]
+
+
+def _is_question(text, tokens):
+    return text.rstrip().endswith("?") or tokens[0] in QUESTION_WORDS
+
+
+def _clauses(text):
+    """Returns the tokens of `text` and the clause number of each token."""
+    tokens, clauses = [], []
+    for number, clause in enumerate(_CLAUSE_END.split(text)):
+        clause_tokens = tokenize(clause)
+        tokens += clause_tokens
+        clauses += [number] * len(clause_tokens)
+    return tokens, clauses
+
+
+def _is_hedged(tokens, clauses, matches):
+    """Whether a negation or hedge follows a mood word in its clause ("so happy but not really")."""
+    return any(
+        token in NEGATIONS or token.endswith("n't") or token in HEDGES
+        for _, words, _, i in matches
+        for j, token in enumerate(tokens[i + len(words.split()):], start=i + len(words.split()))
+        if clauses[j] == clauses[i]
+    )
+
+
+def _is_about_feelings(tokens, matches):
+    """Whether a mood word follows a feeling cue, or the input is nothing but a list of moods."""
+    if any(token in FEELING_CUES for mood, _, _, i in matches for token in tokens[max(0, i - CUE_WINDOW):i]):
+        return True
+    mood_positions = {i + offset for _, words, _, i in matches for offset in range(len(words.split()))}
+    return all(i in mood_positions or token in LIST_WORDS for i, token in enumerate(tokens))
+
+
+def match_moods(user_input):
+    """
+    Detects moods locally when the input explicitly names them as the user's feelings.
+    Returns the same (final_moods, extracted_words, detected_moods) triple as `detect_mood`,
+    or None when the match is not confident and the LLM should decide:
+    - a mood word is negated (or followed by a negation or hedge in its clause), or all of them are ambiguous;
+    - no mood word follows a feeling cue ("I'm", "feeling", "so"...), unless the input only lists moods;
+    - the input is a question.
+    """
+    tokens, clauses = _clauses(user_input)
+    matches = _scan(tokens)
+    confident = (
+        matches
+        and not any(negated for _, _, negated, _ in matches)
+        and any(mood not in AMBIGUOUS_WORDS for mood, _, _, _ in matches)
+        and not _is_hedged(tokens, clauses, matches)
+        and not _is_question(user_input, tokens)
+        and _is_about_feelings(tokens, matches)
+    )
+
+    with _stats_lock:
+        stats["hits" if confident else "misses"] += 1
+
+    if not confident:
+        return None
+
+    detected_moods = list(dict.fromkeys(mood for mood, _, _, _ in matches))
+    extracted_words = list(dict.fromkeys(words for _, words, _, _ in matches))
+    return fill_moods(detected_moods), extracted_words, detected_moods
+
+
+def get_stats():
+    """Returns the fast-path hit/miss counters and the hit rate."""
+    with _stats_lock:
+        total = stats["hits"] + stats["misses"]
+        return {**stats, "hit_rate": stats["hits"] / total if total else 0.0}
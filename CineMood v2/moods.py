@@ -0,0 +1,191 @@
+# ✅ Updated Mood List
+VALID_MOOD_WORDS = set([
+    "happy", "joyful", "cheerful", "delighted", "gleeful", "content", "lighthearted", "beaming",
+    "excited", "thrilled", "exhilarated", "ecstatic", "overjoyed", "pumped", "hyped", "giddy",
+    "grateful", "thankful", "appreciative", "blessed", "fulfilled", "satisfied",
+    "hopeful", "optimistic", "encouraged", "expectant", "inspired",
+    "loving", "affectionate", "romantic", "caring", "devoted", "tender",
+    "peaceful", "calm", "serene", "tranquil", "relaxed", "mellow",
+    "proud", "accomplished", "confident", "empowered", "self-assured",
+    
+    "sad", "melancholic", "gloomy", "heartbroken", "dejected", "sorrowful",
+    "lonely", "isolated", "abandoned", "rejected", "homesick", "neglected",
+    "hopeless", "despairing", "pessimistic", "defeated", "discouraged",
+    "bored", "indifferent", "unenthusiastic", "unstimulated", "listless",
+    "guilty", "remorseful", "regretful", "ashamed", "embarrassed",
+    "tired", "fatigued", "drained", "exhausted", "sluggish",
+    
+    "angry", "furious", "enraged", "irritated", "resentful", "bitter",
+    "frustrated", "annoyed", "exasperated", "impatient", "aggravated",
+    "jealous", "envious", "covetous", "possessive", "insecure",
+    "disgusted", "repulsed", "revolted", "grossed out", "nauseated",
+    
+    "anxious", "nervous", "worried", "uneasy", "apprehensive", "jittery",
+    "fearful", "terrified", "panicked", "paranoid", "tense", "alarmed",
+    "overwhelmed", "stressed", "pressured", "frazzled", "overloaded",
+    
+    "surprised", "shocked", "amazed", "astonished", "stunned", "flabbergasted",
+    "confused", "perplexed", "puzzled", "disoriented", "unsure", "uncertain",
+    "indecisive", "conflicted", "hesitant", "torn", "ambivalent",
+    
+    "neutral", "indifferent", "meh", "emotionless", "numb",
+    "bittersweet", "nostalgic", "wistful", "sentimental", "pensive",
+    "thoughtful", "introspective", "brooding", "deep in thought"
+])
+
+# ✅ Mood families grouping `VALID_MOOD_WORDS`, with story keywords that tend to fit each family.
+# Used for local (CPU-only) matching of moods against movie overviews.
+MOOD_FAMILIES = {
+    "joy": {
+        "moods": ["happy", "joyful", "cheerful", "delighted", "gleeful", "content", "lighthearted", "beaming"],
+        "keywords": ["comedy", "fun", "funny", "friends", "friendship", "family", "laugh", "party", "celebration",
+                     "musical", "dance", "heartwarming", "charming", "feel-good"],
+    },
+    "excitement": {
+        "moods": ["excited", "thrilled", "exhilarated", "ecstatic", "overjoyed", "pumped", "hyped", "giddy"],
+        "keywords": ["action", "adventure", "race", "battle", "mission", "heist", "epic", "explosive", "fight",
+                     "chase", "hero", "superhero", "quest", "championship"],
+    },
+    "gratitude": {
+        "moods": ["grateful", "thankful", "appreciative", "blessed", "fulfilled", "satisfied"],
+        "keywords": ["family", "home", "kindness", "community", "gift", "reunion", "together", "life",
+                     "heartwarming", "holiday"],
+    },
+    "hope": {
+        "moods": ["hopeful", "optimistic", "encouraged", "expectant", "inspired"],
+        "keywords": ["dream", "dreams", "journey", "hope", "true story", "overcome", "triumph", "inspiring",
+                     "underdog", "chance", "future", "believe"],
+    },
+    "love": {
+        "moods": ["loving", "affectionate", "romantic", "caring", "devoted", "tender"],
+        "keywords": ["love", "romance", "romantic", "couple", "marriage", "wedding", "relationship", "heart",
+                     "falls in love", "lovers", "date"],
+    },
+    "calm": {
+        "moods": ["peaceful", "calm", "serene", "tranquil", "relaxed", "mellow"],
+        "keywords": ["nature", "village", "gentle", "quiet", "summer", "countryside", "animated", "animals",
+                     "simple", "slow", "garden", "island"],
+    },
+    "pride": {
+        "moods": ["proud", "accomplished", "confident", "empowered", "self-assured"],
+        "keywords": ["champion", "victory", "success", "rise", "leader", "legend", "competition", "sports",
+                     "team", "win", "powerful", "strong"],
+    },
+    "sadness": {
+        "moods": ["sad", "melancholic", "gloomy", "heartbroken", "dejected", "sorrowful"],
+        "keywords": ["loss", "grief", "death", "tragedy", "drama", "memories", "farewell", "mourning", "tears",
+                     "healing", "broken"],
+    },
+    "loneliness": {
+        "moods": ["lonely", "isolated", "abandoned", "rejected", "homesick", "neglected"],
+        "keywords": ["alone", "stranded", "outsider", "lost", "home", "friendship", "connection", "journey",
+                     "isolated", "survival"],
+    },
+    "hopelessness": {
+        "moods": ["hopeless", "despairing", "pessimistic", "defeated", "discouraged"],
+        "keywords": ["redemption", "second chance", "struggle", "survive", "rebuild", "comeback", "fight",
+                     "courage", "inspiring", "hope"],
+    },
+    "boredom": {
+        "moods": ["bored", "indifferent", "unenthusiastic", "unstimulated", "listless"],
+        "keywords": ["mystery", "twist", "action", "adventure", "wild", "crazy", "chaos", "thriller", "strange",
+                     "unexpected", "secret"],
+    },
+    "guilt": {
+        "moods": ["guilty", "remorseful", "regretful", "ashamed", "embarrassed"],
+        "keywords": ["forgiveness", "redemption", "mistake", "past", "secret", "truth", "confession", "amends",
+                     "second chance", "consequences"],
+    },
+    "tiredness": {
+        "moods": ["tired", "fatigued", "drained", "exhausted", "sluggish"],
+        "keywords": ["comedy", "animated", "family", "light", "cozy", "fun", "gentle", "feel-good", "friends",
+                     "simple", "cartoon"],
+    },
+    "anger": {
+        "moods": ["angry", "furious", "enraged", "irritated", "resentful", "bitter"],
+        "keywords": ["revenge", "justice", "fight", "war", "vengeance", "betrayal", "rage", "battle", "crime",
+                     "violent", "enemy"],
+    },
+    "frustration": {
+        "moods": ["frustrated", "annoyed", "exasperated", "impatient", "aggravated"],
+        "keywords": ["action", "fight", "escape", "chaos", "comedy", "rebel", "break", "heist", "chase",
+                     "satire"],
+    },
+    "jealousy": {
+        "moods": ["jealous", "envious", "covetous", "possessive", "insecure"],
+        "keywords": ["rivalry", "rival", "obsession", "betrayal", "affair", "power", "ambition", "fame",
+                     "competition", "deception"],
+    },
+    "disgust": {
+        "moods": ["disgusted", "repulsed", "revolted", "grossed out", "nauseated"],
+        "keywords": ["horror", "monster", "creature", "zombie", "gore", "infection", "body", "corruption",
+                     "satire", "dark"],
+    },
+    "anxiety": {
+        "moods": ["anxious", "nervous", "worried", "uneasy", "apprehensive", "jittery"],
+        "keywords": ["suspense", "thriller", "mystery", "danger", "secret", "tension", "comedy", "comforting",
+                     "family", "reassuring"],
+    },
+    "fear": {
+        "moods": ["fearful", "terrified", "panicked", "paranoid", "tense", "alarmed"],
+        "keywords": ["horror", "terror", "haunted", "killer", "survival", "nightmare", "evil", "demon", "ghost",
+                     "thriller", "dark"],
+    },
+    "stress": {
+        "moods": ["overwhelmed", "stressed", "pressured", "frazzled", "overloaded"],
+        "keywords": ["comedy", "escape", "vacation", "relax", "fun", "animated", "friends", "feel-good",
+                     "adventure", "lighthearted"],
+    },
+    "surprise": {
+        "moods": ["surprised", "shocked", "amazed", "astonished", "stunned", "flabbergasted"],
+        "keywords": ["twist", "mystery", "discovery", "magic", "fantasy", "extraordinary", "secret", "unexpected",
+                     "wonder", "space"],
+    },
+    "confusion": {
+        "moods": ["confused", "perplexed", "puzzled", "disoriented", "unsure", "uncertain"],
+        "keywords": ["mystery", "puzzle", "mind", "memory", "identity", "time", "reality", "investigation",
+                     "clues", "twist"],
+    },
+    "indecision": {
+        "moods": ["indecisive", "conflicted", "hesitant", "torn", "ambivalent"],
+        "keywords": ["choice", "decision", "crossroads", "dilemma", "between", "loyalty", "sacrifice",
+                     "relationship", "family", "journey"],
+    },
+    "neutral": {
+        "moods": ["neutral", "indifferent", "meh", "emotionless", "numb"],
+        "keywords": ["adventure", "comedy", "mystery", "story", "world", "journey", "life", "discover",
+                     "action", "drama"],
+    },
+    "nostalgia": {
+        "moods": ["bittersweet", "nostalgic", "wistful", "sentimental", "pensive"],
+        "keywords": ["memories", "childhood", "past", "remember", "youth", "summer", "old", "reunion", "classic",
+                     "years", "coming-of-age"],
+    },
+    "reflection": {
+        "moods": ["thoughtful", "introspective", "brooding", "deep in thought"],
+        "keywords": ["drama", "life", "meaning", "identity", "philosophical", "journey", "self", "truth",
+                     "existence", "mind", "soul"],
+    },
+}
+
+# ✅ Reverse lookup: mood word -> family name (the first family wins for words listed twice)
+MOOD_TO_FAMILY = {}
+for _family, _info in MOOD_FAMILIES.items():
+    for _mood in _info["moods"]:
+        MOOD_TO_FAMILY.setdefault(_mood, _family)
+
+
+def expand_moods(mood_words):
+    """
+    Expands mood words into query terms for local matching:
+    - Every word is kept as-is.
+    - Words from a mood family also add that family's story keywords.
+    """
+    terms = []
+    for word in mood_words:
+        word = word.strip().lower()
+        terms.append(word)
+        family = MOOD_TO_FAMILY.get(word)
+        if family:
+            terms.extend(MOOD_FAMILIES[family]["keywords"])
+    return terms
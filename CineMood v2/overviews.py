@@ -0,0 +1,156 @@
+"""
+Compressed movie overviews for ranking prompts.
+
+Overviews make up most of a ranking prompt, so the candidates' overviews are compressed before they are sent
+(`OVERVIEW_COMPRESSION`):
+- "extractive": the leading sentences that fit in `OVERVIEW_TOKENS` tokens (the leading words of the first sentence
+  when it alone is too long), computed locally.
+- "llm": a summary written once per movie and catalog week by the ranking backend and stored on disk, then kept
+  within the same budget. Summaries are written off the request path, by the warm-up or in a batch:
+      python overviews.py --max-movies 60
+  Movies without a summary yet get the extractive overview.
+- "full": overviews are sent as-is.
+
+The movie list of a ranking prompt is kept within `RANKING_PROMPT_TOKENS` tokens: when the candidates' titles and
+`OVERVIEW_TOKENS`-token overviews would not fit, each overview gets an equal share of what the titles leave.
+Compressed overviews are cached per movie id, catalog week and token budget.
+"""
+import argparse
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from cache import JsonCache
+from config import OVERVIEW_COMPRESSION, OVERVIEW_SUMMARY_MAX_ENTRIES, OVERVIEW_TOKENS, RANKING_PROMPT_TOKENS
+from prompts import count_tokens
+from tmdb_api import get_first_day_of_week
+
+# Rough number of English words per token, to turn token budgets into word limits for summaries
+WORDS_PER_TOKEN = 0.75
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# LLM summaries per "<week>|<movie id>", kept for two catalog weeks
+summaries = JsonCache("overview_summaries", max_entries=OVERVIEW_SUMMARY_MAX_ENTRIES, ttl=14 * 24 * 3600)
+
+# Compressed overviews per (summary key, token budget, from a summary)
+_MAX_COMPRESSED = 20000
+_compressed = OrderedDict()
+_compressed_lock = threading.Lock()
+
+
+def truncate(text, budget):
+    """
+    Returns the leading sentences of `text` that fit in `budget` tokens, or, when even the first sentence
+    does not fit, its leading words that do followed by "…". A `budget` of 0 keeps the whole text.
+    """
+    text = text.strip()
+    if budget <= 0 or count_tokens(text) <= budget:
+        return text
+
+    kept = []
+    for sentence in _SENTENCE_END.split(text):
+        if count_tokens(" ".join(kept + [sentence])) > budget:
+            break
+        kept.append(sentence)
+    if kept:
+        return " ".join(kept)
+
+    # ✅ Binary search for the most leading words that fit with the ellipsis
+    words = text.split()
+    low, high = 0, len(words)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(" ".join(words[:middle]) + "…") <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    return " ".join(words[:low]) + "…"
+
+
+def settings_key():
+    """Identifies the compression settings, so that rankings made from other overviews are not reused."""
+    return f"{OVERVIEW_COMPRESSION}:{OVERVIEW_TOKENS}:{RANKING_PROMPT_TOKENS}"
+
+
+def summary_key(movie, week):
+    return f"{week.isoformat()}|{movie.get('id', movie['title'])}"
+
+
+def compress(movie, budget=OVERVIEW_TOKENS, week=None):
+    """Returns the overview of `movie` as sent to ranking prompts, within `budget` tokens (see the module docstring)."""
+    if OVERVIEW_COMPRESSION == "full":
+        return movie["overview"]
+
+    key = summary_key(movie, week or get_first_day_of_week())
+    summary = summaries.get(key) if OVERVIEW_COMPRESSION == "llm" else None
+    cache_key = (key, budget, summary is not None)
+    with _compressed_lock:
+        if cache_key in _compressed:
+            _compressed.move_to_end(cache_key)
+            return _compressed[cache_key]
+
+    compressed = truncate(summary or movie["overview"], budget)
+    with _compressed_lock:
+        _compressed[cache_key] = compressed
+        while len(_compressed) > _MAX_COMPRESSED:
+            _compressed.popitem(last=False)
+    return compressed
+
+
+def compress_movies(movies):
+    """
+    Returns copies of the candidates of a ranking prompt with compressed overviews,
+    their numbered list fitting in `RANKING_PROMPT_TOKENS` tokens (as far as titles allow).
+    """
+    if OVERVIEW_COMPRESSION == "full" or not movies:
+        return movies
+
+    budget = OVERVIEW_TOKENS
+    if RANKING_PROMPT_TOKENS:
+        titles = sum(count_tokens(f"{i + 1}. {movie['title']}: ") for i, movie in enumerate(movies))
+        share = max(1, (RANKING_PROMPT_TOKENS - titles) // len(movies))
+        budget = min(budget, share) if budget else share
+
+    week = get_first_day_of_week()
+    return [dict(movie, overview=compress(movie, budget, week)) for movie in movies]
+
+
+def summarize(movies, summarizer, week=None):
+    """
+    Stores summaries of the movies that have none for the week (the current one by default) yet.
+    `summarizer(movies)` returns one summary (or None) per movie, e.g. `llm.summarize_overviews`.
+    Returns the number of new summaries.
+    """
+    week = week or get_first_day_of_week()
+    missing = [movie for movie in movies if summaries.get(summary_key(movie, week)) is None]
+    if not missing:
+        return 0
+    new_summaries = {
+        summary_key(movie, week): summary for movie, summary in zip(missing, summarizer(missing)) if summary
+    }
+    summaries.set_many(new_summaries)
+    return len(new_summaries)
+
+
+def main():
+    # Imported here: only the batch job needs the catalog and the LLM summarizer
+    import llm
+    from pipeline import CATALOG_SIZE
+    from tmdb_api import fetch_movies
+
+    parser = argparse.ArgumentParser(description="Write the LLM overview summaries of this week's catalog.")
+    parser.add_argument("--max-movies", type=int, default=CATALOG_SIZE, help="number of catalog movies to summarize")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    movies = fetch_movies(args.max_movies)[:args.max_movies]
+    if not movies:
+        raise SystemExit("⚠️ No movies available.")
+    count = summarize(movies, llm.summarize_overviews)
+    print(f"✅ Summarized {count} new overview(s) of {len(movies)} movies in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
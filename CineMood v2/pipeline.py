@@ -0,0 +1,407 @@
+"""
+Recommendation pipeline: mood detection and catalog retrieval in parallel, then ranking.
+
+With a deadline (`PIPELINE_DEADLINE`, or `deadline=` in seconds), stages that would overrun it fall back to
+cheaper tiers, reported under "tier" (the cheapest tier used) and "tiers" (per stage):
+- "llm": `detect_mood` and `get_movies_by_mood` (the LLM backend, or the caches and lexicon they use themselves).
+- "lexicon": moods named in the input (`lexical_detection`) when detection takes longer than its share.
+- "local": the local TF-IDF ranking (`local_ranking`) when GPT ranking would overrun, or in matrix mode.
+- "trending": the top trending movies, when no time (or no words to rank by) is left.
+Overrun GPT calls keep running in the background, so their results still fill the caches for later requests;
+calls that had not even started by then (all stage threads busy) are cancelled.
+A catalog fetch overrunning the deadline is replaced by the pages already stored (`stored_movies`), and keeps
+filling the store in the background.
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from affinity import default_reason
+from backends import lexical_detection
+from config import PIPELINE_DEADLINE, PIPELINE_RANK_SHARE, PIPELINE_STAGE_WORKERS, PIPELINE_WORKERS, RANKING_MODE
+from llm import (
+    detect_mood, detect_mood_async, get_movies_by_mood, get_movies_by_mood_async, stream_movies_by_mood
+)
+from moods import VALID_MOOD_WORDS
+from retrieval import rank_movies
+from tmdb_api import fetch_movies, stored_movies
+
+CATALOG_SIZE = 60
+
+# Strategies serving a recommendation, from the richest to the cheapest
+TIERS = ("llm", "lexicon", "local", "trending")
+
+# Shared pool running catalog fetches next to mood detection (which runs in the caller's thread without deadline)
+_executor = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix="cinemood-pipeline")
+
+# ✅ Separate pool for the deadline-bound stages (detection, ranking, ranking streams): overrun GPT calls hold
+# its threads, never the catalog fetches'
+_stage_executor = ThreadPoolExecutor(max_workers=PIPELINE_STAGE_WORKERS, thread_name_prefix="cinemood-stage")
+
+# Overrun async stages still running in the background (asyncio only keeps weak references to tasks)
+_background_tasks = set()
+
+# End of a stream consumed in the pool
+_DONE = object()
+
+
+def _timed(function, timings, stage, *args, **kwargs):
+    """Runs `function` and records its duration in seconds under `timings[stage]`."""
+    start = time.perf_counter()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        timings[stage] = time.perf_counter() - start
+
+
+async def _timed_async(awaitable, timings, stage):
+    """Awaits `awaitable` and records its duration in seconds under `timings[stage]`."""
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[stage] = time.perf_counter() - start
+
+
+def _wait(future, timeout, timings, stage):
+    """
+    Waits up to `timeout` seconds for a stage running in a pool and records the wait under `timings[stage]`.
+    Returns (result, True), or (None, False) when the stage overran: it keeps running in the background,
+    or is cancelled if it has not started yet.
+    """
+    start = time.perf_counter()
+    try:
+        return future.result(timeout=timeout), True
+    except FutureTimeoutError:
+        future.cancel()
+        return None, False
+    finally:
+        timings[stage] = time.perf_counter() - start
+
+
+async def _wait_async(awaitable, timeout, timings, stage):
+    """Async variant of `_wait`: the awaitable runs as a task that is not cancelled when it overruns."""
+    task = asyncio.ensure_future(awaitable)
+    start = time.perf_counter()
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), timeout), True
+    except asyncio.TimeoutError:
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+        return None, False
+    finally:
+        timings[stage] = time.perf_counter() - start
+
+
+def _remaining(result):
+    """Seconds left before the result's deadline (at least 0), or None without a deadline."""
+    if result["deadline_at"] is None:
+        return None
+    return max(0.0, result["deadline_at"] - time.perf_counter())
+
+
+def _set_tier(result, stage, tier):
+    """Records the tier that served `stage`, and the cheapest tier used so far under "tier"."""
+    result["tiers"][stage] = tier
+    result["tier"] = max(result["tiers"].values(), key=TIERS.index)
+
+
+def local_ranking(words, movies, k=3):
+    """Ranks the catalog with the local TF-IDF index (no GPT call); match reasons name the first mood."""
+    if not movies:
+        return []
+    mood = next((word for word in words if word in VALID_MOOD_WORDS and word != "neutral"), None)
+    return [dict(movies[index], match_reason=default_reason(mood)) for index in rank_movies(words, movies, k)]
+
+
+def trending_ranking(movies):
+    """The top 3 trending movies, as-is."""
+    return [dict(movie) for movie in movies[:3]]
+
+
+def _ranking_tier():
+    """Tier of the configured ranking: GPT, or the local affinity matrix."""
+    return "local" if RANKING_MODE == "matrix" else "llm"
+
+
+def mood_status(moods):
+    """Classifies detected moods as "invalid" (not a mood), "neutral" (unsure about the moods) or "ok"."""
+    if moods == ["invalid"]:
+        return "invalid"
+    if moods == ["neutral", "neutral", "neutral"]:
+        return "neutral"
+    return "ok"
+
+
+def _new_result(detection, timings, deadline_at, detect_tier):
+    """Builds a prepared result from a `detect_mood` triple (see `prepare_recommendation`)."""
+    moods, extracted_words, detected_moods = detection
+    result = {
+        "status": mood_status(moods),
+        "moods": moods,
+        "extracted_words": extracted_words,
+        "detected_moods": detected_moods,
+        "movies": [],
+        "timings": timings,
+        "deadline_at": deadline_at,
+        "tiers": {},
+    }
+    _set_tier(result, "detect", detect_tier)
+    return result
+
+
+def _deadlines(deadline):
+    """Returns the end of a `deadline` (seconds from now) and the end of its detection share, or (None, None)."""
+    if not deadline:
+        return None, None
+    now = time.perf_counter()
+    return now + deadline, now + deadline * (1 - PIPELINE_RANK_SHARE)
+
+
+def _ranking_words(result):
+    """Returns the words to rank the catalog by, or None when the top trending movies are shown as-is."""
+    if result["status"] == "neutral":
+        return result["extracted_words"] or None
+    return result["moods"]
+
+
+def prepare_recommendation(user_input, max_movies=CATALOG_SIZE, deadline=PIPELINE_DEADLINE):
+    """
+    Detects the user's mood while the trending catalog is fetched concurrently.
+    With a `deadline` (seconds, 0 = none), detection gets `1 - PIPELINE_RANK_SHARE` of it before
+    `lexical_detection` takes over.
+    Returns a result dict with:
+    - "status": "invalid" (not a mood), "neutral" (unsure about the moods) or "ok".
+    - "moods", "extracted_words", "detected_moods": the `detect_mood` triple.
+    - "movies": the catalog (empty for invalid input, whose catalog fetch is cancelled; only the stored pages
+      when the fetch overruns the deadline).
+    - "timings": seconds spent per stage ("detect", "fetch").
+    - "tier", "tiers": the tiers that served the result so far (see the module docstring).
+    """
+    timings = {}
+    deadline_at, detect_deadline_at = _deadlines(deadline)
+    cancel_event = threading.Event()
+    catalog_future = _executor.submit(
+        _timed, fetch_movies, timings, "fetch", max_movies, cancel_event=cancel_event
+    )
+
+    if deadline_at is None:
+        detection, on_time = _timed(detect_mood, timings, "detect", user_input), True
+    else:
+        detection, on_time = _wait(
+            _stage_executor.submit(detect_mood, user_input), detect_deadline_at - time.perf_counter(), timings,
+            "detect"
+        )
+    if on_time:
+        result = _new_result(detection, timings, deadline_at, "llm")
+    else:
+        result = _new_result(lexical_detection(user_input), timings, deadline_at, "lexicon")
+
+    if result["status"] == "invalid":
+        # ✅ No recommendation needed: stop fetching pages that are not cached yet
+        cancel_event.set()
+        catalog_future.cancel()
+        return result
+
+    try:
+        result["movies"] = catalog_future.result(timeout=_remaining(result))
+    except FutureTimeoutError:
+        catalog_future.cancel()
+        result["movies"] = stored_movies(max_movies)
+    return result
+
+
+def rank_recommendation(result):
+    """
+    Ranks the catalog of a prepared result and stores the top movies under "recommendations".
+    - Confident moods are matched against the catalog.
+    - Neutral moods fall back to the extracted words, or to the top trending movies without any.
+    - Before the deadline, GPT ranking that overruns it falls back to `local_ranking`;
+      past the deadline, the top trending movies are shown.
+    """
+    if result["status"] == "invalid":
+        result["recommendations"] = []
+        return result
+
+    movies = result["movies"]
+    words = _ranking_words(result)
+    timeout = _remaining(result)
+    tier = _ranking_tier()
+    if not words or timeout == 0:
+        recommendations, tier = trending_ranking(movies), "trending"
+        result["timings"]["rank"] = 0.0
+    elif timeout is None:
+        recommendations = _timed(get_movies_by_mood, result["timings"], "rank", words, movies)
+    else:
+        recommendations, on_time = _wait(
+            _stage_executor.submit(get_movies_by_mood, words, movies), timeout, result["timings"], "rank"
+        )
+        if not on_time:
+            recommendations, tier = local_ranking(words, movies), "local"
+
+    result["recommendations"] = recommendations
+    _set_tier(result, "rank", tier)
+    return result
+
+
+def _pump(stream):
+    """Consumes `stream` in the stage pool; returns its future and a queue of its items, followed by `_DONE`."""
+    items = queue.Queue()
+
+    def run():
+        try:
+            for item in stream:
+                items.put(item)
+        finally:
+            items.put(_DONE)
+
+    return _stage_executor.submit(run), items
+
+
+def _stream_within_deadline(result, words, movies):
+    """
+    Yields the movies GPT streams until the result's deadline, then completes the top 3 with `local_ranking`.
+    The overrun stream keeps running in the background (and fills the ranking cache).
+    """
+    future, items = _pump(stream_movies_by_mood(words, movies))
+    shown = []
+    while True:
+        try:
+            movie = items.get(timeout=_remaining(result))
+        except queue.Empty:
+            future.cancel()
+            break
+        if movie is _DONE:
+            return
+        shown.append(movie["title"])
+        yield movie
+
+    _set_tier(result, "rank", "local")
+    fill_ins = [movie for movie in local_ranking(words, movies, k=3 + len(shown)) if movie["title"] not in shown]
+    yield from fill_ins[:max(0, 3 - len(shown))]
+
+
+def stream_recommendation(result):
+    """
+    Streaming variant of `rank_recommendation`: yields recommended movies one by one as GPT writes them.
+    Records the time to the first movie ("first_movie") and the full ranking ("rank") in the timings,
+    and the complete list under "recommendations" once the stream is exhausted.
+    With a deadline, movies GPT has not streamed in time are completed by `local_ranking`.
+    """
+    result["recommendations"] = []
+    if result["status"] == "invalid":
+        return
+
+    movies = result["movies"]
+    words = _ranking_words(result)
+    timeout = _remaining(result)
+    _set_tier(result, "rank", _ranking_tier())
+    if not words or timeout == 0:
+        _set_tier(result, "rank", "trending")
+        stream = iter(trending_ranking(movies))
+    elif timeout is None:
+        stream = stream_movies_by_mood(words, movies)
+    else:
+        stream = _stream_within_deadline(result, words, movies)
+
+    start = time.perf_counter()
+    for movie in stream:
+        result["timings"].setdefault("first_movie", time.perf_counter() - start)
+        result["recommendations"].append(movie)
+        yield movie
+    result["timings"]["rank"] = time.perf_counter() - start
+
+
+def recommend(user_input, max_movies=CATALOG_SIZE, deadline=PIPELINE_DEADLINE):
+    """
+    Runs the full recommendation pipeline for `user_input`:
+    mood detection and catalog retrieval in parallel, then ranking.
+    End-to-end latency is about max(detect, fetch) + rank; "timings" also holds the "total".
+    With a `deadline` (seconds, 0 = none), overrunning stages fall back to cheaper tiers ("tier", "tiers").
+    """
+    start = time.perf_counter()
+    result = rank_recommendation(prepare_recommendation(user_input, max_movies, deadline))
+    result["timings"]["total"] = time.perf_counter() - start
+    return result
+
+
+async def prepare_recommendation_async(user_input, max_movies=CATALOG_SIZE, movies=None, deadline=PIPELINE_DEADLINE):
+    """
+    Async variant of `prepare_recommendation` for the HTTP API.
+    The catalog is fetched in a worker thread while GPT detects the mood, unless the caller
+    already has it (`movies`, e.g. one catalog shared by a whole batch).
+    """
+    timings = {}
+    deadline_at, detect_deadline_at = _deadlines(deadline)
+    cancel_event = threading.Event()
+    catalog_task = None
+    if movies is None:
+        catalog_task = asyncio.ensure_future(asyncio.to_thread(
+            _timed, fetch_movies, timings, "fetch", max_movies, cancel_event=cancel_event
+        ))
+
+    if deadline_at is None:
+        detection, on_time = await _timed_async(detect_mood_async(user_input), timings, "detect"), True
+    else:
+        detection, on_time = await _wait_async(
+            detect_mood_async(user_input), detect_deadline_at - time.perf_counter(), timings, "detect"
+        )
+    if on_time:
+        result = _new_result(detection, timings, deadline_at, "llm")
+    else:
+        result = _new_result(lexical_detection(user_input), timings, deadline_at, "lexicon")
+
+    if result["status"] == "invalid":
+        cancel_event.set()
+        if catalog_task is not None:
+            catalog_task.cancel()
+        return result
+
+    if catalog_task is None:
+        result["movies"] = movies
+    elif deadline_at is None:
+        result["movies"] = await catalog_task
+    else:
+        catalog, on_time = await _wait_async(catalog_task, _remaining(result), {}, "fetch")
+        result["movies"] = catalog if on_time else stored_movies(max_movies)
+    return result
+
+
+async def rank_recommendation_async(result):
+    """Async variant of `rank_recommendation`."""
+    if result["status"] == "invalid":
+        result["recommendations"] = []
+        return result
+
+    movies = result["movies"]
+    words = _ranking_words(result)
+    timeout = _remaining(result)
+    tier = _ranking_tier()
+    if not words or timeout == 0:
+        recommendations, tier = trending_ranking(movies), "trending"
+        result["timings"]["rank"] = 0.0
+    elif timeout is None:
+        recommendations = await _timed_async(get_movies_by_mood_async(words, movies), result["timings"], "rank")
+    else:
+        recommendations, on_time = await _wait_async(
+            get_movies_by_mood_async(words, movies), timeout, result["timings"], "rank"
+        )
+        if not on_time:
+            recommendations, tier = local_ranking(words, movies), "local"
+
+    result["recommendations"] = recommendations
+    _set_tier(result, "rank", tier)
+    return result
+
+
+async def recommend_async(user_input, max_movies=CATALOG_SIZE, movies=None, deadline=PIPELINE_DEADLINE):
+    """Async variant of `recommend`; `movies` skips the catalog fetch (see `prepare_recommendation_async`)."""
+    start = time.perf_counter()
+    result = await rank_recommendation_async(
+        await prepare_recommendation_async(user_input, max_movies, movies, deadline)
+    )
+    result["timings"]["total"] = time.perf_counter() - start
+    return result
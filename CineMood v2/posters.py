@@ -0,0 +1,208 @@
+"""
+Local poster cache with thumbnails sized for display.
+
+- Each poster is downloaded once from TMDB (`POSTER_SOURCE_SIZE` rendition) into `POSTER_CACHE_DIR/source`.
+- Thumbnails are resized from that copy for each display width (times `POSTER_PIXEL_RATIO`, for sharp
+  images on high-density screens) and stored in `POSTER_CACHE_DIR/<pixel width>`, keyed by TMDB poster path.
+- Renders never wait for TMDB: `poster_image()` returns cached thumbnails only, and queues missing ones
+  for a background download (the app shows the TMDB URL meanwhile).
+- `prefetch()` fills the cache for a catalog; the app runs it as a warm-up hook (see `warmup.py`).
+- `prune()` keeps the cache within `POSTER_CACHE_MAX_MB`, dropping posters unused for `POSTER_CACHE_TTL`
+  first and then the least recently used ones; it runs after each prefetch and every `_PRUNE_EVERY` posters.
+"""
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import requests
+from PIL import Image
+
+import metrics
+from catalog_store import poster_url
+from config import (
+    POSTER_CACHE_DIR, POSTER_CACHE_MAX_MB, POSTER_CACHE_TTL, POSTER_PIXEL_RATIO, POSTER_PREFETCH_WORKERS,
+    POSTER_SOURCE_SIZE, POSTER_WIDTH, TMDB_TIMEOUT
+)
+from singleflight import SingleFlight
+from tmdb_api import get_session
+
+# Concurrent requests for the same poster (renders and prefetch) share one download or resize
+inflight = SingleFlight()
+
+_SAFE_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+# ✅ Background downloads of posters missed by renders, one per thumbnail path
+_background = ThreadPoolExecutor(max_workers=POSTER_PREFETCH_WORKERS, thread_name_prefix="poster")
+_queued = {}
+_queued_lock = threading.Lock()
+
+# Posters cached between two prunes of the cache directory
+_PRUNE_EVERY = 200
+_cached_since_prune = 0
+
+
+def poster_file_name(poster_path):
+    """Returns the cache file name of a TMDB poster path (e.g. "/abc.jpg" -> "abc.jpg"), or None if unusable."""
+    name = (poster_path or "").lstrip("/")
+    return name if _SAFE_NAME.match(name) and name not in (".", "..") else None
+
+
+def _write_atomic(path, data):
+    """Writes `data` to a temporary file and atomically swaps it in, so readers never see partial images."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        os.unlink(tmp_path)
+        raise
+
+
+def _download(poster_path, path):
+    """Downloads the source rendition of a poster to `path`."""
+    response = get_session().get(poster_url(poster_path, POSTER_SOURCE_SIZE), timeout=TMDB_TIMEOUT)
+    response.raise_for_status()
+    _write_atomic(path, response.content)
+
+
+def _resize(source_path, path, pixel_width):
+    """Stores a JPEG thumbnail of the source poster, `pixel_width` pixels wide (never upscaled)."""
+    with Image.open(source_path) as image:
+        image = image.convert("RGB")
+        if image.width > pixel_width:
+            height = round(image.height * pixel_width / image.width)
+            image = image.resize((pixel_width, height), Image.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, format="JPEG", quality=85, optimize=True)
+    _write_atomic(path, buffer.getvalue())
+
+
+def _source_path(poster_path, name):
+    path = os.path.join(POSTER_CACHE_DIR, "source", name)
+    if not os.path.exists(path):
+        inflight.do(("download", name), _download, poster_path, path)
+    return path
+
+
+def _thumbnail_path(name, pixel_width):
+    return os.path.join(POSTER_CACHE_DIR, str(pixel_width), os.path.splitext(name)[0] + ".jpg")
+
+
+def cache_poster(poster_path, width=POSTER_WIDTH):
+    """
+    Returns the local path of the poster thumbnail for a `width`-pixel display,
+    downloading and resizing it if needed (blocking: for prefetches and background downloads).
+    Returns None when there is no poster or it cannot be fetched.
+    """
+    global _cached_since_prune
+    name = poster_file_name(poster_path)
+    if name is None:
+        return None
+
+    pixel_width = round(width * POSTER_PIXEL_RATIO)
+    path = _thumbnail_path(name, pixel_width)
+    if os.path.exists(path):
+        return path
+
+    try:
+        source_path = _source_path(poster_path, name)
+        inflight.do(("resize", path), _resize, source_path, path, pixel_width)
+    except (requests.exceptions.RequestException, OSError) as e:
+        print(f"⚠️ Error caching poster {poster_path}: {e}")
+        return None
+
+    with _queued_lock:
+        _cached_since_prune += 1
+        due = _cached_since_prune >= _PRUNE_EVERY
+        if due:
+            _cached_since_prune = 0
+    if due:
+        prune()
+    return path
+
+
+def _cache_in_background(poster_path, width, path):
+    try:
+        cache_poster(poster_path, width)
+    finally:
+        with _queued_lock:
+            _queued.pop(path, None)
+
+
+@metrics.tracked("poster_image")
+def poster_image(poster_path, width=POSTER_WIDTH):
+    """
+    Returns the local path of the cached poster thumbnail for a `width`-pixel display, without waiting for TMDB:
+    a missing thumbnail is queued for a background download and None is returned (callers fall back to the
+    TMDB URL). Also returns None when there is no poster.
+    """
+    name = poster_file_name(poster_path)
+    if name is None:
+        return None
+
+    path = _thumbnail_path(name, round(width * POSTER_PIXEL_RATIO))
+    if os.path.exists(path):
+        metrics.annotate(cache="hit")
+        try:
+            os.utime(path)  # ✅ Marks the poster as recently used for `prune`
+        except OSError:
+            pass
+        return path
+
+    metrics.annotate(cache="miss", fallback=True)
+    with _queued_lock:
+        if path not in _queued:
+            _queued[path] = _background.submit(_cache_in_background, poster_path, width, path)
+    return None
+
+
+def prefetch(movies, width=POSTER_WIDTH, workers=POSTER_PREFETCH_WORKERS):
+    """Caches the thumbnails of `movies` (dicts with a "poster_path") for a `width`-pixel display."""
+    poster_paths = {movie.get("poster_path") for movie in movies} - {None}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda poster_path: cache_poster(poster_path, width), poster_paths))
+    prune()
+
+
+def prune(max_mb=None, ttl=None):
+    """
+    Deletes cached posters (sources and thumbnails) unused for `ttl` seconds, then the least recently used ones
+    until the cache fits in `max_mb` megabytes (defaults: `POSTER_CACHE_TTL`, `POSTER_CACHE_MAX_MB`; 0 = no limit).
+    Returns the number of deleted files.
+    """
+    max_bytes = (POSTER_CACHE_MAX_MB if max_mb is None else max_mb) * 1e6
+    ttl = POSTER_CACHE_TTL if ttl is None else ttl
+    files = []
+    for directory, _, names in os.walk(POSTER_CACHE_DIR):
+        for name in names:
+            if name.endswith(".tmp"):
+                continue  # being written
+            path = os.path.join(directory, name)
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            files.append((info.st_mtime, info.st_size, path))
+
+    files.sort()
+    total = sum(size for _, size, _ in files)
+    now = time.time()
+    deleted = 0
+    for mtime, size, path in files:
+        expired = ttl and now - mtime > ttl
+        if not expired and (not max_bytes or total <= max_bytes):
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        deleted += 1
+    return deleted
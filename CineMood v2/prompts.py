@@ -0,0 +1,155 @@
+"""
+Prompt construction for the GPT calls in `llm.py`.
+
+Every prompt is split into a static system message (rules, mood vocabulary, examples) and a user message
+holding the request-specific text. The static part is byte-identical across requests and worker processes
+(sorted, deduplicated vocabulary), so provider-side prompt prefix caching can apply to it.
+"""
+import textwrap
+
+from moods import VALID_MOOD_WORDS
+
+# ✅ Sorted, so the vocabulary string is identical in every process (set order varies with hash seeds)
+MOOD_VOCABULARY = ", ".join(sorted(VALID_MOOD_WORDS))
+
+DETECT_MOOD_PROMPT = textwrap.dedent(f"""
+    You are an expert in understanding human emotions. Analyze the user's message and respond with a valid JSON object.
+
+    Valid mood words:
+    {MOOD_VOCABULARY}
+
+    Rules:
+    1. If the message is related to a mood (whether or not it uses one of the valid mood words or their nouns),
+       return "detected_moods": a list of exactly 3 different mood words that best describe the message,
+       and "extracted_words": the key words you identified in the message.
+    2. If the message is COMPLETELY NOT related to a mood (e.g., "What time is it?"),
+       return "detected_moods": ["invalid"] and "extracted_words": [].
+
+    Examples:
+    User message: "I feel a bit lost and unsure what to do."
+    Response: {{"detected_moods": ["melancholic", "uncertain", "conflicted"], "extracted_words": ["lost", "unsure"]}}
+
+    User message: "What time is it?"
+    Response: {{"detected_moods": ["invalid"], "extracted_words": []}}
+""").strip()
+
+STRUCTURED_MOOD_PROMPT = textwrap.dedent("""
+    You are an expert in understanding human emotions. Analyze the user's message and return:
+    - "detected_moods": exactly 3 different moods from the allowed list that best describe the message.
+    - "extracted_words": the key words of the message that express the mood.
+
+    If the message is COMPLETELY NOT related to a mood (e.g., "What time is it?"),
+    return "detected_moods": ["invalid"] and "extracted_words": [].
+""").strip()
+
+MAP_MOOD_PROMPT = textwrap.dedent(f"""
+    You are an expert in understanding human emotions.
+    Map the detected moods given by the user to the three closest valid moods from this list:
+
+    {MOOD_VOCABULARY}
+
+    Rules:
+    1. Select exactly 3 unique moods from the list.
+    2. If a mood is unrelated to any in the list, replace it with "neutral".
+    3. Return ONLY a comma-separated list of 3 moods, no extra text.
+""").strip()
+
+RANKING_PROMPT = textwrap.dedent("""
+    You recommend movies that match a user's moods (or, when moods are unclear, key words from their message).
+    The user gives their moods and a numbered list of movie descriptions.
+
+    Select the top 3 movies that best match the moods or words and explain each choice in 1-2 sentences.
+    You must output only valid JSON and nothing else: an array of exactly 3 objects,
+    each with "index" (the movie's number, an integer) and "match_reason" (a non-empty string):
+    [
+        {"index": 1, "match_reason": "Explanation for movie 1"},
+        {"index": 2, "match_reason": "Explanation for movie 2"},
+        {"index": 3, "match_reason": "Explanation for movie 3"}
+    ]
+""").strip()
+
+AFFINITY_PROMPT = textwrap.dedent("""
+    You rate how well movies fit people's moods. The user gives a list of moods and a numbered list of
+    movie descriptions. For every mood, score every movie from 0 (does not fit at all) to 10 (perfect fit
+    for someone feeling that way).
+    You must output only a valid JSON object mapping each mood to an array of integer scores,
+    one per movie, in the order of the numbered list:
+    {"happy": [7, 2, 9], "tired": [3, 8, 1]}
+""").strip()
+
+SUMMARY_PROMPT = textwrap.dedent("""
+    You write short movie summaries for a mood-based movie recommender. The user gives a word limit and a
+    numbered list of movie descriptions. Summarize every movie within the word limit, keeping its genre, tone,
+    emotional themes and premise (what matters to match it with a mood), without character names.
+    You must output only a valid JSON object with one summary per movie, in the order of the numbered list:
+    {"summaries": ["Summary of movie 1", "Summary of movie 2"]}
+""").strip()
+
+
+def build_messages(system_prompt, user_content):
+    """Builds chat messages with the static prompt first and the request-specific text last."""
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_content},
+    ]
+
+
+def detect_mood_messages(user_input):
+    """Messages for free-form mood detection (two-step mode)."""
+    return build_messages(DETECT_MOOD_PROMPT, user_input)
+
+
+def structured_mood_messages(user_input):
+    """Messages for schema-constrained mood detection (structured mode)."""
+    return build_messages(STRUCTURED_MOOD_PROMPT, user_input)
+
+
+def map_mood_messages(mood_words):
+    """Messages mapping free-form mood words to valid moods."""
+    return build_messages(MAP_MOOD_PROMPT, f"Detected moods: {', '.join(mood_words)}")
+
+
+def ranking_messages(mood_words, movies):
+    """Messages asking for the top 3 of `movies` (numbered from 1) for the given moods or words."""
+    movie_descriptions = "\n".join(f"{i + 1}. {movie['title']}: {movie['overview']}" for i, movie in enumerate(movies))
+    return build_messages(RANKING_PROMPT, f"My moods: {', '.join(mood_words)}.\n\nMovies:\n{movie_descriptions}")
+
+
+def affinity_messages(moods, movies):
+    """Messages asking for a 0-10 score of every movie (numbered from 1) for each of `moods`."""
+    movie_descriptions = "\n".join(f"{i + 1}. {movie['title']}: {movie['overview']}" for i, movie in enumerate(movies))
+    return build_messages(AFFINITY_PROMPT, f"Moods: {', '.join(moods)}.\n\nMovies:\n{movie_descriptions}")
+
+
+def summary_messages(movies, max_words):
+    """Messages asking for a summary of at most `max_words` words of every movie (numbered from 1)."""
+    movie_descriptions = "\n".join(f"{i + 1}. {movie['title']}: {movie['overview']}" for i, movie in enumerate(movies))
+    return build_messages(SUMMARY_PROMPT, f"Word limit: {max_words}.\n\nMovies:\n{movie_descriptions}")
+
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("o200k_base")  # gpt-4o family tokenizer
+except Exception:  # tiktoken missing, or its encoding files are unavailable offline
+    _encoding = None
+
+
+def count_tokens(text):
+    """Counts tokens with tiktoken when available, otherwise estimates ~4 characters per token."""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // 4)
+
+
+def count_message_tokens(messages):
+    """Counts the prompt tokens of chat messages, including ~4 tokens of framing per message."""
+    return sum(count_tokens(message["content"]) + 4 for message in messages) + 2
+
+
+def prompt_stats(messages):
+    """Returns the total and static-prefix (system message) token counts of chat messages."""
+    return {
+        "prompt_tokens": count_message_tokens(messages),
+        "static_prefix_tokens": count_message_tokens(messages[:1]),
+    }
@@ -0,0 +1,231 @@
+"""
+Local retrieval: TF-IDF vectors of the catalog's titles and overviews, and exact top-k search by cosine similarity.
+
+The index stores the sparse document vectors as postings (for each term, the movies containing it and their
+weights), so scoring a query only touches the movies sharing one of its terms, and the index grows with the
+catalog's text rather than with movies x vocabulary. The `top_k` movies are selected without sorting the whole
+catalog, so pre-ranking a library of tens of thousands of movies for the LLM re-rank takes a few milliseconds.
+
+Indexes of catalogs with at least `VECTOR_INDEX_MIN_MOVIES` movies are stored in
+`VECTOR_INDEX_DIR/<catalog version>.npz` and loaded by every process.
+Build the index of the week's library offline (after `python catalog_store.py --library`):
+    python retrieval.py
+"""
+import argparse
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+import tmdb_api
+from config import VECTOR_INDEX_DIR, VECTOR_INDEX_MIN_MOVIES
+from moods import expand_moods
+from tmdb_api import catalog_version
+
+STOP_WORDS = frozenset("""
+a an and are as at be but by for from has have he her his him in into is it its of on or she that the their
+them they this to was were when where which while who will with after before about over under up down out all
+one two new must than then there these those what more most your you our we
+""".split())
+
+# Indexes built per catalog version, so each weekly catalog is vectorized once per process
+_MAX_INDEXES = 8
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def tokenize(text):
+    """Lowercases `text` and splits it into word tokens, dropping stop words and single letters."""
+    return [
+        token for token in re.findall(r"[a-z][a-z'-]*", text.lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+def build_index(movies):
+    """
+    Builds a TF-IDF index of the movies' titles and overviews.
+    Returns a dict with the vocabulary (term -> column), IDF weights, the number of movies and the postings of the
+    L2-normalized document vectors: the movies of column `c` are `documents[indptr[c]:indptr[c + 1]]`,
+    with their `weights`.
+    """
+    vocabulary = {}
+    rows, columns, counts = [], [], []
+    for row, movie in enumerate(movies):
+        for token, count in Counter(tokenize(f"{movie['title']} {movie['overview']}")).items():
+            rows.append(row)
+            columns.append(vocabulary.setdefault(token, len(vocabulary)))
+            counts.append(count)
+    rows = np.array(rows, dtype=np.int32)
+    columns = np.array(columns, dtype=np.int32)
+
+    document_frequency = np.bincount(columns, minlength=len(vocabulary))
+    idf = np.log((1 + len(movies)) / (1 + document_frequency)).astype(np.float32) + 1
+    weights = np.log1p(np.array(counts, dtype=np.float32)) * idf[columns]
+    norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=len(movies))).astype(np.float32)
+    weights /= np.where(norms == 0, 1, norms)[rows]
+
+    order = np.argsort(columns, kind="stable")
+    indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    np.cumsum(document_frequency, out=indptr[1:])
+    return {
+        "vocabulary": vocabulary,
+        "idf": idf,
+        "size": len(movies),
+        "indptr": indptr,
+        "documents": rows[order],
+        "weights": weights[order],
+    }
+
+
+def index_path(version):
+    return os.path.join(VECTOR_INDEX_DIR, f"{version}.npz")
+
+
+def save_index(index, version):
+    """Writes the index of catalog `version` atomically, keeping only the newest `_MAX_INDEXES` files."""
+    path = index_path(version)
+    os.makedirs(VECTOR_INDEX_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=VECTOR_INDEX_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, terms=np.array(list(index["vocabulary"]), dtype=str), size=index["size"],
+                     **{name: index[name] for name in ("idf", "indptr", "documents", "weights")})
+        os.replace(tmp_path, path)
+    except OSError:
+        os.unlink(tmp_path)
+        raise
+
+    files = sorted(
+        (entry.path for entry in os.scandir(VECTOR_INDEX_DIR) if entry.name.endswith(".npz")),
+        key=os.path.getmtime, reverse=True,
+    )
+    for old_path in files[_MAX_INDEXES:]:
+        os.remove(old_path)
+    return path
+
+
+def load_index(version):
+    """Returns the stored index of catalog `version`, or None."""
+    try:
+        with np.load(index_path(version)) as data:
+            index = {name: data[name] for name in ("idf", "indptr", "documents", "weights")}
+            terms, size = data["terms"], int(data["size"])
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️ Error reading vector index {version}: {e}")
+        return None
+    index["vocabulary"] = {str(term): column for column, term in enumerate(terms)}
+    index["size"] = size
+    return index
+
+
+def get_index(movies):
+    """
+    Returns the TF-IDF index for `movies`, building it only once per catalog version.
+    Indexes of large catalogs (`VECTOR_INDEX_MIN_MOVIES`) are loaded from `VECTOR_INDEX_DIR`,
+    else built and stored there for other processes.
+    """
+    version = catalog_version(movies)
+    with _indexes_lock:
+        if version in _indexes:
+            _indexes.move_to_end(version)
+            return _indexes[version]
+
+    large = len(movies) >= VECTOR_INDEX_MIN_MOVIES
+    index = load_index(version) if large else None
+    if index is None:
+        index = build_index(movies)
+        if large:
+            try:
+                save_index(index, version)
+            except OSError as e:
+                print(f"⚠️ Error saving vector index {version}: {e}")
+
+    with _indexes_lock:
+        _indexes[version] = index
+        while len(_indexes) > _MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def score_movies(query_words, movies, index=None):
+    """
+    Scores every movie against the mood or extracted words (cosine similarity of TF-IDF vectors).
+    `index` is a prebuilt index of `movies` (default: the cached index of the catalog).
+    """
+    index = index or get_index(movies)
+    vocabulary = index["vocabulary"]
+
+    query = Counter()
+    for term in expand_moods(query_words):
+        for token in tokenize(term):
+            column = vocabulary.get(token)
+            if column is not None:
+                query[column] += 1
+
+    columns = np.fromiter(query.keys(), dtype=np.int64, count=len(query))
+    query_weights = np.log1p(np.fromiter(query.values(), dtype=np.float32, count=len(query))) * index["idf"][columns]
+    norm = np.linalg.norm(query_weights)
+    scores = np.zeros(index["size"], dtype=np.float32)
+    if norm == 0:
+        return scores
+
+    # ✅ Only the postings of the query's terms are visited (a movie appears once per term)
+    indptr, documents, weights = index["indptr"], index["documents"], index["weights"]
+    for column, query_weight in zip(columns, query_weights / norm):
+        start, end = indptr[column], indptr[column + 1]
+        scores[documents[start:end]] += weights[start:end] * query_weight
+    return scores
+
+
+def top_indices(scores, k):
+    """
+    Returns the indices of the `k` highest scores, best first, like a stable sort (ties keep the lowest index first),
+    without sorting every score.
+    """
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+    above = np.flatnonzero(scores > kth)
+    tied = np.flatnonzero(scores == kth)[:k - len(above)]
+    top = np.concatenate([above, tied])
+    return top[np.lexsort((top, -scores[top]))]
+
+
+def rank_movies(query_words, movies, top_k):
+    """
+    Returns the indices of the `top_k` movies that best match the query words, best first.
+    Ties (including movies with no matching words) keep the catalog order.
+    """
+    scores = score_movies(query_words, movies)
+    return [int(i) for i in top_indices(scores, top_k)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the vector index of the week's library offline.")
+    parser.add_argument("--language", default="en-US", help="TMDB language")
+    args = parser.parse_args()
+
+    movies = tmdb_api.catalog_store.load_library(tmdb_api.get_first_day_of_week(), args.language)
+    if not movies:
+        print("⚠️ No library synced yet: run `python catalog_store.py --library` first")
+        return
+
+    start = time.perf_counter()
+    version = catalog_version(movies)
+    index = load_index(version) or build_index(movies)
+    path = save_index(index, version)
+    print(f"✅ Indexed {len(movies)} movies ({len(index['vocabulary'])} terms) in {time.perf_counter() - start:.1f}s: "
+          f"{path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Request coalescing ("single flight") for expensive calls.
+
+Concurrent calls with the same key share one execution: the first caller runs the function,
+later callers wait for it and receive a copy of its result (or its exception).
+Works for threads (`do`), for asyncio tasks (`do_async`, per event loop) and for generators (`stream`).
+"""
+import asyncio
+import copy
+import threading
+
+import metrics
+
+
+class _Call:
+    """An in-flight threaded call and its outcome."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with equal keys.
+    - Results are deep-copied for the waiting callers, so no caller can modify another caller's result.
+    - Keys are only shared while a call is in flight; later calls run again (caching is up to the caller).
+    - A waiting asyncio task that is cancelled does not cancel the shared call.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = {}
+        self.shared = 0  # calls served by another caller's execution
+
+    def do(self, key, function, *args, **kwargs):
+        """Runs `function(*args, **kwargs)`, unless a thread is already running it for `key`."""
+        if not self.enabled:
+            return function(*args, **kwargs)
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+                self.shared += 1
+
+        if not leader:
+            metrics.annotate(coalesced=True)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        result = None
+        try:
+            result = function(*args, **kwargs)
+            return result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                waiters = call.waiters
+            if waiters:
+                # ✅ Snapshot before the leader's caller gets (and may modify) the result
+                call.result = copy.deepcopy(result)
+            call.done.set()
+
+    def stream(self, key, generator_function, *args, **kwargs):
+        """
+        Streaming variant of `do`: the first caller gets the items of `generator_function(*args, **kwargs)` as they
+        are produced, later threads wait for the end and then get copies of all of them.
+        If the first caller stops consuming before the end, the waiting threads run the generator themselves.
+        """
+        if not self.enabled:
+            yield from generator_function(*args, **kwargs)
+            return
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+                self.shared += 1
+
+        if not leader:
+            metrics.annotate(coalesced=True)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            if call.result is None:
+                yield from generator_function(*args, **kwargs)
+            else:
+                yield from copy.deepcopy(call.result)
+            return
+
+        items = []
+        complete = False
+        try:
+            for item in generator_function(*args, **kwargs):
+                # ✅ Snapshot before the leader's caller gets (and may modify) the item
+                items.append(copy.deepcopy(item))
+                yield item
+            complete = True
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            if complete:
+                call.result = items
+            call.done.set()
+
+    async def do_async(self, key, coroutine_function, *args, **kwargs):
+        """Awaits `coroutine_function(*args, **kwargs)`, unless a task of this event loop is already awaiting it."""
+        if not self.enabled:
+            return await coroutine_function(*args, **kwargs)
+
+        loop_key = (asyncio.get_running_loop(), key)
+        with self._lock:
+            task = self._tasks.get(loop_key)
+            leader = task is None
+            if leader:
+                task = self._tasks[loop_key] = asyncio.ensure_future(coroutine_function(*args, **kwargs))
+                task.add_done_callback(lambda _: self._forget_task(loop_key))
+            else:
+                self.shared += 1
+
+        if not leader:
+            metrics.annotate(coalesced=True)
+        return copy.deepcopy(await asyncio.shield(task))
+
+    def _forget_task(self, loop_key):
+        with self._lock:
+            self._tasks.pop(loop_key, None)
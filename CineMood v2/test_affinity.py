@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+import unittest
+from collections import OrderedDict
+from unittest.mock import MagicMock, patch
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import affinity  # noqa: E402
+import llm  # noqa: E402
+from affinity import MOOD_ROWS, MOODS  # noqa: E402
+
+
+def make_movie(title, overview):
+    """Builds a fake catalog movie."""
+    return {"title": title, "overview": overview, "release_date": "2024-01-01"}
+
+
+MOVIES = [
+    make_movie("Laugh Out Loud", "A funny comedy about friends throwing a wild party."),
+    make_movie("The Haunting", "A family moves into a haunted house where a demon waits."),
+    make_movie("Hearts Apart", "Two lovers fall in love during a summer romance."),
+    make_movie("Goodbye Summer", "A story of grief, loss and tears after a farewell."),
+    make_movie("Final Mission", "An elite team races against time on an explosive heist."),
+]
+
+
+class TestAffinity(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for patcher in (patch("affinity.AFFINITY_DIR", self.directory),
+                        patch.object(affinity, "_matrices", OrderedDict())):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_matrix_is_built_once_and_stored(self):
+        """Test if a catalog's matrix covers every mood and movie, and is stored for other processes."""
+        matrix = affinity.get_matrix(MOVIES)
+        self.assertEqual(matrix["scores"].shape, (len(MOODS), len(MOVIES)))
+        self.assertIs(affinity.get_matrix([dict(movie) for movie in MOVIES]), matrix)
+
+        # ✅ Another process loads the stored file instead of scoring again
+        affinity._matrices.clear()
+        with patch("affinity.build_matrix") as mock_build:
+            loaded = affinity.get_matrix(MOVIES)
+        mock_build.assert_not_called()
+        self.assertEqual(loaded["catalog_version"], matrix["catalog_version"])
+        self.assertTrue((loaded["scores"] == matrix["scores"]).all())
+
+    def test_rank(self):
+        """Test if mood rows are aggregated into a top 3, and words outside the vocabulary use the local index."""
+        ranking = affinity.rank(["heartbroken", "sad", "neutral"], MOVIES)
+        self.assertEqual(len(ranking), 3)
+        self.assertEqual(ranking[0], [3, "A strong match for feeling heartbroken."])
+
+        self.assertEqual({index for index, _ in affinity.rank(["terrified", "romantic"], MOVIES, k=2)}, {1, 2})
+        self.assertEqual(affinity.rank(["haunted", "house"], MOVIES, k=1),
+                         [[1, "Trending movie matching what you described."]])
+
+    def test_llm_scorer(self):
+        """Test if GPT scores are scaled to 0-1, and batches that fail fall back to local scores."""
+        response = MagicMock()
+        response.choices[0].message.content = '{"happy": [10, 0, 5, 0, 0]}'
+        with patch("llm.backend.client") as mock_client:
+            mock_client.chat.completions.create.side_effect = [response, Exception("API failure")]
+            scores = llm.score_affinity(["happy", "sad"], MOVIES, batch_size=1)
+
+        self.assertEqual(scores[0], [1.0, 0.0, 0.5, 0.0, 0.0])
+        self.assertEqual(scores[1], affinity.local_scores(["sad"], MOVIES)[0].tolist())
+
+        matrix = affinity.build_matrix(MOVIES, lambda moods, movies: [[0.2] * len(movies)] * len(moods))
+        self.assertAlmostEqual(float(matrix["scores"][MOOD_ROWS["happy"], 0]), 0.2, places=2)
+
+
+@patch("llm.RANKING_MODE", "matrix")
+class TestMatrixRanking(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for patcher in (patch("affinity.AFFINITY_DIR", self.directory),
+                        patch.object(affinity, "_matrices", OrderedDict())):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    @patch("llm.backend.client")
+    def test_matrix_mode_skips_gpt(self, mock_client):
+        """Test if matrix mode ranks without GPT, including the streaming variant."""
+        movies = llm.get_movies_by_mood(["heartbroken", "sad", "sorrowful"], MOVIES)
+        self.assertEqual(movies[0]["title"], "Goodbye Summer")
+        self.assertEqual(list(llm.stream_movies_by_mood(["heartbroken", "sad", "sorrowful"], MOVIES)), movies)
+        mock_client.chat.completions.create.assert_not_called()
+
+    @patch("llm.AFFINITY_REASONS", True)
+    @patch("llm.ranking_cache.get", return_value=None)
+    @patch("llm.ranking_cache.set")
+    @patch("llm.backend.client")
+    def test_gpt_writes_reasons(self, mock_client, mock_cache_set, mock_cache_get):
+        """Test if GPT only explains the matrix winners, keeping the matrix order."""
+        response = MagicMock()
+        response.choices[0].message.content = (
+            '[{"index": 2, "match_reason": "Second."}, {"index": 1, "match_reason": "First."}]'
+        )
+        mock_client.chat.completions.create.return_value = response
+
+        movies = llm.get_movies_by_mood(["heartbroken", "sad", "sorrowful"], MOVIES)
+
+        self.assertEqual(movies[0]["title"], "Goodbye Summer")
+        self.assertEqual([movie["match_reason"] for movie in movies[:2]], ["First.", "Second."])
+        self.assertTrue(movies[2]["match_reason"].startswith("A strong match"))
+        prompt = mock_client.chat.completions.create.call_args.kwargs["messages"][1]["content"]
+        self.assertEqual(prompt.count("\n") - 2, 3, "Only the 3 winners should be sent to GPT")
+        mock_cache_set.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import api  # noqa: E402
+
+MOVIES = [
+    {"title": f"Movie {i}", "overview": f"Overview of Movie {i}.", "release_date": "2024-02-15", "poster": None}
+    for i in range(10)
+]
+
+
+async def fake_recommend(text, max_movies=60, movies=None, deadline=0):
+    """Fake async pipeline: "time" questions are invalid, everything else is happy."""
+    if "time" in text:
+        return {"status": "invalid", "moods": ["invalid"], "extracted_words": [], "detected_moods": [],
+                "movies": [], "recommendations": [], "tier": "llm", "tiers": {"detect": "llm"}, "timings": {}}
+    tier = "local" if deadline else "llm"
+    return {"status": "ok", "moods": ["happy", "joyful", "content"], "extracted_words": [text],
+            "detected_moods": ["happy"], "movies": movies, "recommendations": (movies or MOVIES)[:3],
+            "tier": tier, "tiers": {"detect": "llm", "rank": tier}, "timings": {}}
+
+
+class TestAPI(unittest.TestCase):
+
+    def setUp(self):
+        self.client = TestClient(api.app)
+
+    @patch("api.detect_mood_async")
+    def test_detect_mood(self, mock_detect_mood):
+        """Test if /detect-mood returns the moods with their status."""
+        mock_detect_mood.return_value = (["neutral", "neutral", "neutral"], ["sunday"], [])
+
+        response = self.client.post("/detect-mood", json={"text": "  A sunday  "})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "neutral")
+        mock_detect_mood.assert_called_once_with("A sunday")
+
+    @patch("api.recommend_async", side_effect=fake_recommend)
+    def test_recommend_rejects_empty_input(self, mock_recommend):
+        """Test if /recommend answers valid input and rejects blank messages."""
+        response = self.client.post("/recommend", json={"text": "I feel happy"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([movie["title"] for movie in response.json()["recommendations"]],
+                         ["Movie 0", "Movie 1", "Movie 2"])
+
+        self.assertEqual(self.client.post("/recommend", json={"text": "   "}).status_code, 422)
+
+    @patch("api.recommend_async", side_effect=fake_recommend)
+    def test_recommend_deadline(self, mock_recommend):
+        """Test if /recommend passes the requested deadline to the pipeline and reports the serving tier."""
+        response = self.client.post("/recommend", json={"text": "I feel happy", "deadline": 1.5})
+        self.assertEqual(response.json()["tier"], "local")
+        self.assertEqual(mock_recommend.call_args.kwargs["deadline"], 1.5)
+
+        self.assertEqual(self.client.post("/recommend", json={"text": "I feel happy"}).json()["tier"], "llm")
+        self.assertEqual(self.client.post("/recommend", json={"text": "happy", "deadline": 0}).status_code, 422)
+
+    @patch("api.fetch_movies", return_value=MOVIES[5:])
+    @patch("api.recommend_async", side_effect=fake_recommend)
+    def test_batch_shares_catalog_and_dedupes(self, mock_recommend, mock_fetch_movies):
+        """Test if a batch fetches the catalog once and processes identical inputs once."""
+        response = self.client.post("/recommend/batch", json={"inputs": ["happy", "What time is it?", "happy"]})
+
+        results = response.json()["results"]
+        self.assertEqual([result["status"] for result in results], ["ok", "invalid", "ok"])
+        self.assertEqual(results[0]["recommendations"][0]["title"], "Movie 5")
+        mock_fetch_movies.assert_called_once()
+        self.assertEqual(mock_recommend.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
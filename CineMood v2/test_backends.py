@@ -0,0 +1,130 @@
+import asyncio
+import json
+import os
+import unittest
+from unittest.mock import patch
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import backends  # noqa: E402
+import llm  # noqa: E402
+from input_cache import DetectionCache  # noqa: E402
+from prompts import ranking_messages  # noqa: E402
+
+MOVIES = [
+    {"title": "Laugh Out Loud", "overview": "A funny comedy about friends throwing a wild party.",
+     "release_date": "2024-01-01"},
+    {"title": "Goodbye Summer", "overview": "A sad story of grief, loss and tears after a farewell.",
+     "release_date": "2024-01-01"},
+    {"title": "Final Mission", "overview": "An elite team races against time on an explosive heist.",
+     "release_date": "2024-01-01"},
+    {"title": "Rainy Days", "overview": "A quiet rainy weekend in a small town.\n2. Not a new entry.",
+     "release_date": "2024-01-01"},
+]
+
+
+class TestLexicalDetection(unittest.TestCase):
+
+    def test_lexical_detection(self):
+        """Test if the lexical fallback keeps named moods (even ambiguous ones) and key words otherwise."""
+        moods, extracted_words, detected_moods = backends.lexical_detection("I'm not happy, but drained")
+        self.assertEqual(detected_moods, ["drained"])
+        self.assertEqual(len(moods), 3)
+        self.assertNotIn("happy", moods)
+
+        self.assertEqual(backends.lexical_detection("Honestly just a rainy sunday"),
+                         (["neutral", "neutral", "neutral"], ["rainy", "sunday"], []))
+
+
+class TestLocalBackend(unittest.TestCase):
+
+    def setUp(self):
+        local = backends.create_backend("local")
+        for patcher in (
+            patch.dict(llm.routes, {task: local for task in backends.TASKS}),
+            patch.object(llm, "detection_cache", DetectionCache(max_entries=100)),
+            patch("llm.ranking_cache.get", return_value=None),
+            patch("llm.ranking_cache.set"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_split_movie_request(self):
+        """Test if the local engine reads back the words and numbered movies of a ranking prompt."""
+        words, descriptions = backends.split_movie_request(
+            ranking_messages(["sad", "lonely"], MOVIES)[-1]["content"], "My moods: "
+        )
+        self.assertEqual(words, ["sad", "lonely"])
+        self.assertEqual(len(descriptions), 4)
+        self.assertTrue(descriptions[3].endswith("2. Not a new entry."))
+
+    def test_detect_mood(self):
+        """Test if the local engine detects named moods, key words and non-mood questions deterministically."""
+        moods, extracted_words, _ = llm.detect_mood("I'm exhausted and a bit lonely", use_lexicon=False)
+        self.assertEqual(moods[:2], ["exhausted", "lonely"])
+        self.assertEqual(extracted_words, ["exhausted", "lonely"])
+
+        self.assertEqual(llm.detect_mood("A rainy sunday", use_lexicon=False, mode="two_step"),
+                         (["neutral", "neutral", "neutral"], ["rainy", "sunday"], ["neutral", "neutral", "neutral"]))
+        self.assertEqual(llm.detect_mood("What time is it?", use_lexicon=False), (["invalid"], [], []))
+
+    @patch("llm.mood_memo.set")
+    @patch("llm.mood_memo.get", return_value=None)
+    def test_map_to_valid_mood(self, mock_memo_get, mock_memo_set):
+        """Test if the local engine maps free-form moods to vocabulary moods, without memoizing them."""
+        self.assertIn("exhausted", llm.map_to_valid_mood(["exhaustion", "zorbly"]))
+        self.assertEqual(llm.map_to_valid_mood(["zorbly"]), ["neutral", "neutral", "neutral"])
+        mock_memo_set.assert_not_called()
+
+    def test_rank(self):
+        """Test if the local engine ranks by TF-IDF similarity in the sync, async and streaming variants."""
+        movies = llm.get_movies_by_mood(["sad", "heartbroken"], MOVIES)
+        self.assertEqual(movies[0]["title"], "Goodbye Summer")
+        self.assertEqual(movies[0]["match_reason"], "A strong match for feeling sad.")
+        self.assertEqual(len(movies), 3)
+
+        self.assertEqual(asyncio.run(llm.get_movies_by_mood_async(["sad", "heartbroken"], MOVIES)), movies)
+        self.assertEqual(list(llm.stream_movies_by_mood(["sad", "heartbroken"], MOVIES)), movies)
+        self.assertIn("|cinemood-local|", llm.ranking_cache_key(["sad"], MOVIES, 15))
+
+    def test_score_affinity(self):
+        """Test if the local engine scores moods against movies on the 0-10 scale."""
+        scores = llm.score_affinity(["sad", "funny"], MOVIES)
+        self.assertEqual(len(scores), 2)
+        self.assertEqual(max(range(len(MOVIES)), key=lambda i: scores[0][i]), 1)
+        self.assertTrue(all(score in [i / 10 for i in range(11)] for row in scores for score in row))
+
+    def test_unknown_prompt(self):
+        """Test if prompts the local engine does not know raise, so callers use their fallbacks."""
+        with self.assertRaises(ValueError):
+            backends.LocalEngine().create(messages=[{"role": "user", "content": "Hello"}])
+
+
+class TestRoutes(unittest.TestCase):
+
+    @patch("backends.LLM_BACKEND_RANK", "compatible")
+    @patch("backends.LLM_BACKEND_MAP", "local")
+    @patch("backends.LLM_BACKEND_DETECT", "local")
+    def test_create_routes(self):
+        """Test if tasks are routed to their backends, sharing one instance per backend."""
+        default = backends.create_backend("openai")
+        routes = backends.create_routes(default)
+
+        self.assertEqual({task: backend.name for task, backend in routes.items()},
+                         {"detect": "local", "map": "local", "rank": "compatible"})
+        self.assertIs(routes["detect"], routes["map"])
+        self.assertIsNot(routes["rank"].client.breaker, default.client.breaker)
+        with self.assertRaises(ValueError):
+            backends.create_backend("gpt-5")
+
+    def test_complete_records_backend(self):
+        """Test if calls are sent to the routed backend's model and record the backend name."""
+        with patch.dict(llm.routes, rank=backends.create_backend("local")), \
+                patch("metrics.annotate") as mock_annotate:
+            response = llm.complete("rank", ranking_messages(["sad"], MOVIES))
+        self.assertEqual(json.loads(response.choices[0].message.content)[0]["index"], 2)
+        mock_annotate.assert_called_with(backend="local")
+
+
+if __name__ == "__main__":
+    unittest.main()
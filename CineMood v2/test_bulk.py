@@ -0,0 +1,102 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import bulk  # noqa: E402
+
+MOVIES = [
+    {"title": f"Movie {i}", "overview": f"Overview of Movie {i}.", "release_date": "2024-02-15", "poster": None}
+    for i in range(10)
+]
+
+
+async def fake_recommend(text, max_movies=60, movies=None, deadline=0):
+    """Fake async pipeline recommending the first catalog movie."""
+    await asyncio.sleep(0.01)
+    return {"status": "ok", "moods": ["happy", "joyful", "content"], "extracted_words": [text],
+            "detected_moods": ["happy"], "movies": movies, "recommendations": movies[:1], "timings": {}}
+
+
+class TestBulk(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.directory, "inputs.jsonl")
+        self.output_path = os.path.join(self.directory, "results.jsonl")
+        lines = [
+            {"id": "a", "text": "I feel happy"},
+            {"id": "b", "text": "I  feel happy "},
+            "So tired today",
+            {"id": "c", "text": ""},
+            {"id": "d", "text": "Anxious about work"},
+        ]
+        with open(self.input_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(json.dumps(line) for line in lines) + "\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read_output(self):
+        with open(self.output_path, "r", encoding="utf-8") as f:
+            return sorted((json.loads(line) for line in f), key=lambda record: record["line"])
+
+    @patch("bulk.fetch_movies", return_value=MOVIES)
+    @patch("bulk.recommend_async", side_effect=fake_recommend)
+    def test_results_are_deduplicated(self, mock_recommend, mock_fetch_movies):
+        """Test if every valid line gets a result, identical texts are processed once and the catalog is shared."""
+        stats = asyncio.run(bulk.run(self.input_path, self.output_path, concurrency=2))
+
+        records = self.read_output()
+        self.assertEqual([record["line"] for record in records], [1, 2, 3, 5])
+        self.assertEqual([record["id"] for record in records], ["a", "b", None, "d"])
+        self.assertEqual(records[0]["recommendations"], MOVIES[:1])
+        self.assertEqual(stats["processed"], 3)
+        self.assertEqual(stats["deduplicated"], 1)
+        mock_fetch_movies.assert_called_once()
+        self.assertEqual(mock_recommend.call_count, 3)
+
+    @patch("bulk.fetch_movies", return_value=MOVIES)
+    @patch("bulk.recommend_async", side_effect=fake_recommend)
+    def test_interrupted_run_resumes(self, mock_recommend, mock_fetch_movies):
+        """Test if a rerun skips completed lines, reuses their results and drops a truncated last line."""
+        with open(self.output_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"line": 1, "id": "a", "text": "I feel happy", "status": "ok",
+                                "recommendations": []}) + "\n")
+            f.write('{"line": 3, "id": null, "text": "So ti')
+
+        stats = asyncio.run(bulk.run(self.input_path, self.output_path))
+
+        self.assertEqual([record["line"] for record in self.read_output()], [1, 2, 3, 5])
+        self.assertEqual(stats["skipped"], 1)
+        self.assertEqual(stats["deduplicated"], 1)
+        self.assertEqual(sorted(call.args[0] for call in mock_recommend.call_args_list),
+                         ["Anxious about work", "So tired today"])
+
+    @patch("bulk.fetch_movies", return_value=MOVIES)
+    @patch("bulk.recommend_async", side_effect=fake_recommend)
+    def test_corrupt_checkpoint_lines_are_rerun(self, mock_recommend, mock_fetch_movies):
+        """Test if a rerun skips corrupt result lines (a truncated line, a record without text) and reruns them."""
+        with open(self.output_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"line": 1, "id": "a", "text": "I feel happy", "status": "ok",
+                                "recommendations": []}) + "\n")
+            f.write(json.dumps({"line": 5, "id": "d", "status": "ok"}) + "\n")
+            f.write('{"line": 3, "id": null, "text": "So ti\n')
+
+        with patch("sys.stderr"):
+            stats = asyncio.run(bulk.run(self.input_path, self.output_path))
+
+        self.assertEqual(stats["skipped"], 1)
+        self.assertEqual(sorted(call.args[0] for call in mock_recommend.call_args_list),
+                         ["Anxious about work", "So tired today"])
+        done, _ = bulk.load_checkpoint(self.output_path)
+        self.assertEqual(done, {1, 2, 3, 5})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import multiprocessing
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from cache import JsonCache
+
+
+def write_entries(cache_dir, prefix, count):
+    """Writes `count` entries from a separate process."""
+    cache = JsonCache("shared", cache_dir=cache_dir)
+    for i in range(count):
+        cache.set(f"{prefix}{i}", i)
+
+
+class TestJsonCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_values_persist_across_instances(self):
+        """Test if values written by one cache instance are read by another."""
+        JsonCache("test", cache_dir=self.cache_dir).set("key", [1, 2, 3])
+        self.assertEqual(JsonCache("test", cache_dir=self.cache_dir).get("key"), [1, 2, 3])
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """Test if the cache keeps at most `max_entries`, evicting the least recently used."""
+        cache = JsonCache("test", cache_dir=self.cache_dir, max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_entries_expire_after_ttl(self):
+        """Test if entries older than `ttl` seconds are treated as missing."""
+        cache = JsonCache("test", cache_dir=self.cache_dir, ttl=60)
+        with patch("cache.time.time", return_value=1000):
+            cache.set("key", "value")
+        with patch("cache.time.time", return_value=1030):
+            self.assertEqual(cache.get("key"), "value")
+        with patch("cache.time.time", return_value=1100):
+            self.assertIsNone(cache.get("key"))
+
+    def test_concurrent_processes_keep_each_others_entries(self):
+        """Test if writers in several processes do not overwrite each other's entries."""
+        workers = [
+            multiprocessing.Process(target=write_entries, args=(self.cache_dir, prefix, 25)) for prefix in "abcd"
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        cache = JsonCache("shared", cache_dir=self.cache_dir)
+        self.assertEqual(sum(cache.get(f"{prefix}{i}") is not None for prefix in "abcd" for i in range(25)), 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
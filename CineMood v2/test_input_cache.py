@@ -0,0 +1,69 @@
+import unittest
+
+from input_cache import DetectionCache, normalize_input
+
+
+class TestInputCache(unittest.TestCase):
+
+    def test_normalize_input(self):
+        """Test if case, punctuation, whitespace, filler and stop words are normalized away, but not negations."""
+        self.assertEqual(normalize_input("I'm   SO tired today!!"), "tired")
+        self.assertEqual(normalize_input("I don't feel happy"), "dont happy")
+        self.assertEqual(normalize_input("I am so"), "i am so")
+
+    def test_near_identical_inputs(self):
+        """Test if near-identical inputs reuse a detection, while other moods and negations do not."""
+        cache = DetectionCache(max_entries=10, threshold=0.8)
+        cache.set("exhausted after work", "structured", (["exhausted"], ["work"], ["exhausted"]))
+        cache.set("happy", "structured", (["happy"], [], ["happy"]))
+
+        self.assertEqual(cache.get("Exhausted after the work...", "structured")[1], "hit")
+        self.assertEqual(cache.get("so exhausted after works", "structured"),
+                         ((["exhausted"], ["work"], ["exhausted"]), "near"))
+        self.assertEqual(cache.get("exhausted after work", "two_step"), (None, "miss"))
+        self.assertEqual(cache.get("not happy", "structured"), (None, "miss"))
+        self.assertEqual(cache.get("angry", "structured"), (None, "miss"))
+        self.assertEqual((cache.hits, cache.near_hits, cache.misses), (1, 1, 3))
+
+        # ✅ Callers get copies
+        cache.get("happy", "structured")[0][0].append("changed")
+        self.assertEqual(cache.get("happy", "structured")[0], (["happy"], [], ["happy"]))
+
+    def test_other_mood_words_do_not_match(self):
+        """Test if inputs sharing a long prefix but naming other moods, or swapping words, are not near matches."""
+        prefix = "After a long week at work dealing with endless meetings and impossible deadlines my whole body is"
+        cache = DetectionCache(max_entries=10, threshold=0.9)
+        cache.set(f"{prefix} finally relaxed and calm", "structured", (["relaxed", "calm", "peaceful"], [], []))
+        cache.set("love job hate boss", "structured", (["content"], [], []))
+
+        self.assertEqual(cache.get(f"{prefix} finally sad and lonely", "structured"), (None, "miss"))
+        self.assertEqual(cache.get("hate job love boss", "structured"), (None, "miss"))
+        self.assertEqual(cache.get(f"{prefix} finally relaxed and calm!", "structured")[1], "hit")
+
+    def test_zero_entries_disable_the_cache(self):
+        """Test if a cache without room stores nothing."""
+        cache = DetectionCache(max_entries=0)
+        cache.set("happy", "structured", 1)
+        self.assertEqual(cache.get("happy", "structured"), (None, "miss"))
+
+    def test_exact_matches_only(self):
+        """Test if a zero threshold disables near matching."""
+        cache = DetectionCache(threshold=0)
+        cache.set("exhausted after work", "structured", "result")
+        self.assertEqual(cache.get("so exhausted after works", "structured"), (None, "miss"))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """Test if the cache keeps at most `max_entries` detections, evicting the least recently used one."""
+        cache = DetectionCache(max_entries=2, threshold=0)
+        cache.set("happy", "structured", 1)
+        cache.set("sad", "structured", 2)
+        cache.get("happy", "structured")
+        cache.set("angry", "structured", 3)
+
+        self.assertEqual(cache.get("sad", "structured"), (None, "miss"))
+        self.assertEqual(cache.get("happy", "structured"), (1, "hit"))
+        self.assertEqual(cache.get("angry", "structured"), (3, "hit"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,290 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import llm  # noqa: E402
+from cache import JsonCache  # noqa: E402
+from input_cache import DetectionCache  # noqa: E402
+from llm import (  # noqa: E402
+    detect_mood, detect_mood_async, get_movies_by_mood, get_movies_by_mood_async, iter_json_objects,
+    map_to_valid_mood, stream_movies_by_mood
+)
+
+
+def completion(content):
+    """Builds a fake chat completion response with `content` as the message."""
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def make_movies(count):
+    """Builds `count` fake movies; only movie 42 talks about romance."""
+    movies = [
+        {"title": f"Movie {i}", "overview": f"A heist crew plans job number {i}.", "release_date": "2024-01-01"}
+        for i in range(count)
+    ]
+    movies[42]["overview"] = "Two lovers fall in love and plan a wedding."
+    return movies
+
+
+class TestLLMFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.memo_patch = patch.object(llm, "mood_memo", JsonCache("mood_memo", cache_dir=self.cache_dir))
+        self.memo_patch.start()
+        self.ranking_patch = patch.object(llm, "ranking_cache", JsonCache("rankings", cache_dir=self.cache_dir))
+        self.ranking_patch.start()
+        self.detection_patch = patch.object(llm, "detection_cache", DetectionCache(max_entries=100))
+        self.detection_patch.start()
+
+    def tearDown(self):
+        self.memo_patch.stop()
+        self.ranking_patch.stop()
+        self.detection_patch.stop()
+        shutil.rmtree(self.cache_dir)
+
+    @patch("llm.backend.client")
+    def test_map_to_valid_mood_uses_synonym_table(self, mock_client):
+        """Test if words from the shipped synonym table are mapped without calling GPT."""
+        self.assertEqual(map_to_valid_mood(["Blue"]), ["sad", "melancholic", "gloomy"])
+        self.assertEqual(len(map_to_valid_mood(["blue", "meh-ish"])), 3)
+        mock_client.chat.completions.create.assert_not_called()
+
+    @patch("llm.backend.client")
+    def test_map_to_valid_mood_is_memoized(self, mock_client):
+        """Test if GPT mappings are memoized per word and persisted for other processes."""
+        mock_client.chat.completions.create.return_value = completion("wistful, mellow, pensive")
+
+        self.assertEqual(map_to_valid_mood(["floaty"]), ["wistful", "mellow", "pensive"])
+        self.assertEqual(map_to_valid_mood([" Floaty! "]), ["wistful", "mellow", "pensive"])
+        with patch.object(llm, "mood_memo", JsonCache("mood_memo", cache_dir=self.cache_dir)):
+            self.assertEqual(map_to_valid_mood(["floaty"]), ["wistful", "mellow", "pensive"])
+
+        mock_client.chat.completions.create.assert_called_once()
+
+    @patch("llm.backend.client")
+    def test_detect_mood_lexicon_fast_path(self, mock_client):
+        """Test if explicitly named moods are detected without calling GPT."""
+        final_moods, extracted_words, _ = detect_mood("I'm tired and stressed")
+
+        mock_client.chat.completions.create.assert_not_called()
+        self.assertEqual(final_moods[:2], ["tired", "stressed"])
+        self.assertEqual(extracted_words, ["tired", "stressed"])
+
+    @patch("llm.backend.client")
+    def test_detect_mood_falls_back_to_gpt(self, mock_client):
+        """Test if inputs without confident lexicon matches are sent to GPT."""
+        mock_client.chat.completions.create.return_value = completion(json.dumps({
+            "detected_moods": ["sad", "melancholic", "gloomy"], "extracted_words": ["down"],
+        }))
+
+        final_moods, extracted_words, _ = detect_mood("I'm feeling a bit down")
+
+        mock_client.chat.completions.create.assert_called_once()
+        self.assertEqual(final_moods, ["sad", "melancholic", "gloomy"])
+        self.assertEqual(extracted_words, ["down"])
+
+    @patch("llm.backend.client")
+    def test_detect_mood_structured_single_call(self, mock_client):
+        """Test if structured mode detects valid moods with one schema-constrained GPT call."""
+        mock_client.chat.completions.create.return_value = completion(json.dumps({
+            "detected_moods": ["wistful", "sentimental", "wistful"], "extracted_words": ["childhood"],
+        }))
+
+        final_moods, extracted_words, _ = detect_mood("I just remembered my childhood.", mode="structured")
+
+        mock_client.chat.completions.create.assert_called_once()
+        kwargs = mock_client.chat.completions.create.call_args.kwargs
+        self.assertEqual(kwargs["response_format"]["type"], "json_schema")
+        self.assertEqual(final_moods, ["wistful", "sentimental", "neutral"])
+        self.assertEqual(extracted_words, ["childhood"])
+
+    @patch("llm.backend.client")
+    def test_detect_mood_invalid_input(self, mock_client):
+        """Test if non-emotional input is reported as invalid in both modes."""
+        mock_client.chat.completions.create.return_value = completion(json.dumps({
+            "detected_moods": ["invalid"], "extracted_words": [],
+        }))
+
+        for mode in ("structured", "two_step"):
+            self.assertEqual(detect_mood("What time is it?", mode=mode), (["invalid"], [], []))
+
+    @patch("llm.backend.client")
+    def test_detect_mood_two_step_maps_unknown_moods(self, mock_client):
+        """Test if two-step mode maps moods outside the vocabulary."""
+        mock_client.chat.completions.create.side_effect = [
+            completion(json.dumps({"detected_moods": ["explorative", "happy"], "extracted_words": ["explore"]})),
+            completion("inspired, expectant, excited"),
+        ]
+
+        final_moods, _, detected_moods = detect_mood("I want to explore new things!", mode="two_step")
+
+        self.assertEqual(mock_client.chat.completions.create.call_count, 2)
+        self.assertEqual(detected_moods, ["explorative", "happy"])
+        self.assertEqual(final_moods, ["happy", "inspired", "expectant"])
+
+    @patch("llm.backend.client")
+    def test_get_movies_by_mood_uses_pre_ranked_candidates(self, mock_client):
+        """Test if only the top-K candidates are sent to GPT and indices map back to them."""
+        movies = make_movies(60)
+        mock_client.chat.completions.create.return_value = completion(json.dumps([
+            {"index": 1, "match_reason": "A romance."},
+            {"index": 2, "match_reason": "Reason 2."},
+            {"index": 3, "match_reason": "Reason 3."},
+        ]))
+
+        best_movies = get_movies_by_mood(["romantic", "loving", "tender"], movies, top_k=5)
+
+        prompt = mock_client.chat.completions.create.call_args.kwargs["messages"][-1]["content"]
+        self.assertEqual(prompt.count("A heist crew") + prompt.count("Two lovers"), 5)
+        self.assertEqual(len(best_movies), 3)
+        self.assertEqual(best_movies[0]["title"], "Movie 42")
+        self.assertEqual(best_movies[0]["match_reason"], "A romance.")
+
+    @patch("llm.backend.client")
+    def test_get_movies_by_mood_is_cached(self, mock_client):
+        """Test if rankings are cached per mood set and returned as copies."""
+        movies = make_movies(60)
+        mock_client.chat.completions.create.return_value = completion(json.dumps([
+            {"index": 1, "match_reason": "A romance."},
+            {"index": 2, "match_reason": "Reason 2."},
+            {"index": 3, "match_reason": "Reason 3."},
+        ]))
+
+        first = get_movies_by_mood(["romantic", "loving", "tender"], movies, top_k=5)
+        second = get_movies_by_mood(["tender", "romantic", "loving"], movies, top_k=5)
+
+        mock_client.chat.completions.create.assert_called_once()
+        self.assertEqual(first, second)
+        self.assertNotIn("match_reason", movies[42], "The shared catalog should not be modified")
+        second[0]["title"] = "Changed"
+        self.assertEqual(get_movies_by_mood(["romantic", "loving", "tender"], movies, top_k=5)[0]["title"], "Movie 42")
+
+        # ✅ A different catalog version is ranked again
+        movies[0]["overview"] = "A new overview."
+        get_movies_by_mood(["romantic", "loving", "tender"], movies, top_k=5)
+        self.assertEqual(mock_client.chat.completions.create.call_count, 2)
+
+    @patch("llm.backend.client")
+    def test_get_movies_by_mood_falls_back_to_trending(self, mock_client):
+        """Test if ranking errors fall back to the first 3 trending movies."""
+        movies = make_movies(60)
+        mock_client.chat.completions.create.return_value = completion("not json")
+
+        self.assertEqual(get_movies_by_mood(["happy"], movies), movies[:3])
+
+    @patch("llm.backend.client")
+    @patch("llm.backend.async_client")
+    def test_async_variants_share_parsing_and_cache(self, mock_async_client, mock_client):
+        """Test if the async functions parse like the sync ones and share the ranking cache."""
+        movies = make_movies(60)
+        mock_async_client.chat.completions.create = AsyncMock(side_effect=[
+            completion(json.dumps({"detected_moods": ["sad", "invalid"], "extracted_words": ["down"]})),
+            completion(json.dumps([{"index": 1, "match_reason": "A romance."}])),
+        ])
+
+        moods, extracted_words, _ = asyncio.run(detect_mood_async("I'm down", use_lexicon=False))
+        self.assertEqual(moods, ["sad", "neutral", "neutral"])
+        self.assertEqual(extracted_words, ["down"])
+
+        best_movies = asyncio.run(get_movies_by_mood_async(["romantic"], movies, top_k=5))
+        self.assertEqual(best_movies[0]["title"], "Movie 42")
+        self.assertEqual(get_movies_by_mood(["romantic"], movies, top_k=5), best_movies)
+        mock_client.chat.completions.create.assert_not_called()
+
+    @patch("llm.backend.client")
+    def test_concurrent_identical_detections_share_one_call(self, mock_client):
+        """Test if concurrent detections of equivalent inputs issue a single GPT request."""
+        def slow_completion(**kwargs):
+            time.sleep(0.2)
+            return completion(json.dumps({"detected_moods": ["sad"], "extracted_words": ["rain"]}))
+
+        mock_client.chat.completions.create.side_effect = slow_completion
+        inputs = ["Rainy day again", "rainy  day again", "RAINY DAY AGAIN"]
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            results = list(executor.map(lambda text: detect_mood(text, use_lexicon=False), inputs))
+
+        mock_client.chat.completions.create.assert_called_once()
+        self.assertEqual([result[0] for result in results], [["sad", "neutral", "neutral"]] * 3)
+
+    @patch("llm.backend.client")
+    def test_near_duplicate_detections_are_reused(self, mock_client):
+        """Test if variants of a cached input reuse its detection, and failed detections are not cached."""
+        mock_client.chat.completions.create.side_effect = [
+            Exception("API failure"),
+            completion(json.dumps({"detected_moods": ["tired", "drained"], "extracted_words": ["tired"]})),
+        ]
+        self.assertEqual(detect_mood("so tired today", use_lexicon=False), (["neutral"] * 3, [], []))
+
+        expected = (["tired", "drained", "neutral"], ["tired"], ["tired", "drained"])
+        self.assertEqual(detect_mood("so tired today", use_lexicon=False), expected)
+        self.assertEqual(detect_mood("I'm so tired today!!", use_lexicon=False), expected)
+        self.assertEqual(asyncio.run(detect_mood_async("So  TIRED today...", use_lexicon=False)), expected)
+        self.assertEqual(mock_client.chat.completions.create.call_count, 2)
+        self.assertEqual(llm.detection_cache.hits, 2)
+
+    def test_iter_json_objects(self):
+        """Test if objects are parsed as soon as they are complete, across arbitrary chunk boundaries."""
+        text = (
+            '```json\n[{"index": 2, "match_reason": "Braces } and \\"quotes\\" {"}, '
+            '{"index": 1, "match_reason": "B"}]'
+        )
+        chunks = [text[i:i + 3] for i in range(0, len(text), 3)]
+        self.assertEqual(
+            list(iter_json_objects(chunks)),
+            [{"index": 2, "match_reason": 'Braces } and "quotes" {'}, {"index": 1, "match_reason": "B"}],
+        )
+
+    @patch("llm.backend.client")
+    def test_stream_movies_by_mood(self, mock_client):
+        """Test if streamed movies are yielded one by one and the ranking is cached."""
+        movies = make_movies(60)
+        text = json.dumps([{"index": 3, "match_reason": "First."}, {"index": 1, "match_reason": "Second."}])
+        mock_client.chat.completions.create.return_value = [
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text[i:i + 5]))])
+            for i in range(0, len(text), 5)
+        ]
+
+        stream = stream_movies_by_mood(["happy"], movies, top_k=0)
+        first = next(stream)
+        self.assertEqual((first["title"], first["match_reason"]), ("Movie 2", "First."))
+        self.assertEqual([movie["title"] for movie in stream], ["Movie 0"])
+        self.assertTrue(mock_client.chat.completions.create.call_args.kwargs["stream"])
+
+        self.assertEqual(
+            [movie["title"] for movie in get_movies_by_mood(["happy"], movies, top_k=0)], ["Movie 2", "Movie 0"]
+        )
+        mock_client.chat.completions.create.assert_called_once()
+
+    @patch("llm.backend.client")
+    def test_concurrent_streams_share_one_call(self, mock_client):
+        """Test if identical concurrent streamed rankings share one GPT request."""
+        movies = make_movies(60)
+        text = json.dumps([{"index": 3, "match_reason": "First."}, {"index": 1, "match_reason": "Second."}])
+
+        def slow_stream(**kwargs):
+            for i in range(0, len(text), 5):
+                time.sleep(0.01)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text[i:i + 5]))])
+
+        mock_client.chat.completions.create.side_effect = slow_stream
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            rankings = list(executor.map(
+                lambda _: [movie["title"] for movie in stream_movies_by_mood(["happy"], movies, top_k=0)], range(3)
+            ))
+
+        self.assertEqual(rankings, [["Movie 2", "Movie 0"]] * 3)
+        mock_client.chat.completions.create.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
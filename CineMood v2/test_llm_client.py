@@ -0,0 +1,180 @@
+import asyncio
+import os
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import openai  # noqa: E402
+
+import llm  # noqa: E402
+import llm_client  # noqa: E402
+from llm_client import AsyncResilientClient, CircuitBreaker, CircuitOpenError, ResilientClient  # noqa: E402
+
+httpx = llm_client.httpx
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def status_error(error_class, status_code, headers=None):
+    """Builds an OpenAI SDK status error as raised for an HTTP error response."""
+    response = httpx.Response(status_code, headers=headers, request=REQUEST)
+    return error_class(f"HTTP {status_code}", response=response, body=None)
+
+
+def inner_client(*outcomes):
+    """Fake SDK client whose `create` raises or returns `outcomes` in order."""
+    inner = MagicMock()
+    inner.chat.completions.create.side_effect = list(outcomes)
+    return inner
+
+
+@patch("llm_client.time.sleep")
+class TestResilientClient(unittest.TestCase):
+
+    def test_retries_transient_errors(self, mock_sleep):
+        """Test if 429 and 5xx errors are retried with backoff, honouring Retry-After."""
+        inner = inner_client(
+            status_error(openai.RateLimitError, 429, {"retry-after": "2"}),
+            status_error(openai.InternalServerError, 503),
+            "response",
+        )
+        client = ResilientClient(inner, CircuitBreaker(), max_retries=3)
+
+        self.assertEqual(client.chat.completions.create(model="m", messages=[], deadline=60), "response")
+        self.assertEqual(inner.chat.completions.create.call_count, 3)
+        self.assertEqual(mock_sleep.call_args_list[0].args, (2.0,))
+        self.assertLess(mock_sleep.call_args_list[1].args[0], 1.0 + 1e-9)
+        self.assertIn("timeout", inner.chat.completions.create.call_args.kwargs)
+        self.assertNotIn("deadline", inner.chat.completions.create.call_args.kwargs)
+
+    def test_client_errors_are_not_retried(self, mock_sleep):
+        """Test if a 400 error is raised at once and does not count towards the breaker."""
+        breaker = CircuitBreaker(failure_threshold=1)
+        client = ResilientClient(inner_client(status_error(openai.BadRequestError, 400)), breaker)
+
+        with self.assertRaises(openai.BadRequestError):
+            client.chat.completions.create(model="m", messages=[])
+        mock_sleep.assert_not_called()
+        self.assertEqual(breaker.state, "closed")
+
+    def test_retries_stop_at_the_deadline(self, mock_sleep):
+        """Test if no retry is attempted when its backoff would end after the call's deadline."""
+        inner = inner_client(status_error(openai.RateLimitError, 429, {"retry-after": "5"}), "response")
+        client = ResilientClient(inner, CircuitBreaker())
+
+        with self.assertRaises(openai.RateLimitError):
+            client.chat.completions.create(model="m", messages=[], deadline=1)
+        mock_sleep.assert_not_called()
+
+    def test_circuit_breaker(self, mock_sleep):
+        """Test if the breaker opens after repeated failures, fails fast, and closes after a successful trial."""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        inner = inner_client(*[status_error(openai.InternalServerError, 500)] * 2, "response")
+        client = ResilientClient(inner, breaker, max_retries=0)
+
+        for _ in range(2):
+            with self.assertRaises(openai.InternalServerError):
+                client.chat.completions.create(model="m", messages=[])
+        self.assertEqual(breaker.state, "open")
+
+        with self.assertRaises(CircuitOpenError):
+            client.chat.completions.create(model="m", messages=[])
+        self.assertEqual(inner.chat.completions.create.call_count, 2)
+
+        with patch("llm_client.time.monotonic", return_value=breaker.opened_at + 31):
+            self.assertEqual(client.chat.completions.create(model="m", messages=[]), "response")
+        self.assertEqual(breaker.state, "closed")
+
+    def test_interrupted_trial_call_releases_the_breaker(self, mock_sleep):
+        """Test if a trial call ending without an answer lets the next call try again."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+        client = ResilientClient(inner_client(KeyboardInterrupt(), "response"), breaker)
+
+        with patch("llm_client.time.monotonic", return_value=breaker.opened_at + 31):
+            with self.assertRaises(KeyboardInterrupt):
+                client.chat.completions.create(model="m", messages=[])
+            self.assertEqual(breaker.state, "open")
+            self.assertEqual(client.chat.completions.create(model="m", messages=[]), "response")
+        self.assertEqual(breaker.state, "closed")
+
+    def test_streams_report_their_outcome_when_consumed(self, mock_sleep):
+        """Test if a stream counts as a success once consumed, and as a failure when it breaks midway."""
+        def broken_stream():
+            yield "chunk"
+            raise openai.APIConnectionError(request=REQUEST)
+
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+        client = ResilientClient(inner_client(iter(["a", "b"]), broken_stream()), breaker)
+
+        with patch("llm_client.time.monotonic", return_value=breaker.opened_at + 31):
+            stream = client.chat.completions.create(model="m", messages=[], stream=True)
+            self.assertEqual(breaker.state, "half_open")
+            self.assertEqual(list(stream), ["a", "b"])
+        self.assertEqual(breaker.state, "closed")
+
+        stream = client.chat.completions.create(model="m", messages=[], stream=True)
+        with self.assertRaises(openai.APIConnectionError):
+            list(stream)
+        self.assertEqual(breaker.state, "open")
+
+
+class TestAsyncResilientClient(unittest.TestCase):
+
+    @patch("llm_client.asyncio.sleep", new_callable=AsyncMock)
+    def test_retries_connection_errors(self, mock_sleep):
+        """Test if the async client retries connection errors and timeouts."""
+        inner = MagicMock()
+        inner.chat.completions.create = AsyncMock(side_effect=[
+            openai.APIConnectionError(request=REQUEST), openai.APITimeoutError(request=REQUEST), "response"
+        ])
+        client = AsyncResilientClient(inner, CircuitBreaker())
+
+        result = asyncio.run(client.chat.completions.create(model="m", messages=[]))
+        self.assertEqual(result, "response")
+        self.assertEqual(mock_sleep.await_count, 2)
+
+    def test_cancelled_trial_call_releases_the_breaker(self):
+        """Test if cancelling the half-open trial call does not leave the breaker half-open."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+
+        async def hang(**kwargs):
+            await asyncio.sleep(10)
+
+        inner = MagicMock()
+        inner.chat.completions.create = AsyncMock(side_effect=hang)
+        client = AsyncResilientClient(inner, breaker)
+
+        async def cancel_trial():
+            task = asyncio.ensure_future(client.chat.completions.create(model="m", messages=[]))
+            await asyncio.sleep(0.01)
+            self.assertEqual(breaker.state, "half_open")
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_trial())
+        self.assertEqual(breaker.state, "open")
+        self.assertTrue(breaker.allow())
+
+
+class TestFallbacks(unittest.TestCase):
+
+    def test_open_circuit_uses_fallbacks(self):
+        """Test if llm returns its neutral and top-3 fallbacks without calling GPT while the circuit is open."""
+        inner = MagicMock()
+        breaker = CircuitBreaker(failure_threshold=1)
+        breaker.record_failure()
+        movies = [{"title": f"Movie {i}", "overview": "Overview", "release_date": "2024-01-01"} for i in range(5)]
+
+        with patch("llm.backend.client", ResilientClient(inner, breaker)), \
+                patch("llm.mood_memo.get", return_value=None), patch("llm.ranking_cache.get", return_value=None):
+            self.assertEqual(llm.map_to_valid_mood(["zorbly"]), ["neutral"] * 3)
+            self.assertEqual(llm.get_movies_by_mood(["happy"], movies, use_cache=False), movies[:3])
+        inner.chat.completions.create.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import metrics
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    def test_tracked_call_records_tokens_cache_and_outcome(self):
+        """Test if a tracked call aggregates its annotations and usage."""
+        @metrics.tracked("ranking")
+        def rank():
+            metrics.annotate(cache="miss")
+            metrics.record_usage(SimpleNamespace(usage=SimpleNamespace(prompt_tokens=120, completion_tokens=30)))
+            metrics.annotate(fallback=True, error="timeout")
+            return []
+
+        rank()
+        snapshot = metrics.snapshot()
+
+        self.assertEqual(snapshot["cinemood_calls_total"], {"operation=ranking,outcome=fallback": 1})
+        self.assertEqual(snapshot["cinemood_tokens_total"], {
+            "operation=ranking,type=prompt": 120,
+            "operation=ranking,type=completion": 30,
+        })
+        self.assertEqual(snapshot["cinemood_cache_lookups_total"], {"operation=ranking,result=miss": 1})
+        self.assertEqual(snapshot["cinemood_fallbacks_total"], {"operation=ranking": 1})
+
+    def test_exceptions_are_recorded_as_errors(self):
+        """Test if a call raising an exception is counted with the "error" outcome."""
+        @metrics.tracked("fetch")
+        def fetch():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            fetch()
+        self.assertEqual(metrics.snapshot()["cinemood_calls_total"], {"operation=fetch,outcome=error": 1})
+
+    def test_generator_annotations_do_not_leak(self):
+        """Test if a tracked generator's event is only current while the generator body runs."""
+        @metrics.tracked("stream")
+        def stream():
+            metrics.annotate(cache="miss")
+            yield 1
+            yield 2
+
+        iterator = stream()
+        next(iterator)
+        self.assertIsNone(metrics.current_event())
+        self.assertEqual(list(iterator), [2])
+        self.assertEqual(metrics.snapshot()["cinemood_cache_lookups_total"], {"operation=stream,result=miss": 1})
+
+    def test_prometheus_export(self):
+        """Test if counters and histograms are rendered and written to the metrics file."""
+        with metrics.track("detect_mood") as event:
+            event["retries"] = 2
+
+        text = metrics.render_prometheus()
+        self.assertIn('cinemood_calls_total{operation="detect_mood",outcome="ok"} 1', text)
+        self.assertIn('cinemood_retries_total{operation="detect_mood"} 2', text)
+        self.assertIn('cinemood_call_duration_seconds_count{operation="detect_mood"} 1', text)
+
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "cinemood.prom")
+            metrics.write_metrics_file(path)
+            with open(path, "r", encoding="utf-8") as f:
+                self.assertEqual(f.read(), text)
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from mood_lexicon import find_moods, get_stats, match_moods, stem
+from moods import MOOD_TO_FAMILY
+
+
+class TestMoodLexicon(unittest.TestCase):
+
+    def test_stem(self):
+        """Test if inflected forms share the stem of the vocabulary word."""
+        self.assertEqual(stem("stressful"), stem("stressed"))
+        self.assertEqual(stem("happiness"), stem("happy"))
+        self.assertEqual(stem("anxiety"), stem("anxious"))
+        self.assertEqual(stem("hopelessness"), stem("hopeless"))
+
+    def test_match_explicit_moods(self):
+        """Test if explicitly named moods are returned as a detect_mood triple."""
+        final_moods, extracted_words, detected_moods = match_moods("I'm tired and stressed")
+        self.assertEqual(detected_moods, ["tired", "stressed"])
+        self.assertEqual(extracted_words, ["tired", "stressed"])
+        self.assertEqual(len(final_moods), 3)
+        self.assertEqual(final_moods[:2], ["tired", "stressed"])
+        self.assertTrue(all(mood in MOOD_TO_FAMILY for mood in final_moods))
+
+    def test_match_phrases(self):
+        """Test if multi-word moods are matched as phrases."""
+        self.assertEqual(find_moods("Honestly grossed out")[0][0], "grossed out")
+        self.assertEqual(find_moods("I'm deep in thought today")[0][0], "deep in thought")
+
+    def test_unconfident_inputs_fall_back(self):
+        """Test if negated, ambiguous or mood-free inputs are left to the LLM."""
+        self.assertIsNone(match_moods("I'm not happy at all"))
+        self.assertIsNone(match_moods("I don't feel excited"))
+        self.assertIsNone(match_moods("The content was great"))
+        self.assertIsNone(match_moods("What time is it?"))
+        self.assertIsNotNone(match_moods("Not sure why, but I'm excited"))
+
+    def test_trailing_negations_and_hedges_fall_back(self):
+        """Test if a negation or hedge after the mood word in the same clause is left to the LLM."""
+        for text in ("so happy but not really", "I'm happy, not at all", "am I happy or not",
+                     "I'm so tired, maybe", "I'm tired and I don't know why"):
+            with self.subTest(text=text):
+                self.assertIsNone(match_moods(text))
+        self.assertEqual(match_moods("I'm so happy. Nothing else to say")[2], ["happy"])
+
+    def test_moods_must_be_the_users_feelings(self):
+        """Test if mood words without a feeling cue, words that only stem like moods and questions fall back."""
+        for text in ("I thought it was Tuesday", "lovely weather today", "I love pizza",
+                     "I need a calm place to park", "Is this movie boring?", "Are you happy?"):
+            with self.subTest(text=text):
+                self.assertIsNone(match_moods(text))
+        self.assertEqual(match_moods("Feeling calm")[2], ["calm"])
+        self.assertEqual(match_moods("I've been so bored")[2], ["bored"])
+        self.assertEqual(match_moods("tired and stressed")[2], ["tired", "stressed"])
+
+    def test_stats(self):
+        """Test if the hit/miss counters are updated."""
+        before = get_stats()
+        match_moods("So happy!")
+        match_moods("What time is it?")
+        after = get_stats()
+        self.assertEqual(after["hits"], before["hits"] + 1)
+        self.assertEqual(after["misses"], before["misses"] + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
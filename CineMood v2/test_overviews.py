@@ -0,0 +1,113 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+from collections import OrderedDict
+from unittest.mock import MagicMock, patch
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import backends  # noqa: E402
+import llm  # noqa: E402
+import overviews  # noqa: E402
+from cache import JsonCache  # noqa: E402
+from prompts import count_tokens  # noqa: E402
+
+LONG_OVERVIEW = (
+    "A grieving widow moves to a quiet seaside town to start over. "
+    "There she befriends a lonely fisherman who hides a painful secret from his past. "
+    "As storms batter the coast all winter, the two slowly learn to trust each other, "
+    "while the villagers gossip, a long-lost daughter returns and an old shipwreck resurfaces."
+)
+
+MOVIES = [
+    {"id": 1, "title": "Salt and Grief", "overview": LONG_OVERVIEW, "release_date": "2024-01-01"},
+    {"id": 2, "title": "Laugh Out Loud", "overview": "A funny comedy about friends throwing a wild party.",
+     "release_date": "2024-01-01"},
+]
+
+
+class TestOverviews(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        for patcher in (
+            patch.object(overviews, "summaries", JsonCache("overview_summaries", cache_dir=self.cache_dir)),
+            patch.object(overviews, "_compressed", OrderedDict()),
+            patch("overviews.OVERVIEW_TOKENS", 30),
+            patch("overviews.RANKING_PROMPT_TOKENS", 0),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_truncate(self):
+        """Test if truncation keeps whole leading sentences, or the leading words of a too long first sentence."""
+        two_sentences = ("A grieving widow moves to a quiet seaside town to start over. "
+                         "There she befriends a lonely fisherman who hides a painful secret from his past.")
+        self.assertEqual(overviews.truncate(LONG_OVERVIEW, count_tokens(two_sentences) + 5), two_sentences)
+        shortened = overviews.truncate(LONG_OVERVIEW, 8)
+        self.assertTrue(shortened.startswith("A grieving widow") and shortened.endswith("…"))
+        self.assertLessEqual(count_tokens(shortened), 8)
+        self.assertEqual(overviews.truncate(LONG_OVERVIEW, 0), LONG_OVERVIEW)
+
+    def test_compress_movies_within_prompt_budget(self):
+        """Test if the candidates' overviews share the prompt budget, and are compressed once per movie and week."""
+        with patch("overviews.RANKING_PROMPT_TOKENS", 40), \
+                patch("overviews.truncate", wraps=overviews.truncate) as mock_truncate:
+            compressed = overviews.compress_movies(MOVIES)
+            self.assertEqual(overviews.compress_movies(MOVIES), compressed)
+        self.assertEqual(mock_truncate.call_count, 2)
+
+        listing = "\n".join(f"{i + 1}. {movie['title']}: {movie['overview']}" for i, movie in enumerate(compressed))
+        self.assertLessEqual(count_tokens(listing), 40)
+        self.assertEqual(MOVIES[0]["overview"], LONG_OVERVIEW)
+
+        with patch("overviews.OVERVIEW_COMPRESSION", "full"):
+            self.assertIs(overviews.compress_movies(MOVIES), MOVIES)
+
+    @patch("overviews.OVERVIEW_COMPRESSION", "llm")
+    def test_summaries(self):
+        """Test if summaries are written once per movie and week, and used in place of the overviews."""
+        week = datetime.date(2026, 10, 12)
+        summarizer = MagicMock(return_value=["A widow and a fisherman heal together by the sea.", None])
+
+        self.assertEqual(overviews.summarize(MOVIES, summarizer, week), 1)
+        self.assertEqual(overviews.summarize(MOVIES[:1], summarizer, week), 0)
+        summarizer.assert_called_once_with(MOVIES)
+
+        self.assertEqual(overviews.compress(MOVIES[0], 30, week), "A widow and a fisherman heal together by the sea.")
+        self.assertEqual(overviews.compress(MOVIES[1], 30, week), MOVIES[1]["overview"])
+        self.assertNotEqual(overviews.compress(MOVIES[0], 30, week + datetime.timedelta(days=7)),
+                            "A widow and a fisherman heal together by the sea.")
+
+    def test_ranking_cache_key_depends_on_compression(self):
+        """Test if rankings made with other compression settings are cached under other keys."""
+        key = llm.ranking_cache_key(["sad", "lonely"], MOVIES, 15)
+        for name, value in (("OVERVIEW_COMPRESSION", "full"), ("OVERVIEW_TOKENS", 60), ("RANKING_PROMPT_TOKENS", 500)):
+            with patch(f"overviews.{name}", value):
+                self.assertNotEqual(llm.ranking_cache_key(["sad", "lonely"], MOVIES, 15), key)
+        self.assertEqual(llm.ranking_cache_key(["lonely", "sad"], MOVIES, 15), key)
+        self.assertTrue(key.endswith("|15|lonely+sad"))
+
+    def test_ranking_prompt_uses_compressed_overviews(self):
+        """Test if ranking prompts are built from compressed overviews (local backend, also used to summarize)."""
+        local = backends.create_backend("local")
+        with patch("overviews.OVERVIEW_TOKENS", count_tokens(LONG_OVERVIEW) - 10), patch.dict(llm.routes, rank=local), \
+                patch("llm.ranking_cache.get", return_value=None), patch("llm.ranking_cache.set"), \
+                patch("llm.complete", wraps=llm.complete) as mock_complete:
+            movies = llm.get_movies_by_mood(["sad", "lonely"], MOVIES)
+            summaries = llm.summarize_overviews(MOVIES)
+
+        self.assertEqual(movies[0]["title"], "Salt and Grief")
+        self.assertEqual(movies[0]["overview"], LONG_OVERVIEW)
+        prompt = mock_complete.call_args_list[0].args[1][-1]["content"]
+        self.assertIn("painful secret from his past.", prompt)
+        self.assertNotIn("shipwreck", prompt)
+        self.assertEqual(summaries[1], MOVIES[1]["overview"])
+        self.assertNotIn("shipwreck", summaries[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,225 @@
+import asyncio
+import os
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from pipeline import (  # noqa: E402
+    prepare_recommendation, rank_recommendation, recommend, recommend_async, stream_recommendation
+)
+
+MOVIES = [
+    {"title": f"Movie {i}", "overview": f"Overview of Movie {i}.", "release_date": "2024-02-15", "poster": None}
+    for i in range(60)
+]
+
+
+def slow(value, seconds=0.2):
+    """Builds a fake stage that sleeps `seconds` before returning `value`."""
+
+    def stage(*args, **kwargs):
+        time.sleep(seconds)
+        return value
+
+    return stage
+
+
+def slow_async(value, seconds=0.2):
+    """Builds a fake async stage that sleeps `seconds` before returning `value`."""
+
+    async def stage(*args, **kwargs):
+        await asyncio.sleep(seconds)
+        return value
+
+    return stage
+
+
+class TestPipeline(unittest.TestCase):
+
+    @patch("pipeline.get_movies_by_mood", return_value=MOVIES[:3])
+    @patch("pipeline.fetch_movies", side_effect=slow(MOVIES))
+    @patch("pipeline.detect_mood", side_effect=slow((["happy", "joyful", "content"], ["happy"], ["happy"])))
+    def test_detection_and_fetch_overlap(self, mock_detect_mood, mock_fetch_movies, mock_get_movies_by_mood):
+        """Test if mood detection and catalog retrieval run concurrently."""
+        result = recommend("I feel so happy today!")
+
+        self.assertEqual(result["status"], "ok")
+        self.assertEqual(result["recommendations"], MOVIES[:3])
+        mock_get_movies_by_mood.assert_called_once_with(["happy", "joyful", "content"], MOVIES)
+        self.assertLess(result["timings"]["total"], 0.35, "Detection and fetch should not run in series")
+        for stage in ("detect", "fetch", "rank", "total"):
+            self.assertIn(stage, result["timings"])
+        self.assertEqual(result["tier"], "llm")
+
+    @patch("pipeline.get_movies_by_mood")
+    @patch("pipeline.fetch_movies", side_effect=slow(MOVIES))
+    @patch("pipeline.detect_mood", return_value=(["invalid"], [], []))
+    def test_invalid_input_cancels_fetch(self, mock_detect_mood, mock_fetch_movies, mock_get_movies_by_mood):
+        """Test if invalid input returns without waiting for the catalog and signals cancellation."""
+        result = recommend("What time is it?")
+
+        self.assertEqual(result["status"], "invalid")
+        self.assertEqual(result["recommendations"], [])
+        self.assertLess(result["timings"]["total"], 0.15)
+        mock_get_movies_by_mood.assert_not_called()
+        if mock_fetch_movies.called:
+            self.assertTrue(mock_fetch_movies.call_args.kwargs["cancel_event"].is_set())
+
+    @patch("pipeline.get_movies_by_mood", return_value=MOVIES[:3])
+    @patch("pipeline.fetch_movies", return_value=MOVIES)
+    @patch("pipeline.detect_mood")
+    def test_neutral_moods(self, mock_detect_mood, mock_fetch_movies, mock_get_movies_by_mood):
+        """Test if neutral moods are matched by extracted words, or fall back to trending movies."""
+        mock_detect_mood.return_value = (["neutral", "neutral", "neutral"], ["rainy", "sunday"], [])
+        recommend("A rainy sunday")
+        mock_get_movies_by_mood.assert_called_once_with(["rainy", "sunday"], MOVIES)
+
+        mock_detect_mood.return_value = (["neutral", "neutral", "neutral"], [], [])
+        result = recommend("Hmm")
+        self.assertEqual(result["status"], "neutral")
+        self.assertEqual(result["recommendations"], MOVIES[:3])
+        self.assertEqual(result["tiers"], {"detect": "llm", "rank": "trending"})
+
+    @patch("pipeline.stream_movies_by_mood", return_value=iter(MOVIES[:3]))
+    @patch("pipeline.fetch_movies", return_value=MOVIES)
+    @patch("pipeline.detect_mood", return_value=(["happy", "joyful", "content"], ["happy"], ["happy"]))
+    def test_stream_recommendation(self, mock_detect_mood, mock_fetch_movies, mock_stream_movies_by_mood):
+        """Test if streamed recommendations are collected with time-to-first-movie timings."""
+        result = prepare_recommendation("I feel so happy today!")
+
+        self.assertEqual(list(stream_recommendation(result)), MOVIES[:3])
+        self.assertEqual(result["recommendations"], MOVIES[:3])
+        self.assertIn("first_movie", result["timings"])
+        self.assertIn("rank", result["timings"])
+
+    @patch("pipeline.get_movies_by_mood_async", side_effect=slow_async(MOVIES[:3], 0))
+    @patch("pipeline.fetch_movies", side_effect=slow(MOVIES))
+    @patch("pipeline.detect_mood_async", side_effect=slow_async((["happy", "joyful", "content"], ["happy"], ["happy"])))
+    def test_async_pipeline(self, mock_detect_mood, mock_fetch_movies, mock_get_movies_by_mood):
+        """Test if the async pipeline overlaps detection with the fetch, and skips the fetch for a given catalog."""
+        result = asyncio.run(recommend_async("I feel so happy today!"))
+
+        self.assertEqual(result["status"], "ok")
+        self.assertEqual(result["recommendations"], MOVIES[:3])
+        self.assertLess(result["timings"]["total"], 0.35, "Detection and fetch should not run in series")
+
+        result = asyncio.run(recommend_async("I feel so happy today!", movies=MOVIES[:10]))
+        self.assertEqual(mock_fetch_movies.call_count, 1)
+        mock_get_movies_by_mood.assert_called_with(["happy", "joyful", "content"], MOVIES[:10])
+
+
+CATALOG = [
+    {"title": "Laugh Out Loud", "overview": "A funny comedy about friends throwing a wild party.",
+     "release_date": "2024-01-01", "poster": None},
+    {"title": "Goodbye Summer", "overview": "A sad story of grief, loss and tears after a farewell.",
+     "release_date": "2024-01-01", "poster": None},
+    {"title": "Final Mission", "overview": "An elite team races against time on an explosive heist.",
+     "release_date": "2024-01-01", "poster": None},
+    {"title": "Rainy Days", "overview": "A quiet rainy weekend in a small town.",
+     "release_date": "2024-01-01", "poster": None},
+]
+
+
+class TestDeadline(unittest.TestCase):
+
+    @patch("pipeline.get_movies_by_mood", return_value=CATALOG[:3])
+    @patch("pipeline.fetch_movies", return_value=CATALOG)
+    @patch("pipeline.detect_mood", side_effect=slow((["happy", "joyful", "content"], ["happy"], ["happy"]), 0.5))
+    def test_slow_detection_falls_back_to_lexicon(self, mock_detect_mood, mock_fetch_movies, mock_get_movies_by_mood):
+        """Test if detection overrunning its share of the deadline is replaced by lexical matching."""
+        result = recommend("I feel so sad today", deadline=0.4)
+
+        self.assertEqual(result["tiers"], {"detect": "lexicon", "rank": "llm"})
+        self.assertEqual(result["tier"], "lexicon")
+        self.assertIn("sad", result["moods"])
+        self.assertEqual(result["recommendations"], CATALOG[:3])
+        self.assertLess(result["timings"]["total"], 0.35)
+
+    @patch("pipeline.get_movies_by_mood", side_effect=slow(CATALOG[:3], 0.5))
+    @patch("pipeline.fetch_movies", return_value=CATALOG)
+    @patch("pipeline.detect_mood", return_value=(["sad", "heartbroken", "sorrowful"], ["sad"], ["sad"]))
+    def test_slow_ranking_falls_back_to_local(self, mock_detect_mood, mock_fetch_movies, mock_get_movies_by_mood):
+        """Test if GPT ranking overrunning the deadline is replaced by the local ranking, and no time means trending."""
+        result = recommend("I feel so sad today", deadline=0.2)
+
+        self.assertEqual(result["tiers"], {"detect": "llm", "rank": "local"})
+        self.assertEqual(result["recommendations"][0]["title"], "Goodbye Summer")
+        self.assertEqual(result["recommendations"][0]["match_reason"], "A strong match for feeling sad.")
+        self.assertLess(result["timings"]["total"], 0.35)
+
+        result = prepare_recommendation("I feel so sad today", deadline=0.2)
+        result["deadline_at"] = time.perf_counter()
+        self.assertEqual(rank_recommendation(result)["tier"], "trending")
+        self.assertEqual(result["recommendations"], CATALOG[:3])
+
+    @patch("pipeline.fetch_movies", return_value=CATALOG)
+    @patch("pipeline.detect_mood", return_value=(["sad", "heartbroken", "sorrowful"], ["sad"], ["sad"]))
+    def test_stream_completed_locally(self, mock_detect_mood, mock_fetch_movies):
+        """Test if movies GPT has not streamed by the deadline are completed by the local ranking."""
+
+        def stream(mood_words, movies):
+            yield dict(CATALOG[1], match_reason="GPT reason.")
+            time.sleep(0.5)
+            yield dict(CATALOG[0], match_reason="Too late.")
+
+        with patch("pipeline.stream_movies_by_mood", side_effect=stream):
+            result = prepare_recommendation("I feel so sad today", deadline=0.2)
+            movies = list(stream_recommendation(result))
+
+        self.assertEqual(movies[0]["match_reason"], "GPT reason.")
+        self.assertEqual(len(movies), 3)
+        self.assertEqual(len({movie["title"] for movie in movies}), 3)
+        self.assertEqual(result["tiers"]["rank"], "local")
+
+    @patch("pipeline.get_movies_by_mood_async", side_effect=slow_async(CATALOG[:3], 0.5))
+    @patch("pipeline.fetch_movies", return_value=CATALOG)
+    @patch("pipeline.detect_mood_async", side_effect=slow_async((["happy", "joyful", "content"], [], ["happy"]), 0.5))
+    def test_async_deadline(self, mock_detect_mood, mock_fetch_movies, mock_get_movies_by_mood):
+        """Test if the async pipeline degrades both stages within the deadline."""
+        result = asyncio.run(recommend_async("A rainy weekend", deadline=0.3))
+
+        self.assertEqual(result["tiers"], {"detect": "lexicon", "rank": "local"})
+        self.assertEqual(result["recommendations"][0]["title"], "Rainy Days")
+        self.assertLess(result["timings"]["total"], 0.45)
+
+    @patch("pipeline.get_movies_by_mood", side_effect=slow(CATALOG[:3], 0.6))
+    @patch("pipeline.fetch_movies", return_value=CATALOG)
+    @patch("pipeline.detect_mood", side_effect=slow((["sad", "heartbroken", "sorrowful"], ["sad"], ["sad"]), 0.6))
+    def test_saturated_stages_keep_the_deadline(self, mock_detect_mood, mock_fetch_movies, mock_get_movies_by_mood):
+        """Test if more concurrent requests than pipeline threads, all with slow GPT stages, meet the deadline."""
+        executor = ThreadPoolExecutor(max_workers=2)
+        stage_executor = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(stage_executor.shutdown)
+        self.addCleanup(executor.shutdown)
+        with patch("pipeline._executor", executor), patch("pipeline._stage_executor", stage_executor), \
+                ThreadPoolExecutor(max_workers=6) as clients:
+            results = list(clients.map(lambda _: recommend("I feel so sad today", deadline=0.3), range(6)))
+
+        for result in results:
+            self.assertLess(result["timings"]["total"], 0.45)
+            self.assertEqual(len(result["recommendations"]), 3)
+        self.assertLessEqual(mock_detect_mood.call_count + mock_get_movies_by_mood.call_count, 4)
+
+    @patch("pipeline.stored_movies", return_value=CATALOG[:2])
+    @patch("pipeline.get_movies_by_mood", return_value=CATALOG[:1])
+    @patch("pipeline.fetch_movies", side_effect=slow(CATALOG, 0.6))
+    @patch("pipeline.detect_mood_async", side_effect=slow_async((["sad", "heartbroken", "sorrowful"], [], ["sad"]), 0))
+    @patch("pipeline.detect_mood", return_value=(["sad", "heartbroken", "sorrowful"], ["sad"], ["sad"]))
+    def test_slow_catalog_falls_back_to_stored_pages(self, mock_detect_mood, mock_detect_mood_async,
+                                                     mock_fetch_movies, mock_get_movies_by_mood, mock_stored_movies):
+        """Test if a catalog fetch overrunning the deadline is replaced by the stored pages (sync and async)."""
+        result = recommend("I feel so sad today", deadline=0.2)
+        self.assertEqual(result["movies"], CATALOG[:2])
+        self.assertEqual(result["tier"], "trending")
+        self.assertLess(result["timings"]["total"], 0.35)
+
+        result = asyncio.run(recommend_async("I feel so sad today", deadline=0.2))
+        self.assertEqual(result["movies"], CATALOG[:2])
+        self.assertLess(result["timings"]["total"], 0.35)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from io import BytesIO
+from unittest.mock import MagicMock, patch
+
+from PIL import Image
+
+import posters
+
+
+def poster_bytes(width=500, height=750):
+    """Builds a fake w500 TMDB poster."""
+    buffer = BytesIO()
+    Image.new("RGB", (width, height), "navy").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def fake_session(error=None):
+    """Builds a fake session returning a poster, or raising `error`."""
+    session = MagicMock()
+    if error is not None:
+        session.get.side_effect = error
+    else:
+        session.get.return_value.content = poster_bytes()
+    return session
+
+
+class TestPosters(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        patcher = patch("posters.POSTER_CACHE_DIR", self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+    def test_thumbnails_are_cached_per_width(self):
+        """Test if a poster is downloaded once and resized for each display width (at the pixel ratio)."""
+        session = fake_session()
+        with patch("posters.get_session", return_value=session), patch("posters.POSTER_PIXEL_RATIO", 2):
+            path = posters.cache_poster("/abc.jpg", width=200)
+            self.assertEqual(posters.cache_poster("/abc.jpg", width=200), path)
+            small_path = posters.cache_poster("/abc.jpg", width=100)
+
+        self.assertEqual(session.get.call_count, 1)
+        self.assertIn("/w500/abc.jpg", session.get.call_args.args[0])
+        with Image.open(path) as image:
+            self.assertEqual(image.size, (400, 600))
+        with Image.open(small_path) as image:
+            self.assertEqual(image.size, (200, 300))
+
+    def test_missing_or_failed_posters(self):
+        """Test if missing, unsafe or unreachable posters return None (so the app falls back to the URL)."""
+        self.assertIsNone(posters.poster_image(None))
+        self.assertIsNone(posters.poster_image("/../secret"))
+
+        offline = fake_session(posters.requests.exceptions.ConnectionError("offline"))
+        with patch("posters.get_session", return_value=offline):
+            self.assertIsNone(posters.cache_poster("/abc.jpg"))
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_renders_do_not_wait_for_downloads(self):
+        """Test if a missing poster is queued for a background download instead of blocking the render."""
+        released = threading.Event()
+        session = fake_session()
+        response = session.get.return_value
+        session.get.side_effect = lambda *args, **kwargs: released.wait(5) and response
+
+        with patch("posters.get_session", return_value=session):
+            start = time.perf_counter()
+            self.assertIsNone(posters.poster_image("/abc.jpg", width=200))
+            self.assertIsNone(posters.poster_image("/abc.jpg", width=200))
+            self.assertLess(time.perf_counter() - start, 1)
+            (future,) = posters._queued.values()
+
+            released.set()
+            future.result(timeout=5)
+            path = posters.poster_image("/abc.jpg", width=200)
+
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(session.get.call_count, 1)
+        self.assertEqual(posters._queued, {})
+
+    def test_prune(self):
+        """Test if posters unused for the TTL are deleted first, then the least recently used beyond the budget."""
+        now = time.time()
+        for name, age_days in (("old.jpg", 40), ("a.jpg", 3), ("b.jpg", 2), ("c.jpg", 1)):
+            path = os.path.join(self.cache_dir, "400", name)
+            posters._write_atomic(path, b"x" * 1000)
+            os.utime(path, (now - age_days * 86400, now - age_days * 86400))
+
+        self.assertEqual(posters.prune(max_mb=0, ttl=30 * 86400), 1)
+        self.assertEqual(posters.prune(max_mb=0.002, ttl=0), 1)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.cache_dir, "400"))), ["b.jpg", "c.jpg"])
+
+    def test_prefetch(self):
+        """Test if prefetching downloads every distinct poster once."""
+        session = fake_session()
+        movies = [{"poster_path": "/a.jpg"}, {"poster_path": "/b.jpg"}, {"poster_path": "/a.jpg"},
+                  {"poster_path": None}]
+        with patch("posters.get_session", return_value=session):
+            posters.prefetch(movies, width=200)
+
+        self.assertEqual(session.get.call_count, 2)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.cache_dir, "source"))), ["a.jpg", "b.jpg"])
+
+
+if __name__ == "__main__":
+    unittest.main()
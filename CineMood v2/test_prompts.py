@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from prompts import MOOD_VOCABULARY, detect_mood_messages, prompt_stats, ranking_messages
+
+
+class TestPrompts(unittest.TestCase):
+
+    def test_static_prefix_is_identical_across_processes(self):
+        """Test if the vocabulary string does not depend on the process's hash seed."""
+        code = "import prompts; print(prompts.MOOD_VOCABULARY)"
+        outputs = set()
+        for seed in ("1", "2", "3"):
+            env = dict(os.environ, PYTHONHASHSEED=seed)
+            outputs.add(subprocess.run(
+                [sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True,
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+            ).stdout)
+        self.assertEqual(outputs, {MOOD_VOCABULARY + "\n"})
+
+    def test_user_text_is_placed_once_at_the_end(self):
+        """Test if request-specific text only appears in the final user message."""
+        messages = detect_mood_messages("I feel strangely calm")
+        self.assertEqual([message["role"] for message in messages], ["system", "user"])
+        self.assertNotIn("strangely", messages[0]["content"])
+        self.assertEqual(messages[-1]["content"], "I feel strangely calm")
+        self.assertEqual(detect_mood_messages("Something else")[0], messages[0])
+
+    def test_prompt_stats(self):
+        """Test if token counts cover the whole prompt and its static prefix."""
+        movies = [{"title": f"Movie {i}", "overview": "A long overview. " * 20} for i in range(10)]
+        stats = prompt_stats(ranking_messages(["happy"], movies))
+        self.assertGreater(stats["prompt_tokens"], stats["static_prefix_tokens"])
+        other_stats = prompt_stats(ranking_messages(["sad"], movies[:2]))
+        self.assertEqual(stats["static_prefix_tokens"], other_stats["static_prefix_tokens"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import unittest
+from collections import OrderedDict
+from unittest.mock import patch
+
+import numpy as np
+
+import retrieval
+from retrieval import get_index, rank_movies, tokenize, top_indices
+from tmdb_api import catalog_version
+
+
+def make_movie(title, overview):
+    """Builds a fake catalog movie."""
+    return {"title": title, "overview": overview, "release_date": "2024-01-01"}
+
+
+MOVIES = [
+    make_movie("Laugh Out Loud", "A funny comedy about friends throwing a wild party."),
+    make_movie("The Haunting", "A family moves into a haunted house where a demon waits."),
+    make_movie("Hearts Apart", "Two lovers fall in love during a summer romance."),
+    make_movie("Final Mission", "An elite team races against time on an explosive heist."),
+]
+
+
+class TestRetrieval(unittest.TestCase):
+
+    def test_tokenize(self):
+        """Test if tokenize lowercases text and drops stop words."""
+        self.assertEqual(tokenize("The Lovers fall in LOVE!"), ["lovers", "fall", "love"])
+
+    def test_rank_movies_by_mood(self):
+        """Test if mood words are matched against overviews through their family keywords."""
+        self.assertEqual(rank_movies(["terrified"], MOVIES, 1), [1])
+        self.assertEqual(rank_movies(["romantic"], MOVIES, 1), [2])
+        self.assertEqual(rank_movies(["cheerful"], MOVIES, 1), [0])
+        self.assertEqual(rank_movies(["pumped"], MOVIES, 1), [3])
+
+    def test_rank_movies_keeps_catalog_order_without_matches(self):
+        """Test if unmatched queries fall back to the catalog order."""
+        self.assertEqual(rank_movies(["xyzzy"], MOVIES, 3), [0, 1, 2])
+
+    def test_index_is_built_once_per_catalog(self):
+        """Test if the index is reused for the same catalog content."""
+        self.assertIs(get_index(MOVIES), get_index([dict(movie) for movie in MOVIES]))
+
+    def test_top_indices_match_a_stable_sort(self):
+        """Test if the partial top-k selection returns the same indices as a full stable sort, ties included."""
+        scores = np.round(np.random.default_rng(3).random(500), 1).astype(np.float32)
+        for k in (1, 7, 50, 499, 500, 600):
+            self.assertEqual(list(top_indices(scores, k)), list(np.argsort(-scores, kind="stable")[:k]))
+
+    def test_large_catalog_index_is_stored(self):
+        """Test if indexes of large catalogs are stored on disk and loaded by other processes instead of rebuilt."""
+        index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, index_dir)
+        with patch("retrieval.VECTOR_INDEX_DIR", index_dir), patch("retrieval.VECTOR_INDEX_MIN_MOVIES", 4), \
+                patch.object(retrieval, "_indexes", OrderedDict()):
+            ranking = rank_movies(["romantic"], MOVIES, 2)
+            self.assertTrue(os.path.exists(retrieval.index_path(catalog_version(MOVIES))))
+
+        # ✅ A fresh process loads the stored index
+        with patch("retrieval.VECTOR_INDEX_DIR", index_dir), patch("retrieval.VECTOR_INDEX_MIN_MOVIES", 4), \
+                patch.object(retrieval, "_indexes", OrderedDict()), \
+                patch("retrieval.build_index", side_effect=AssertionError("rebuilt")):
+            self.assertEqual(rank_movies(["romantic"], MOVIES, 2), ranking)
+            loaded = get_index(MOVIES)
+
+        built = retrieval.build_index(MOVIES)
+        self.assertEqual(loaded["vocabulary"], built["vocabulary"])
+        np.testing.assert_array_equal(loaded["weights"], built["weights"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_concurrent_threads_share_one_call(self):
+        """Test if concurrent threaded calls with the same key run the function once and get copies."""
+        flight = SingleFlight()
+        calls = []
+
+        def slow_lookup(key):
+            calls.append(key)
+            time.sleep(0.2)
+            return [key]
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            results = list(executor.map(lambda _: flight.do("happy", slow_lookup, "happy"), range(5)))
+
+        self.assertEqual(calls, ["happy"])
+        self.assertEqual(results, [["happy"]] * 5)
+        self.assertEqual(len({id(result) for result in results}), 5, "Every caller should get its own copy")
+        self.assertEqual(flight.shared, 4)
+
+        # ✅ Nothing is cached once the call has finished
+        flight.do("happy", slow_lookup, "happy")
+        self.assertEqual(len(calls), 2)
+
+    def test_exceptions_reach_every_waiting_thread(self):
+        """Test if an exception raised by the shared call is raised in all coalesced callers."""
+        flight = SingleFlight()
+        started = threading.Event()
+
+        def failing():
+            started.set()
+            time.sleep(0.1)
+            raise ValueError("boom")
+
+        def call():
+            try:
+                flight.do("key", failing)
+            except ValueError as e:
+                return str(e)
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            leader = executor.submit(call)
+            started.wait()
+            followers = [executor.submit(call) for _ in range(2)]
+            self.assertEqual([future.result() for future in [leader] + followers], ["boom"] * 3)
+
+    def test_async_tasks_share_one_call(self):
+        """Test if concurrent tasks share one coroutine, and a cancelled waiter does not cancel it."""
+        flight = SingleFlight()
+        calls = []
+
+        async def slow_lookup(key):
+            calls.append(key)
+            await asyncio.sleep(0.1)
+            return {"moods": [key]}
+
+        async def main():
+            tasks = [asyncio.ensure_future(flight.do_async("sad", slow_lookup, "sad")) for _ in range(4)]
+            await asyncio.sleep(0.01)
+            tasks[0].cancel()
+            return await asyncio.gather(*tasks[1:])
+
+        results = asyncio.run(main())
+        self.assertEqual(calls, ["sad"])
+        self.assertEqual(results, [{"moods": ["sad"]}] * 3)
+
+    def test_disabled(self):
+        """Test if a disabled instance runs every call."""
+        flight = SingleFlight(enabled=False)
+        calls = []
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            list(executor.map(lambda _: flight.do("key", lambda: calls.append(1) or time.sleep(0.05)), range(3)))
+        self.assertEqual(len(calls), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,210 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import tmdb_api
+from catalog_store import CatalogStore
+from tmdb_api import fetch_movies
+
+
+def make_page(page, count=20, popularity=1.0):
+    """Builds a fake TMDB trending page with `count` valid movies."""
+    return {
+        "results": [
+            {
+                "id": page * 100 + i,
+                "title": f"Movie {page}-{i}",
+                "overview": f"Overview of movie {page}-{i}.",
+                "poster_path": f"/poster_{page}_{i}.jpg",
+                "release_date": f"2020-01-{(i % 28) + 1:02d}",
+                "popularity": popularity,
+            }
+            for i in range(count)
+        ]
+    }
+
+
+def fake_get(url, **kwargs):
+    """Returns a response for the page requested in `url`."""
+    page = int(url.rsplit("page=", 1)[1])
+    response = MagicMock()
+    response.json.return_value = make_page(page)
+    return response
+
+
+def library_get(url, **kwargs):
+    """Returns a page of a 3-page list; the popular list repeats the trending movies shifted by one page."""
+    page = int(url.rsplit("page=", 1)[1])
+    response = MagicMock()
+    response.json.return_value = dict(make_page(page + 1 if "/movie/popular" in url else page), total_pages=3)
+    return response
+
+
+def fake_session(get):
+    """Builds a fake pooled session whose `get` is `get`."""
+    session = MagicMock()
+    session.get.side_effect = get
+    return session
+
+
+class TestTMDBAPI(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.cache_dir, "catalog.sqlite3")
+        self.cache_patch = patch.object(tmdb_api, "catalog_store", CatalogStore(self.db_path))
+        self.cache_patch.start()
+
+    def tearDown(self):
+        self.cache_patch.stop()
+        shutil.rmtree(self.cache_dir)
+
+    def test_fetch_movies(self):
+        """Test if fetch_movies returns valid movies sorted by release date."""
+        with patch("tmdb_api.get_session", return_value=fake_session(fake_get)):
+            movies = fetch_movies(max_movies=60)
+
+        self.assertEqual(len(movies), 60, f"Expected 60 movies, but got {len(movies)}")
+        release_dates = [movie["release_date"] for movie in movies]
+        self.assertEqual(release_dates, sorted(release_dates, reverse=True), "Movies are not sorted by release date")
+        for movie in movies:
+            self.assertTrue(movie["title"] and movie["overview"], "Invalid movie data")
+
+    def test_catalog_is_cached_per_week(self):
+        """Test if the catalog is fetched once per week and shared through the catalog store."""
+        session = fake_session(fake_get)
+        mock_get = session.get
+        patcher = patch("tmdb_api.get_session", return_value=session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        first_movies = fetch_movies(max_movies=60)
+        calls = mock_get.call_count
+
+        # A new store instance simulates another process reading the same database
+        with patch.object(tmdb_api, "catalog_store", CatalogStore(self.db_path)):
+            second_movies = fetch_movies(max_movies=60)
+
+        self.assertEqual(mock_get.call_count, calls, "Cached catalog should not hit TMDB again")
+        self.assertEqual(first_movies, second_movies)
+
+        # ✅ Callers get copies, so mutating a result does not change the cache
+        second_movies[0]["match_reason"] = "changed"
+        self.assertNotIn("match_reason", fetch_movies(max_movies=60)[0])
+
+        # ✅ Monday rollover invalidates the cached catalog
+        next_week = tmdb_api.get_first_day_of_week() + datetime.timedelta(days=7)
+        with patch("tmdb_api.get_first_day_of_week", return_value=next_week):
+            fetch_movies(max_movies=60)
+        self.assertGreater(mock_get.call_count, calls, "A new week should fetch a new catalog")
+
+    @patch("tmdb_api.get_session")
+    def test_failed_fetch_is_not_cached(self, mock_get_session):
+        """Test if a catalog fetched with errors is not cached."""
+        mock_get_session.return_value = fake_session(tmdb_api.requests.exceptions.ConnectionError("offline"))
+        self.assertEqual(fetch_movies(max_movies=60), [])
+
+        mock_get_session.return_value = fake_session(fake_get)
+        self.assertEqual(len(fetch_movies(max_movies=60)), 60)
+
+    def test_sync_is_incremental(self):
+        """Test if a larger catalog only fetches the missing pages and unchanged movies are not rewritten."""
+        session = fake_session(fake_get)
+        with patch("tmdb_api.get_session", return_value=session):
+            fetch_movies(max_movies=40, concurrent=False)
+            self.assertEqual(session.get.call_count, 2)
+
+            movies = fetch_movies(max_movies=100, concurrent=False)
+            requested_pages = [call.args[0].rsplit("page=", 1)[1] for call in session.get.call_args_list[2:]]
+            self.assertEqual(sorted(requested_pages), ["3", "4", "5"])
+            self.assertEqual(len(movies), 100)
+            self.assertEqual(movies[0].keys(), {
+                "id", "title", "overview", "poster", "poster_path", "release_date", "popularity"
+            })
+
+        store = tmdb_api.catalog_store
+        next_week = tmdb_api.get_first_day_of_week() + datetime.timedelta(days=7)
+
+        def changed_get(url, **kwargs):
+            response = fake_get(url)
+            if url.endswith("page=1"):
+                response.json.return_value = make_page(1, popularity=2.0)
+            return response
+
+        with patch("tmdb_api.get_session", return_value=fake_session(changed_get)):
+            result = tmdb_api.sync_catalog(max_movies=40, first_day_of_week=next_week)
+        self.assertEqual(result, {"pages": 2, "changed": 20, "complete": True})
+
+        # ✅ Indexed lookups by id and release date
+        self.assertEqual(store.get(105)["popularity"], 2.0)
+        self.assertIsNone(store.get(999))
+        released = store.released_between(datetime.date(2020, 1, 1), datetime.date(2020, 1, 2))
+        self.assertEqual({movie["release_date"] for movie in released}, {"2020-01-01", "2020-01-02"})
+
+    def test_concurrent_fetch_matches_sequential(self):
+        """Test if concurrent page fetching keeps the sequential filtering, ordering and error handling."""
+
+        def flaky_get(url, **kwargs):
+            if url.endswith("page=3"):
+                raise tmdb_api.requests.exceptions.HTTPError("503 Service Unavailable")
+            return fake_get(url)
+
+        for get in (fake_get, flaky_get):
+            with patch("tmdb_api.get_session", return_value=fake_session(get)):
+                sequential = fetch_movies(max_movies=60, use_cache=False, concurrent=False)
+                concurrent = fetch_movies(max_movies=60, use_cache=False, concurrent=True)
+            self.assertEqual(sequential, concurrent)
+
+        self.assertEqual(len(concurrent), 40, "Pages after a failed page should be ignored")
+
+    def test_iter_movies_streams_lists(self):
+        """Test if list pages are streamed in order, without duplicates or requests past a list's last page."""
+        session = fake_session(library_get)
+        with patch("tmdb_api.get_session", return_value=session):
+            movies = list(tmdb_api.iter_movies(["trending", "popular"], max_pages=10))
+            self.assertEqual(session.get.call_count, 6)
+            self.assertEqual([movie["id"] for movie in movies],
+                             [page * 100 + i for page in (1, 2, 3, 4) for i in range(20)])
+
+            movies = list(tmdb_api.iter_movies(["trending", "popular"], max_pages=2))
+            self.assertEqual(len(movies), 60)
+
+    def test_library_is_served(self):
+        """Test if a synced library is served by fetch_movies, and an interrupted sync is resumed first."""
+
+        def flaky_get(url, **kwargs):
+            if "/movie/popular" in url and url.endswith("page=2"):
+                raise tmdb_api.requests.exceptions.HTTPError("503 Service Unavailable")
+            return library_get(url)
+
+        with patch("tmdb_api.LIBRARY_SIZE", 70), patch("tmdb_api.get_session", return_value=fake_session(flaky_get)):
+            result = tmdb_api.sync_library(max_movies=70)
+            self.assertEqual(result, {"movies": 60, "changed": 60, "complete": False})
+            # ✅ Until the library is complete, the trending catalog is served
+            self.assertEqual(len(fetch_movies(max_movies=40)), 40)
+
+        session = fake_session(library_get)
+        with patch("tmdb_api.LIBRARY_SIZE", 70), patch("tmdb_api.get_session", return_value=session):
+            self.assertEqual(tmdb_api.sync_library(max_movies=70), {"movies": 10, "changed": 10, "complete": True})
+            calls = session.get.call_count
+
+            library = fetch_movies(max_movies=40)
+            self.assertEqual(len(library), 70)
+            self.assertEqual([movie["id"] for movie in library[:2]], [100, 101])
+            self.assertIs(fetch_movies(max_movies=40), library)
+            self.assertEqual(tmdb_api.catalog_version(library), library.version)
+            self.assertEqual(session.get.call_count, calls)
+
+        # ✅ The shared library cannot be modified by a request
+        with self.assertRaises(TypeError):
+            library[0]["title"] = "Changed"
+        with self.assertRaises(AttributeError):
+            library.append({"title": "Extra"})
+        self.assertEqual(dict(library[0], title="Changed")["title"], "Changed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import datetime
+import fcntl
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import llm  # noqa: E402
+import tmdb_api  # noqa: E402
+import warmup  # noqa: E402
+from cache import JsonCache  # noqa: E402
+from catalog_store import CatalogStore  # noqa: E402
+from test_tmdb_api import fake_get, fake_session  # noqa: E402
+
+
+class TestWarmup(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        for patcher in (
+            patch.object(tmdb_api, "catalog_store", CatalogStore(os.path.join(self.cache_dir, "catalog.sqlite3"))),
+            patch.object(llm, "ranking_cache", JsonCache("rankings", cache_dir=self.cache_dir)),
+            patch("tmdb_api.get_session", return_value=fake_session(fake_get)),
+            patch("warmup.CACHE_DIR", self.cache_dir),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_popular_mood_sets(self):
+        """Test if recently ranked mood sets come first, followed by each mood family's first moods."""
+        catalog = [{"title": "A", "overview": "A.", "release_date": "2024-01-01"}]
+        other_catalog = [{"title": "B", "overview": "B.", "release_date": "2024-01-01"}]
+        llm.ranking_cache.set(llm.ranking_cache_key(["tired", "anxious"], catalog, 15), [[0, "Reason"]])
+        llm.ranking_cache.set(llm.ranking_cache_key(["happy", "joyful"], other_catalog, 15), [[0, "Reason"]])
+        llm.ranking_cache.set(llm.ranking_cache_key(["anxious", "tired"], other_catalog, 15), [[0, "Reason"]])
+
+        mood_sets = warmup.popular_mood_sets(limit=4)
+        self.assertEqual(mood_sets[:2], [["anxious", "tired"], ["happy", "joyful"]])
+        self.assertEqual(mood_sets[2], ["cheerful", "happy", "joyful"])
+        self.assertEqual(len(mood_sets), 4)
+
+    @patch("warmup.popular_mood_sets", return_value=[["happy"], ["sad"]])
+    @patch("llm.get_movies_by_mood")
+    def test_warm_next_week(self, mock_get_movies_by_mood, mock_mood_sets):
+        """Test if warming next week syncs its catalog, pre-ranks mood sets on it and runs the hooks."""
+        hook = MagicMock()
+        next_week = tmdb_api.get_first_day_of_week() + datetime.timedelta(days=7)
+
+        movies = warmup.warm(next_week, max_movies=40, hooks=[hook])
+
+        self.assertEqual(len(movies), 40)
+        self.assertEqual([call.args[0] for call in mock_get_movies_by_mood.call_args_list], [["happy"], ["sad"]])
+        hook.assert_called_once_with(movies)
+
+        # ✅ After the rollover, the catalog is served from the store without TMDB requests
+        session = fake_session(fake_get)
+        with patch("tmdb_api.get_session", return_value=session), \
+                patch("tmdb_api.get_first_day_of_week", return_value=next_week):
+            self.assertEqual(tmdb_api.fetch_movies(40), movies)
+        session.get.assert_not_called()
+
+    @patch("warmup.warm")
+    def test_processes_warm_up_one_at_a_time(self, mock_warm):
+        """Test if a warm-up waits while another process holds the warm-up lock."""
+        with open(os.path.join(self.cache_dir, "warmup.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            thread = threading.Thread(target=warmup._safe_warm, args=(None, 40, ()))
+            thread.start()
+            thread.join(0.2)
+            mock_warm.assert_not_called()
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        thread.join(5)
+        mock_warm.assert_called_once_with(None, 40, ())
+
+    def test_schedule(self):
+        """Test if warm-ups are scheduled shortly before and after the coming Monday rollover."""
+        monday = datetime.date(2026, 10, 19)
+        with patch("warmup.WARMUP_LEAD_MINUTES", 15), patch("warmup.WARMUP_LAG_MINUTES", 5):
+            self.assertEqual(warmup.schedule(datetime.datetime(2026, 10, 15, 12, 0)), [
+                (datetime.datetime(2026, 10, 18, 23, 45), monday),
+                (datetime.datetime(2026, 10, 19, 0, 5), monday),
+            ])
+            self.assertEqual(warmup.schedule(datetime.datetime(2026, 10, 18, 23, 50)),
+                             [(datetime.datetime(2026, 10, 19, 0, 5), monday)])
+            self.assertEqual(warmup.schedule(datetime.datetime(2026, 10, 19, 0, 10))[0][1],
+                             monday + datetime.timedelta(days=7))
+
+
+if __name__ == "__main__":
+    unittest.main()
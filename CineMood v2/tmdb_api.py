@@ -1,7 +1,64 @@
+import contextvars
 import datetime
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+from catalog_store import Catalog, CatalogStore, pages_needed, poster_url
+from config import (
+    LIBRARY_LISTS, LIBRARY_PAGES, LIBRARY_SIZE, TMDB_API_KEY, TMDB_BASE_URL, TMDB_MAX_RETRIES, TMDB_MAX_WORKERS,
+    TMDB_TIMEOUT
+)
+
+# Weekly trending catalogs shared by all sessions and processes
+catalog_store = CatalogStore()
+
+# TMDB movie lists a library can be streamed from
+LIST_PATHS = {
+    "trending": "/trending/movie/week",
+    "popular": "/movie/popular",
+    "top_rated": "/movie/top_rated",
+    "discover": "/discover/movie?sort_by=vote_count.desc",
+}
 
-from config import TMDB_API_KEY
+# TMDB serves at most 500 pages of a list
+MAX_LIST_PAGES = 500
+
+# Streamed library movies written to the store per transaction
+LIBRARY_BATCH_SIZE = 500
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Returns the shared HTTP session used for TMDB requests.
+    The session keeps connections alive, pools up to `TMDB_MAX_WORKERS` connections,
+    and retries 429/5xx responses with exponential backoff.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=TMDB_MAX_RETRIES,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset(["GET"]),
+                respect_retry_after_header=True,
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=TMDB_MAX_WORKERS, max_retries=retry)
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
 
 
 def get_first_day_of_week():
@@ -10,40 +67,269 @@ def get_first_day_of_week():
     return today - datetime.timedelta(days=today.weekday())
 
 
-def fetch_movies(max_movies=100):
+def catalog_version(movies):
+    """
+    Returns a short content hash identifying a catalog (titles, overviews and release dates).
+    The hash of a loaded library (`Catalog`) is computed once and kept on it.
+    """
+    version = getattr(movies, "version", None)
+    if version is not None:
+        return version
+    content = json.dumps(
+        [[movie["title"], movie["overview"], movie["release_date"]] for movie in movies], ensure_ascii=False
+    )
+    version = hashlib.sha1(content.encode("utf-8")).hexdigest()[:16]
+    if isinstance(movies, Catalog):
+        movies.version = version
+    return version
+
+
+@metrics.tracked("fetch_movies")
+def fetch_movies(max_movies=100, language="en-US", use_cache=True, concurrent=True, cancel_event=None):
     """
     Fetch up to `max_movies` trending movies, ensuring only movies with release dates before the first day
     of the current week are considered, and that they have non-empty overviews.
     Returns the movies sorted by release date (latest first).
+    The catalog is served from the local SQLite store (`catalog_store.py`), which is synced incrementally:
+    TMDB is only queried for the pages of the week the store does not hold yet.
+    With `concurrent=True`, pages are downloaded in parallel over a pooled session.
+    Setting `cancel_event` (a threading.Event) stops the download after the current page.
+    With `LIBRARY_SIZE`, the large catalog is served instead (whatever `max_movies`) once a library is synced
+    (`sync_library`): a shared read-only `Catalog` in ingestion order, top trending movies first
+    (`dict(movie)` copies a movie to modify it).
     """
-    movies = []
-    pages_to_fetch = (max_movies // 20) + 1
     first_day_of_week = get_first_day_of_week()
 
-    for page in range(1, pages_to_fetch + 1):
-        url = f"https://api.themoviedb.org/3/trending/movie/week?api_key={TMDB_API_KEY}&language=en-US&page={page}"
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
-            for movie in data.get("results", []):
-                release_date = movie.get("release_date", "9999-12-31")
-                overview = movie.get("overview", "").strip()
-                try:
-                    release_date_obj = datetime.datetime.strptime(release_date, "%Y-%m-%d").date()
-                except ValueError:
-                    continue
-                if overview and release_date_obj < first_day_of_week:
-                    movies.append({
-                        "title": movie["title"],
-                        "overview": overview,
-                        "poster": f"https://image.tmdb.org/t/p/w500{movie['poster_path']}" if movie.get("poster_path") else None,
-                        "release_date": release_date,
-                    })
-            if len(movies) >= max_movies:
+    if LIBRARY_SIZE and use_cache:
+        library = catalog_store.load_library(first_day_of_week, language)
+        if library:
+            metrics.annotate(cache="hit", source="library")
+            return library
+
+    if not use_cache:
+        pages, _ = _fetch_trending_pages(max_movies, language, first_day_of_week, concurrent, cancel_event)
+        movies = [movie for _, page_movies in pages for movie in page_movies]
+        return sorted(movies, key=lambda x: x["release_date"], reverse=True)[:max_movies]
+
+    movies = catalog_store.load(first_day_of_week, language, max_movies)
+    metrics.annotate(cache="miss" if movies is None else "hit")
+    if movies is None:
+        sync_catalog(max_movies, language, first_day_of_week, concurrent, cancel_event)
+        # ✅ After a failed or cancelled sync, serve the pages fetched so far
+        movies = catalog_store.load(first_day_of_week, language, max_movies, partial=True)
+    return movies
+
+
+def stored_movies(max_movies=100, language="en-US"):
+    """
+    Returns the catalog the local store already holds for the week, without querying TMDB:
+    the library once synced, otherwise the trending pages synced so far (possibly none).
+    """
+    first_day_of_week = get_first_day_of_week()
+    if LIBRARY_SIZE:
+        library = catalog_store.load_library(first_day_of_week, language)
+        if library:
+            return library
+    return catalog_store.load(first_day_of_week, language, max_movies, partial=True)
+
+
+def sync_catalog(max_movies=100, language="en-US", first_day_of_week=None, concurrent=True, cancel_event=None):
+    """
+    Brings the stored trending catalog of a week (the current one by default) up to `max_movies` movies.
+    Only pages the store does not hold yet are fetched, and only new or changed movies are written.
+    Returns the number of fetched pages, of new or changed movies, and whether the catalog is complete.
+    """
+    first_day_of_week = first_day_of_week or get_first_day_of_week()
+    synced_pages, count = catalog_store.sync_state(first_day_of_week, language)
+    if count >= max_movies or synced_pages >= pages_needed(max_movies):
+        return {"pages": 0, "changed": 0, "complete": True}
+
+    pages, complete = _fetch_trending_pages(
+        max_movies, language, first_day_of_week, concurrent, cancel_event, first_page=synced_pages + 1, count=count
+    )
+    changed = catalog_store.add_pages(first_day_of_week, language, pages)
+    metrics.annotate(synced_pages=len(pages), changed_movies=changed)
+
+    # ✅ Keep the previous week's catalog, drop older ones
+    if complete:
+        catalog_store.prune(first_day_of_week - datetime.timedelta(days=7))
+    return {"pages": len(pages), "changed": changed, "complete": complete}
+
+
+def iter_movies(lists=LIBRARY_LISTS, max_pages=LIBRARY_PAGES, language="en-US", first_day_of_week=None,
+                cancel_event=None):
+    """
+    Streams the valid movies of several TMDB lists (names of `LIST_PATHS`), list after list and page after page,
+    holding no more than a window of pages in memory:
+    - Movies found in several lists are only yielded the first time.
+    - Up to `TMDB_MAX_WORKERS` pages of a list are downloaded ahead in parallel.
+    - A list ends at its last page or after `max_pages` pages (TMDB serves 500 at most).
+    Page errors are raised (requests' exceptions); setting `cancel_event` stops the stream after the current page.
+    """
+    first_day_of_week = first_day_of_week or get_first_day_of_week()
+    seen = set()
+    executor = ThreadPoolExecutor(max_workers=TMDB_MAX_WORKERS)
+    try:
+        for name in lists:
+            last_page = min(max_pages, MAX_LIST_PAGES)
+            page = 1
+            while page <= last_page:
+                # ✅ The first page tells how many pages the list has, so no request is sent past its end
+                window = range(page, min(page + (TMDB_MAX_WORKERS if page > 1 else 1), last_page + 1))
+                futures = [
+                    executor.submit(contextvars.copy_context().run, _fetch_list_page, LIST_PATHS[name], number,
+                                    language, first_day_of_week)
+                    for number in window
+                ]
+                for future in futures:
+                    if cancel_event is not None and cancel_event.is_set():
+                        metrics.annotate(cancelled=True)
+                        return
+                    movies, total_pages = future.result()
+                    last_page = min(last_page, total_pages)
+                    for movie in movies:
+                        if movie["id"] not in seen:
+                            seen.add(movie["id"])
+                            yield movie
+                page = window.stop
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+@metrics.tracked("sync_library")
+def sync_library(max_movies=LIBRARY_SIZE, language="en-US", first_day_of_week=None, cancel_event=None):
+    """
+    Streams up to `max_movies` movies of the `LIBRARY_LISTS` into the library of a week (the current one by default),
+    in batches of `LIBRARY_BATCH_SIZE`, and marks it complete so `fetch_movies` serves it.
+    An interrupted sync keeps the movies streamed so far and is resumed by the next one.
+    Returns the number of movies added, of new or changed movies, and whether the library is complete.
+    """
+    first_day_of_week = first_day_of_week or get_first_day_of_week()
+    count, complete = catalog_store.library_state(first_day_of_week, language)
+    if complete or count >= max_movies:
+        catalog_store.complete_library(first_day_of_week, language)
+        return {"movies": 0, "changed": 0, "complete": True}
+
+    added = changed = 0
+    batch = []
+    movies = iter_movies(language=language, first_day_of_week=first_day_of_week, cancel_event=cancel_event)
+    try:
+        for movie in movies:
+            batch.append(movie)
+            if len(batch) >= min(LIBRARY_BATCH_SIZE, max_movies - count):
+                batch_added, batch_changed = catalog_store.add_library_movies(first_day_of_week, language, batch)
+                count, added, changed, batch = count + batch_added, added + batch_added, changed + batch_changed, []
+                if count >= max_movies:
+                    break
+        complete = cancel_event is None or not cancel_event.is_set()
+    except requests.exceptions.RequestException as e:
+        print(f"⚠️ Error fetching the library: {e}")
+        metrics.annotate(fallback=True, error=str(e))
+    finally:
+        movies.close()
+
+    # ✅ Movies streamed before an error or cancellation are kept: the next sync resumes with them stored
+    if batch:
+        batch_added, batch_changed = catalog_store.add_library_movies(first_day_of_week, language, batch)
+        count, added, changed = count + batch_added, added + batch_added, changed + batch_changed
+
+    metrics.annotate(library_movies=count, changed_movies=changed)
+    if complete:
+        catalog_store.complete_library(first_day_of_week, language)
+        catalog_store.prune(first_day_of_week - datetime.timedelta(days=7))
+    return {"movies": added, "changed": changed, "complete": complete}
+
+
+def _fetch_trending_pages(max_movies, language, first_day_of_week, concurrent=True, cancel_event=None,
+                          first_page=1, count=0):
+    """
+    Downloads trending pages from `first_page` on, until `max_movies` valid movies are collected
+    (`count` of them were collected from earlier pages) or `pages_needed(max_movies)` pages are read.
+    Pages are consumed in order, so the concurrent and sequential modes return the same pages.
+    Returns the (page number, movies) of every page fetched in order, and whether no page failed.
+    """
+    fetched = []
+    complete = True
+    pages = range(first_page, pages_needed(max_movies) + 1)
+
+    if concurrent and len(pages) > 1:
+        executor = ThreadPoolExecutor(max_workers=min(TMDB_MAX_WORKERS, len(pages)))
+        # ✅ Each page runs in a copy of the caller's context, so its retries count towards the tracked call
+        futures = [
+            executor.submit(contextvars.copy_context().run, _fetch_page, page, language, first_day_of_week)
+            for page in pages
+        ]
+
+        def get_page(i):
+            return futures[i].result()
+    else:
+        executor = None
+
+        def get_page(i):
+            return _fetch_page(pages[i], language, first_day_of_week)
+
+    try:
+        for i in range(len(pages)):
+            if cancel_event is not None and cancel_event.is_set():
+                metrics.annotate(cancelled=True)
+                complete = False
+                break
+            try:
+                movies = get_page(i)
+            except requests.exceptions.RequestException as e:
+                print(f"⚠️ Error fetching movies: {e}")
+                metrics.annotate(fallback=True, error=str(e))
+                complete = False
                 break
-        except requests.exceptions.RequestException as e:
-            print(f"⚠️ Error fetching movies: {e}")
-            break
+            fetched.append((pages[i], movies))
+            count += len(movies)
+            if count >= max_movies:
+                break
+    finally:
+        # ✅ Cancel pages that are no longer needed
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    return fetched, complete
+
 
-    return sorted(movies, key=lambda x: x["release_date"], reverse=True)[:max_movies]
+def _fetch_page(page, language, first_day_of_week):
+    """Downloads one trending page and returns its movies released before `first_day_of_week`."""
+    return _fetch_list_page(LIST_PATHS["trending"], page, language, first_day_of_week)[0]
+
+
+def _fetch_list_page(path, page, language, first_day_of_week):
+    """
+    Downloads one page of a TMDB list (`path`, see `LIST_PATHS`).
+    Returns its movies released before `first_day_of_week`, and the list's number of pages.
+    """
+    separator = "&" if "?" in path else "?"
+    url = f"{TMDB_BASE_URL}{path}{separator}api_key={TMDB_API_KEY}&language={language}&page={page}"
+    response = get_session().get(url, timeout=TMDB_TIMEOUT)
+    retry_history = getattr(getattr(getattr(response, "raw", None), "retries", None), "history", None)
+    if isinstance(retry_history, tuple) and retry_history:
+        metrics.annotate(retries=len(retry_history))
+    response.raise_for_status()
+    data = response.json()
+
+    movies = []
+    for movie in data.get("results", []):
+        if movie.get("id") is None:
+            continue
+        release_date = movie.get("release_date", "9999-12-31")
+        overview = movie.get("overview", "").strip()
+        try:
+            release_date_obj = datetime.datetime.strptime(release_date, "%Y-%m-%d").date()
+        except ValueError:
+            continue
+        if overview and release_date_obj < first_day_of_week:
+            movies.append({
+                "id": movie["id"],
+                "title": movie["title"],
+                "overview": overview,
+                "poster": poster_url(movie.get("poster_path")),
+                "poster_path": movie.get("poster_path"),
+                "release_date": release_date,
+                "popularity": movie.get("popularity"),
+            })
+    return movies, data.get("total_pages", page)
@@ -0,0 +1,159 @@
+"""
+Background warm-up of the weekly catalog and everything derived from it.
+
+`start()` runs a daemon thread per process that warms:
+- the current week at startup,
+- next week `WARMUP_LEAD_MINUTES` before the weekly rollover (`get_first_day_of_week()` changes on Monday),
+- and again `WARMUP_LAG_MINUTES` after it, to catch up on anything that failed before.
+
+Warming a week syncs its catalog into the catalog store (and its library with `LIBRARY_SIZE`), builds the retrieval
+index of the catalog served to requests (and the affinity matrix in matrix mode), summarizes the overviews of its
+first movies with `OVERVIEW_COMPRESSION=llm`, pre-ranks the most requested mood sets and runs the caller's hooks
+(e.g. poster prefetch) on the trending catalog.
+Everything is keyed by week or catalog version, so next week's data is complete before any request asks
+for it: requests switch over when `get_first_day_of_week()` changes, with nothing left to build.
+
+Every process (API workers, the Streamlit app) starts a warm-up, but they take turns through a lock file in
+`CACHE_DIR`: the first one syncs, builds and ranks, the others then find everything in the shared stores and
+caches, and only load it into their own memory (no repeated TMDB syncs or GPT rankings).
+"""
+import datetime
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import affinity
+import llm
+import metrics
+import overviews
+import tmdb_api
+from config import (
+    CACHE_DIR, LIBRARY_SIZE, OVERVIEW_COMPRESSION, RANKING_MODE, WARMUP, WARMUP_LAG_MINUTES, WARMUP_LEAD_MINUTES,
+    WARMUP_MOOD_SETS
+)
+from moods import MOOD_FAMILIES
+from retrieval import get_index
+
+try:
+    import fcntl
+except ImportError:  # Windows: every process warms up on its own
+    fcntl = None
+
+
+def popular_mood_sets(limit=WARMUP_MOOD_SETS):
+    """
+    Returns up to `limit` mood sets worth pre-ranking:
+    the mood sets of the most recently used rankings (of any catalog), then the first 3 moods of each family.
+    """
+    mood_sets = []
+    # Ranking cache keys end with the sorted mood set (see `llm.ranking_cache_key`):
+    # "<catalog version>|<model>|<overview compression>|<top_k>|<mood+mood+mood>"
+    for key in reversed(llm.ranking_cache.keys()):
+        mood_sets.append(tuple(key.rsplit("|", 1)[-1].split("+")))
+    for family in MOOD_FAMILIES.values():
+        mood_sets.append(tuple(sorted(family["moods"][:3])))
+    return [list(moods) for moods in dict.fromkeys(mood_sets)][:limit]
+
+
+@metrics.tracked("warm_up")
+def warm(first_day_of_week=None, max_movies=60, hooks=(), workers=4):
+    """
+    Warms the catalog of a week (the current one by default) and its derived caches.
+    Returns the warmed trending catalog (empty if it could not be fetched).
+    """
+    week = first_day_of_week or tmdb_api.get_first_day_of_week()
+    tmdb_api.sync_catalog(max_movies, first_day_of_week=week)
+    movies = tmdb_api.catalog_store.load(week, "en-US", max_movies, partial=True)
+    catalog = movies
+    if LIBRARY_SIZE:
+        tmdb_api.sync_library(first_day_of_week=week)
+        catalog = tmdb_api.catalog_store.load_library(week, "en-US") or movies
+    metrics.annotate(week=week.isoformat(), movies=len(catalog))
+    if not catalog:
+        return []
+
+    get_index(catalog)
+    if RANKING_MODE == "matrix":
+        affinity.get_matrix(catalog)
+    if OVERVIEW_COMPRESSION == "llm":
+        metrics.annotate(summaries=overviews.summarize(catalog[:max_movies], llm.summarize_overviews, week))
+
+    mood_sets = popular_mood_sets()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda moods: llm.get_movies_by_mood(moods, catalog), mood_sets))
+    metrics.annotate(mood_sets=len(mood_sets))
+
+    for hook in hooks:
+        hook(movies)
+    return movies
+
+
+def schedule(now):
+    """Returns the next warm-ups after `now` around the coming rollover, as (time, week to warm) pairs."""
+    next_week = now.date() - datetime.timedelta(days=now.weekday()) + datetime.timedelta(days=7)
+    rollover = datetime.datetime.combine(next_week, datetime.time.min)
+    return [
+        (when, next_week)
+        for when in (rollover - datetime.timedelta(minutes=WARMUP_LEAD_MINUTES),
+                     rollover + datetime.timedelta(minutes=WARMUP_LAG_MINUTES))
+        if when > now
+    ]
+
+
+@contextmanager
+def _exclusive():
+    """Holds an exclusive inter-process lock on `CACHE_DIR/warmup.lock`, so processes warm up one at a time."""
+    if fcntl is None:
+        yield
+        return
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        lock_file = open(os.path.join(CACHE_DIR, "warmup.lock"), "a")
+    except OSError as e:
+        print(f"⚠️ Error locking the warm-up: {e}")
+        yield
+        return
+    with lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _safe_warm(first_day_of_week, max_movies, hooks):
+    try:
+        with _exclusive():
+            warm(first_day_of_week, max_movies, hooks)
+    except Exception as e:
+        print(f"⚠️ Error warming up the catalog: {e}")
+
+
+def _run(max_movies, hooks):
+    _safe_warm(None, max_movies, hooks)
+    while True:
+        for when, week in schedule(datetime.datetime.now()):
+            time.sleep(max(0.0, (when - datetime.datetime.now()).total_seconds()))
+            _safe_warm(week, max_movies, hooks)
+        # ✅ Past the lag warm-up: the next schedule is for the following rollover
+        time.sleep(60)
+
+
+_lock = threading.Lock()
+_started = False
+
+
+def start(max_movies, hooks=()):
+    """
+    Starts the warm-up thread for catalogs of `max_movies` movies, once per process (later calls do nothing).
+    `hooks` are called with each warmed catalog. Disabled with `WARMUP=false`.
+    """
+    global _started
+    with _lock:
+        if _started or not WARMUP:
+            return
+        _started = True
+
+    threading.Thread(target=_run, args=(max_movies, tuple(hooks)), daemon=True, name="cinemood-warmup").start()